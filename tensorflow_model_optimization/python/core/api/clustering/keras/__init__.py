@@ -24,5 +24,7 @@ from tensorflow_model_optimization.python.core.clustering.keras import clusterab
 from tensorflow_model_optimization.python.core.clustering.keras.cluster_config import CentroidInitialization
 from tensorflow_model_optimization.python.core.clustering.keras.clustering_algorithm import ClusteringAlgorithm
 from tensorflow_model_optimization.python.core.clustering.keras.clustering_callbacks import ClusteringSummaries
+from tensorflow_model_optimization.python.core.clustering.keras.clustering_schedule import ClusteringSchedule
+from tensorflow_model_optimization.python.core.clustering.keras.clustering_schedule import ConstantFrequency
 from tensorflow_model_optimization.python.core.clustering.keras.clusterable_layer import ClusterableLayer
 # pylint: enable=g-bad-import-order
@@ -14,3 +14,4 @@
 # ==============================================================================
 """Module containing experimental clustering code built on Keras abstractions."""
 from tensorflow_model_optimization.python.core.clustering.keras.experimental.cluster import cluster_weights
+from tensorflow_model_optimization.python.core.clustering.keras.cluster_budget import select_number_of_clusters
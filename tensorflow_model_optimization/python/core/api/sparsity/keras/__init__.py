@@ -18,6 +18,7 @@
 from tensorflow_model_optimization.python.core.sparsity.keras.prune import prune_low_magnitude
 from tensorflow_model_optimization.python.core.sparsity.keras.prune import prune_scope
 from tensorflow_model_optimization.python.core.sparsity.keras.prune import strip_pruning
+from tensorflow_model_optimization.python.core.sparsity.keras.prune import convert_mask_storage
 
 from tensorflow_model_optimization.python.core.sparsity.keras.pruning_callbacks import UpdatePruningStep
 from tensorflow_model_optimization.python.core.sparsity.keras.pruning_callbacks import PruningSummaries
@@ -26,9 +27,21 @@ from tensorflow_model_optimization.python.core.sparsity.keras.pruning_schedule i
 from tensorflow_model_optimization.python.core.sparsity.keras.pruning_schedule import ConstantSparsity
 from tensorflow_model_optimization.python.core.sparsity.keras.pruning_schedule import PolynomialDecay
 
+from tensorflow_model_optimization.python.core.sparsity.keras.pruning_threshold import PruningThreshold
+from tensorflow_model_optimization.python.core.sparsity.keras.pruning_threshold import TopKThreshold
+from tensorflow_model_optimization.python.core.sparsity.keras.pruning_threshold import RadixSelectThreshold
+from tensorflow_model_optimization.python.core.sparsity.keras.pruning_threshold import HistogramThreshold
+from tensorflow_model_optimization.python.core.sparsity.keras.pruning_threshold import SampledThreshold
+
 from tensorflow_model_optimization.python.core.sparsity.keras.prunable_layer import PrunableLayer
 
 from tensorflow_model_optimization.python.core.sparsity.keras.pruning_policy import PruningPolicy
 from tensorflow_model_optimization.python.core.sparsity.keras.pruning_policy import PruneForLatencyOnXNNPack
+from tensorflow_model_optimization.python.core.sparsity.keras.pruning_policy import PruneForTargetLatency
+from tensorflow_model_optimization.python.core.sparsity.keras.layer_latency import LayerLatencyProfiler
+
+from tensorflow_model_optimization.python.core.sparsity.keras.channel_permutation import permute_channels_for_m_by_n
+from tensorflow_model_optimization.python.core.sparsity.keras.structured_pruning import prune_channels
+from tensorflow_model_optimization.python.core.sparsity.keras.sparse_layers import SparseDense
 
 # pylint: enable=g-bad-import-order
@@ -0,0 +1,116 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark for the training step time of per-channel clustering.
+
+Trains a wide Conv2D model whose kernels are clustered per channel, with and
+without sparsity preservation, and reports the time of the first training
+step, which is dominated by graph construction, and the mean time of the
+following steps.
+
+Example:
+
+  python benchmark_cluster_per_channel.py --filters=256,1024
+"""
+
+from __future__ import print_function
+
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+
+from tensorflow_model_optimization.python.core.clustering.keras import cluster
+from tensorflow_model_optimization.python.core.clustering.keras import cluster_config
+from tensorflow_model_optimization.python.core.keras.compat import keras
+
+_FILTERS = flags.DEFINE_list(
+    'filters', ['256', '1024'],
+    'Comma-separated number of output channels of the Conv2D layers.')
+_NUM_CLUSTERS = flags.DEFINE_integer('num_clusters', 16,
+                                     'Number of clusters of every channel.')
+_STEPS = flags.DEFINE_integer('steps', 20, 'Number of timed training steps.')
+
+
+class _StepTimer(keras.callbacks.Callback):
+
+  def __init__(self):
+    super(_StepTimer, self).__init__()
+    self.step_times = []
+    self._start = None
+
+  def on_train_batch_begin(self, batch, logs=None):
+    self._start = time.time()
+
+  def on_train_batch_end(self, batch, logs=None):
+    self.step_times.append(time.time() - self._start)
+
+
+def _benchmark(filters, num_clusters, preserve_sparsity, steps):
+  """Returns (first step time, mean step time) in milliseconds."""
+  model = keras.Sequential([
+      keras.layers.Conv2D(filters, 3, padding='same', input_shape=(8, 8, 16)),
+      keras.layers.Conv2D(filters, 3, padding='same'),
+  ])
+  if preserve_sparsity:
+    # Sparsity preservation needs zero weights to preserve.
+    for layer in model.layers:
+      kernel, bias = layer.get_weights()
+      kernel[np.abs(kernel) < np.median(np.abs(kernel))] = 0.
+      layer.set_weights([kernel, bias])
+
+  clustered_model = cluster.cluster_weights(
+      model,
+      number_of_clusters=num_clusters,
+      cluster_centroids_init=cluster_config.CentroidInitialization.LINEAR,
+      cluster_per_channel=True,
+      preserve_sparsity=preserve_sparsity)
+  clustered_model.compile(loss='mse', optimizer='sgd')
+
+  timer = _StepTimer()
+  clustered_model.fit(
+      np.random.rand(steps + 1, 8, 8, 16),
+      np.random.rand(steps + 1, 8, 8, filters),
+      batch_size=1,
+      epochs=1,
+      verbose=0,
+      callbacks=[timer])
+  return timer.step_times[0] * 1000., np.mean(timer.step_times[1:]) * 1000.
+
+
+def run(filters_list, num_clusters, steps):
+  print('{:>8} {:>18} {:>20} {:>20}'.format('filters', 'preserve_sparsity',
+                                            'first step (ms)',
+                                            'mean step (ms)'))
+  for filters in filters_list:
+    for preserve_sparsity in [False, True]:
+      first_step, mean_step = _benchmark(filters, num_clusters,
+                                         preserve_sparsity, steps)
+      print('{:>8} {:>18} {:>20.1f} {:>20.2f}'.format(filters,
+                                                      str(preserve_sparsity),
+                                                      first_step, mean_step))
+      keras.backend.clear_session()
+
+
+def main(argv):
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  run([int(filters) for filters in _FILTERS.value], _NUM_CLUSTERS.value,
+      _STEPS.value)
+
+
+if __name__ == '__main__':
+  app.run(main)
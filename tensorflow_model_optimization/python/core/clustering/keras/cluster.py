@@ -106,7 +106,10 @@ def cluster_weights(
         instance.
       number_of_clusters: the number of cluster centroids to form when
         clustering a layer/model. For example, if number_of_clusters=8 then only
-        8 unique values will be used in each weight array.
+        8 unique values will be used in each weight array. Can also be a dict
+        mapping layer names to their numbers of clusters, as returned by
+        `select_number_of_clusters`, in which case the layers missing from the
+        dict are not clustered.
       cluster_centroids_init: enum value that determines how the cluster
         centroids will be initialized. Can have following values: 1. RANDOM :
         centroids are sampled using the uniform distribution between the minimum
@@ -117,7 +120,10 @@ def cluster_weights(
         initialize clusters centroids. 3. LINEAR : cluster centroids are evenly
         spaced between the minimum and maximum values of a given weight
       **kwargs: Additional keyword arguments to be passed to the keras layer.
-        Ignored when to_cluster is not a keras layer.
+        Ignored when to_cluster is not a keras layer. A `clustering_schedule`,
+        `tfmot.clustering.keras.ClusteringSchedule` instance, can be passed to
+        determine in which training steps the weights are re-associated with
+        the cluster centroids, also when to_cluster is a model.
 
   Returns:
     Layer or model modified to include clustering related metadata.
@@ -135,6 +141,7 @@ def _cluster_weights(to_cluster,
                      cluster_centroids_init,
                      preserve_sparsity=False,
                      cluster_per_channel=False,
+                     clustering_schedule=None,
                      **kwargs):
   """Modifies a keras layer or model to be clustered during training.
 
@@ -203,7 +210,10 @@ def _cluster_weights(to_cluster,
         instance.
       number_of_clusters: the number of cluster centroids to form when
         clustering a layer/model. For example, if number_of_clusters=8 then only
-        8 unique values will be used in each weight array.
+        8 unique values will be used in each weight array. Can also be a dict
+        mapping layer names to their numbers of clusters, as returned by
+        `select_number_of_clusters`, in which case the layers missing from the
+        dict are not clustered.
       cluster_centroids_init: `tfmot.clustering.keras.CentroidInitialization`
         instance that determines how the cluster centroids will be initialized.
       preserve_sparsity (experimental): optional boolean value that determines
@@ -219,6 +229,11 @@ def _cluster_weights(to_cluster,
         since Conv2D is quantized per-channel, so we end up with
         num_clusters*num_channels total clusters at the end. Clustering
         per-channel from the beginning leads to better accuracy.
+      clustering_schedule: optional
+        `tfmot.clustering.keras.ClusteringSchedule` instance that determines
+        in which training steps the weights are re-associated with the cluster
+        centroids. By default, they are re-associated in every training step.
+        Evaluation and inference always reuse the last associations.
       **kwargs: Additional keyword arguments to be passed to the keras layer.
         Ignored when to_cluster is not a keras layer.
 
@@ -252,22 +267,32 @@ def _cluster_weights(to_cluster,
       return layer
     if isinstance(layer, InputLayer):
       return layer.__class__.from_config(layer.get_config())
+
+    layer_number_of_clusters = number_of_clusters
+    if isinstance(number_of_clusters, dict):
+      # Layers missing from the per-layer configuration are not clustered
+      if layer.name not in number_of_clusters:
+        return layer
+      layer_number_of_clusters = number_of_clusters[layer.name]
+
     if isinstance(layer, keras.layers.RNN) or isinstance(
         layer, keras.layers.Bidirectional
     ):
       return cluster_wrapper.ClusterWeightsRNN(
           layer,
-          number_of_clusters,
+          layer_number_of_clusters,
           cluster_centroids_init,
           preserve_sparsity,
+          clustering_schedule=clustering_schedule,
           **kwargs,
       )
     if isinstance(layer, keras.layers.MultiHeadAttention):
       return cluster_wrapper.ClusterWeightsMHA(
           layer,
-          number_of_clusters,
+          layer_number_of_clusters,
           cluster_centroids_init,
           preserve_sparsity,
+          clustering_schedule=clustering_schedule,
           **kwargs,
       )
 
@@ -276,14 +301,18 @@ def _cluster_weights(to_cluster,
     if isinstance(
         layer, keras.layers.Conv2D
     ) and not layer_has_enough_weights_to_cluster(
-        layer, number_of_clusters, cluster_per_channel
+        layer, layer_number_of_clusters, cluster_per_channel
     ):
       return layer
 
-    return cluster_wrapper.ClusterWeights(layer, number_of_clusters,
-                                          cluster_centroids_init,
-                                          preserve_sparsity,
-                                          cluster_per_channel, **kwargs)
+    return cluster_wrapper.ClusterWeights(
+        layer,
+        layer_number_of_clusters,
+        cluster_centroids_init,
+        preserve_sparsity,
+        cluster_per_channel,
+        clustering_schedule=clustering_schedule,
+        **kwargs)
 
   def _wrap_list(layers):
     output = []
@@ -0,0 +1,354 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Selection of the number of clusters of every layer under a size budget."""
+
+import math
+
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.clustering.keras import cluster_config
+from tensorflow_model_optimization.python.core.clustering.keras import clusterable_layer
+from tensorflow_model_optimization.python.core.clustering.keras import clustering_centroids
+from tensorflow_model_optimization.python.core.clustering.keras import clustering_registry
+from tensorflow_model_optimization.python.core.keras.compat import keras
+
+
+CentroidInitialization = cluster_config.CentroidInitialization
+
+
+def _get_clusterable_weights(layer):
+  """Returns the (name, weight) pairs of the layer to cluster."""
+  if isinstance(layer, clusterable_layer.ClusterableLayer):
+    return layer.get_clusterable_weights()
+
+  # pylint: disable=protected-access
+  weights_map = clustering_registry.ClusteringRegistry._LAYERS_WEIGHTS_MAP
+  if layer.__class__ not in weights_map or not layer.trainable_weights:
+    return []
+  return [(weight_name, getattr(layer, weight_name))
+          for weight_name in weights_map[layer.__class__]]
+
+
+def _get_weight_rows(weight, per_channel, data_format):
+  """Returns the weight with one row per set of clustered values."""
+  if not per_channel:
+    return tf.reshape(weight, [1, -1])
+
+  channels_first_perm = ([1, 0, 2, 3] if data_format == 'channels_first'
+                         else [3, 0, 1, 2])
+  num_channels = weight.shape[channels_first_perm[0]]
+  return tf.reshape(
+      tf.transpose(weight, perm=channels_first_perm), [num_channels, -1])
+
+
+def _restore_weight_shape(weight_rows, weight, per_channel, data_format):
+  """Reverts `_get_weight_rows`."""
+  if not per_channel:
+    return tf.reshape(weight_rows, weight.shape)
+
+  channels_first_perm = ([1, 0, 2, 3] if data_format == 'channels_first'
+                         else [3, 0, 1, 2])
+  transposed_shape = [weight.shape[axis] for axis in channels_first_perm]
+  return tf.transpose(
+      tf.reshape(weight_rows, transposed_shape),
+      perm=tf.math.invert_permutation(channels_first_perm))
+
+
+def _get_size_in_bits(weight, num_rows, number_of_clusters):
+  """Returns the size of a weight stored as cluster indices and centroids."""
+  index_bits = math.ceil(math.log2(number_of_clusters))
+  centroid_bits = weight.dtype.size * 8
+  return (weight.shape.num_elements() * index_bits +
+          num_rows * number_of_clusters * centroid_bits)
+
+
+@tf.function
+def _compute_clustered_weights(weight_rows, candidate_centroids):
+  """Clusters the weights with the centroids of every candidate.
+
+  The weights of every layer are independent of each other, so that all of
+  them are clustered in parallel.
+
+  Args:
+    weight_rows: list of (B, N) tensors, the weights to cluster with one set
+      of clustered values per row.
+    candidate_centroids: list of (M, B, K) tensors, the centroids of the M
+      candidate numbers of clusters of every weight, padded to K centroids.
+
+  Returns:
+    A list of pairs with the (M, B, N) clustered weights of every candidate
+    and their (M,) sums of squared errors.
+  """
+  results = []
+  for weights, centroids in zip(weight_rows, candidate_centroids):
+    centroids = tf.sort(centroids, axis=-1)
+    weights = tf.broadcast_to(
+        weights, tf.concat([tf.shape(centroids)[:1], tf.shape(weights)], 0))
+
+    # The nearest centroid of every weight is found by binary search over the
+    # midpoints between consecutive centroids
+    boundaries = (centroids[..., 1:] + centroids[..., :-1]) / 2
+    indices = tf.searchsorted(boundaries, weights)
+    clustered_weights = tf.gather(centroids, indices, batch_dims=2)
+
+    errors = tf.reduce_sum(tf.square(clustered_weights - weights), axis=[1, 2])
+    results.append((clustered_weights, errors))
+  return results
+
+
+def _allocate_number_of_clusters(sizes, errors, bits_budget):
+  """Selects the candidate of every layer minimizing the error in the budget.
+
+  Starting from the smallest candidate of every layer, the candidate with the
+  largest error reduction per additional bit is upgraded greedily, as long as
+  the total size stays within the budget.
+
+  Args:
+    sizes: list with the size in bits of every candidate of every layer, in
+      increasing order.
+    errors: list with the error of every candidate of every layer.
+    bits_budget: the total number of bits of all the layers.
+
+  Returns:
+    The index of the selected candidate of every layer.
+
+  Raises:
+    ValueError: if the smallest candidates do not fit in the budget.
+  """
+  selection = [0] * len(sizes)
+  total_size = sum(layer_sizes[0] for layer_sizes in sizes)
+  if total_size > bits_budget:
+    raise ValueError(
+        'The bits budget {} is smaller than the {} bits of the smallest '
+        'number of clusters of every layer.'.format(bits_budget, total_size))
+
+  while True:
+    best_upgrade = None
+    best_ratio = 0.
+    for layer_index, (layer_sizes, layer_errors) in enumerate(
+        zip(sizes, errors)):
+      current = selection[layer_index]
+      for candidate in range(current + 1, len(layer_sizes)):
+        extra_size = layer_sizes[candidate] - layer_sizes[current]
+        if total_size + extra_size > bits_budget:
+          break
+        ratio = (layer_errors[current] - layer_errors[candidate]) / extra_size
+        if ratio > best_ratio:
+          best_upgrade, best_ratio = (layer_index, candidate), ratio
+
+    if best_upgrade is None:
+      return selection
+
+    layer_index, candidate = best_upgrade
+    total_size += (sizes[layer_index][candidate] -
+                   sizes[layer_index][selection[layer_index]])
+    selection[layer_index] = candidate
+
+
+def _compute_activation_errors(model, clustered_layers, calibration_data):
+  """Returns the output error of every clustered candidate of every layer.
+
+  Args:
+    model: the `keras.Model` whose layers are clustered.
+    clustered_layers: list of (layer, weights, candidate_weights) tuples, with
+      the clusterable weights of the layer and, for every candidate, the list
+      of their clustered values.
+    calibration_data: iterable of batches of inputs of the model.
+
+  Returns:
+    The list of the output errors of the candidates of every layer.
+  """
+  layer_inputs_model = keras.Model(
+      model.inputs, [layer.input for layer, _, _ in clustered_layers])
+  errors = [[0.] * len(candidate_weights)
+            for _, _, candidate_weights in clustered_layers]
+
+  for inputs in calibration_data:
+    all_layer_inputs = layer_inputs_model(inputs, training=False)
+    if not isinstance(all_layer_inputs, (list, tuple)):
+      all_layer_inputs = [all_layer_inputs]
+
+    for layer_index, (layer, weights, candidate_weights) in enumerate(
+        clustered_layers):
+      layer_inputs = all_layer_inputs[layer_index]
+      original_values = [weight.read_value() for weight in weights]
+      outputs = layer(layer_inputs)
+      try:
+        for candidate, clustered_values in enumerate(candidate_weights):
+          for weight, value in zip(weights, clustered_values):
+            weight.assign(value)
+          errors[layer_index][candidate] += float(
+              tf.reduce_sum(tf.square(layer(layer_inputs) - outputs)))
+      finally:
+        for weight, value in zip(weights, original_values):
+          weight.assign(value)
+
+  return errors
+
+
+def select_number_of_clusters(
+    model,
+    bits_budget,
+    candidates=(4, 8, 16, 32, 64),
+    cluster_centroids_init=CentroidInitialization.KMEANS_PLUS_PLUS,
+    preserve_sparsity=False,
+    cluster_per_channel=False,
+    calibration_data=None):
+  """Selects the number of clusters of every layer under a size budget.
+
+  For every clusterable layer of the model and every candidate number of
+  clusters, the cluster centroids are initialized as `cluster_weights` would
+  and the weights are associated with their nearest centroid. The candidates
+  of all the layers are evaluated together. Then, the number of clusters of
+  every layer is chosen to minimize the total error, while the clustered
+  weights, stored as cluster indices and centroids, fit in `bits_budget`.
+
+  By default, the error of a candidate is the sum of the squared differences
+  between the original and clustered weights. When `calibration_data` is
+  given, it is the sum of the squared differences between the outputs of the
+  layer with the original and clustered weights instead.
+
+  Usage:
+
+  ```python
+  number_of_clusters = select_number_of_clusters(
+      model, bits_budget=8 * 1024 * 1024, candidates=(4, 8, 16, 32))
+  clustered_model = cluster_weights(
+      model,
+      number_of_clusters=number_of_clusters,
+      cluster_centroids_init=CentroidInitialization.KMEANS_PLUS_PLUS)
+  ```
+
+  Only the layers of the model itself are considered, not the layers of its
+  nested models. RNN and MultiHeadAttention layers are not considered.
+
+  Args:
+    model: a built `keras.Model` instance.
+    bits_budget: the maximum total size in bits of the clustered weights of
+      the considered layers.
+    candidates: the candidate numbers of clusters of every layer, greater
+      than 1, or than 2 with `preserve_sparsity`. The candidates with at
+      least as many clusters as weights are ignored.
+    cluster_centroids_init: `tfmot.clustering.keras.CentroidInitialization`
+      instance that determines how the cluster centroids are initialized.
+    preserve_sparsity: whether the zero centroid is preserved, as in
+      `cluster_weights`.
+    cluster_per_channel: whether the Conv2D layers are clustered per channel,
+      as in `cluster_weights`.
+    calibration_data: optional iterable of batches of inputs of the model, for
+      example a `tf.data.Dataset` without labels, used to measure the output
+      error of the layers. The model must then be a functional or
+      `keras.Sequential` model.
+
+  Returns:
+    A dict mapping the names of the layers to cluster to their numbers of
+    clusters, which can be passed as `number_of_clusters` to
+    `cluster_weights`. Layers without a usable candidate are not included.
+
+  Raises:
+    ValueError: if the candidates or the initialization are not supported, or
+    if the smallest candidates do not fit in the budget.
+  """
+  candidates = sorted(set(candidates))
+  # The bounds of the number of clusters of `ClusterWeights`
+  limit_number_of_clusters = 2 if preserve_sparsity else 1
+  if not candidates or any(
+      not isinstance(k, int) or k <= limit_number_of_clusters
+      for k in candidates):
+    raise ValueError(
+        'The candidate numbers of clusters must be integers greater than '
+        '{}: {} given.'.format(limit_number_of_clusters, candidates))
+  if not clustering_centroids.CentroidsInitializerFactory.init_is_supported(
+      cluster_centroids_init):
+    raise ValueError('Cluster centroid initialization {} not supported'.format(
+        cluster_centroids_init))
+  centroids_initializer = (
+      clustering_centroids.CentroidsInitializerFactory
+      .get_centroid_initializer(cluster_centroids_init))
+
+  layers = []
+  weight_rows = []
+  candidate_centroids = []
+  for layer in model.layers:
+    weights = [weight for _, weight in _get_clusterable_weights(layer)]
+    if not weights:
+      continue
+
+    per_channel = cluster_per_channel and isinstance(layer,
+                                                     keras.layers.Conv2D)
+    data_format = getattr(layer, 'data_format', 'channels_last')
+    rows = [_get_weight_rows(weight, per_channel, data_format)
+            for weight in weights]
+    layer_candidates = [
+        k for k in candidates if all(k < row.shape[1] for row in rows)]
+    if not layer_candidates:
+      continue
+
+    max_clusters = layer_candidates[-1]
+    for weight, row in zip(weights, rows):
+      padded_centroids = []
+      for k in layer_candidates:
+        centroids = tf.reshape(
+            centroids_initializer(weight, k, per_channel, data_format,
+                                  preserve_sparsity).get_cluster_centroids(),
+            [row.shape[0], k])
+        # Repeated centroids do not change the nearest centroids
+        padded_centroids.append(
+            tf.concat(
+                [centroids,
+                 tf.tile(centroids[:, -1:], [1, max_clusters - k])], axis=1))
+      weight_rows.append(row)
+      candidate_centroids.append(tf.stack(padded_centroids))
+
+    layers.append((layer, weights, rows, per_channel, data_format,
+                   layer_candidates))
+
+  results = iter(_compute_clustered_weights(weight_rows, candidate_centroids))
+
+  sizes = []
+  errors = []
+  clustered_layers = []
+  for layer, weights, rows, per_channel, data_format, layer_candidates in (
+      layers):
+    layer_errors = 0.
+    candidate_weights = [[] for _ in layer_candidates]
+    for weight, row in zip(weights, rows):
+      clustered_weights, weight_errors = next(results)
+      layer_errors += weight_errors.numpy()
+      if calibration_data is None:
+        continue
+      for candidate in range(len(layer_candidates)):
+        candidate_weights[candidate].append(
+            _restore_weight_shape(clustered_weights[candidate], weight,
+                                  per_channel, data_format))
+
+    sizes.append([
+        sum(_get_size_in_bits(weight, row.shape[0], k)
+            for weight, row in zip(weights, rows))
+        for k in layer_candidates
+    ])
+    errors.append(list(layer_errors))
+    clustered_layers.append((layer, weights, candidate_weights))
+
+  if calibration_data is not None and clustered_layers:
+    errors = _compute_activation_errors(model, clustered_layers,
+                                        calibration_data)
+
+  selection = _allocate_number_of_clusters(sizes, errors, bits_budget)
+  return {
+      layer.name: layer_candidates[candidate]
+      for (layer, _, _, _, _, layer_candidates), candidate in zip(
+          layers, selection)
+  }
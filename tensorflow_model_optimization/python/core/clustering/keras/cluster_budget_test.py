@@ -0,0 +1,116 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the selection of the number of clusters under a size budget."""
+
+from absl.testing import parameterized
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.clustering.keras import cluster
+from tensorflow_model_optimization.python.core.clustering.keras import cluster_budget
+from tensorflow_model_optimization.python.core.clustering.keras import cluster_config
+from tensorflow_model_optimization.python.core.clustering.keras import cluster_wrapper
+from tensorflow_model_optimization.python.core.keras.compat import keras
+
+
+CentroidInitialization = cluster_config.CentroidInitialization
+
+
+class ClusterBudgetTest(tf.test.TestCase, parameterized.TestCase):
+  """Unit tests for the cluster_budget module."""
+
+  def _get_model(self):
+    return keras.Sequential([
+        keras.layers.Dense(16, input_shape=(8,), name='dense_1'),
+        keras.layers.Flatten(),
+        keras.layers.Dense(4, name='dense_2'),
+    ])
+
+  def testAllocationPrefersLargestErrorReduction(self):
+    selection = cluster_budget._allocate_number_of_clusters(
+        sizes=[[10, 20, 30], [10, 20, 30]],
+        errors=[[100., 50., 40.], [100., 95., 80.]],
+        bits_budget=40)
+    self.assertEqual([2, 0], selection)
+
+  def testSmallBudgetIsNotSupported(self):
+    with self.assertRaises(ValueError):
+      cluster_budget.select_number_of_clusters(
+          self._get_model(), bits_budget=10, candidates=(2, 4))
+
+  @parameterized.parameters(((0, 4), False), ((1, 4), False),
+                            ((2, 4), True))
+  def testInvalidCandidatesAreNotSupported(self, candidates,
+                                           preserve_sparsity):
+    with self.assertRaises(ValueError):
+      cluster_budget.select_number_of_clusters(
+          self._get_model(),
+          bits_budget=10000,
+          candidates=candidates,
+          preserve_sparsity=preserve_sparsity)
+
+  def testSelectsLargestCandidatesWithLargeBudget(self):
+    model = self._get_model()
+    number_of_clusters = cluster_budget.select_number_of_clusters(
+        model,
+        bits_budget=10**6,
+        candidates=(2, 4, 16),
+        cluster_centroids_init=CentroidInitialization.LINEAR)
+    self.assertEqual({'dense_1': 16, 'dense_2': 16}, number_of_clusters)
+
+    clustered_model = cluster.cluster_weights(
+        model,
+        number_of_clusters=number_of_clusters,
+        cluster_centroids_init=CentroidInitialization.LINEAR)
+    self.assertIsInstance(clustered_model.layers[0],
+                          cluster_wrapper.ClusterWeights)
+    self.assertIsInstance(clustered_model.layers[2],
+                          cluster_wrapper.ClusterWeights)
+
+  def testSelectsSmallestCandidatesWithSmallestBudget(self):
+    # 128 and 64 one-bit indices with two 32-bit centroids each
+    number_of_clusters = cluster_budget.select_number_of_clusters(
+        self._get_model(),
+        bits_budget=128 + 64 + 2 * 2 * 32,
+        candidates=(2, 4, 16),
+        cluster_centroids_init=CentroidInitialization.LINEAR)
+    self.assertEqual({'dense_1': 2, 'dense_2': 2}, number_of_clusters)
+
+  @parameterized.parameters(False, True)
+  def testCalibrationDataKeepsWeights(self, cluster_per_channel):
+    model = keras.Sequential([
+        keras.layers.Conv2D(4, 3, input_shape=(6, 6, 2), name='conv'),
+        keras.layers.Flatten(),
+        keras.layers.Dense(3, name='dense'),
+    ])
+    original_weights = model.get_weights()
+    calibration_data = tf.data.Dataset.from_tensor_slices(
+        np.random.rand(8, 6, 6, 2).astype(np.float32)).batch(4)
+
+    number_of_clusters = cluster_budget.select_number_of_clusters(
+        model,
+        bits_budget=10**6,
+        candidates=(2, 4, 8),
+        cluster_centroids_init=CentroidInitialization.LINEAR,
+        cluster_per_channel=cluster_per_channel,
+        calibration_data=calibration_data)
+
+    self.assertEqual({'conv', 'dense'}, set(number_of_clusters))
+    for weight, original_weight in zip(model.get_weights(), original_weights):
+      self.assertAllEqual(original_weight, weight)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -30,11 +30,14 @@ class CentroidInitialization(str, enum.Enum):
        have. After this the corresponding X values are obtained and used to
        initialize the clusters centroids.
   * `KMEANS_PLUS_PLUS`: cluster centroids using the kmeans++ algorithm
+  * `KMEANS`: cluster centroids seeded with the kmeans++ algorithm and refined
+      with k-means iterations until they converge.
   """
   LINEAR = "CentroidInitialization.LINEAR"
   RANDOM = "CentroidInitialization.RANDOM"
   DENSITY_BASED = "CentroidInitialization.DENSITY_BASED"
   KMEANS_PLUS_PLUS = "CentroidInitialization.KMEANS_PLUS_PLUS"
+  KMEANS = "CentroidInitialization.KMEANS"
 
 
 class GradientAggregation(str, enum.Enum):
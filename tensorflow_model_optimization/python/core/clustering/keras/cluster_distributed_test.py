@@ -130,7 +130,7 @@ class ClusterDistributedTest(tf.test.TestCase, parameterized.TestCase):
 
       centroids1 = distribution.extended.update(
           centroids1, update_fn, args=(initial_val,))
-      l.call(tf.ones(shape=input_shape))
+      l.call(tf.ones(shape=input_shape), training=True)
 
       clst_indices = l.pulling_indices[weights_name]
       per_replica = distribution.experimental_local_results(clst_indices)
@@ -141,7 +141,7 @@ class ClusterDistributedTest(tf.test.TestCase, parameterized.TestCase):
       centroids2 = l.cluster_centroids[weights_name]
       centroids2 = distribution.extended.update(
           centroids2, update_fn, args=(second_val,))
-      l.call(tf.ones(shape=input_shape))
+      l.call(tf.ones(shape=input_shape), training=True)
 
       clst_indices = l.pulling_indices[weights_name]
       per_replica = distribution.experimental_local_results(clst_indices)
@@ -0,0 +1,80 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Multi-worker clustering test."""
+
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.clustering.keras import cluster
+from tensorflow_model_optimization.python.core.clustering.keras import cluster_config
+from tensorflow_model_optimization.python.core.clustering.keras.experimental import cluster as experimental_cluster
+from tensorflow_model_optimization.python.core.keras import test_utils as keras_test_utils
+from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.keras.testing import multi_worker_test_utils
+
+
+CentroidInitialization = cluster_config.CentroidInitialization
+
+_NUMBER_OF_CLUSTERS = 3
+
+
+# The functions run on the clusters are pickled, so they are defined at the
+# top level.
+
+
+def _train(strategy, use_dataset):
+  with strategy.scope():
+    model = experimental_cluster.cluster_weights(
+        keras_test_utils.build_simple_dense_model(),
+        number_of_clusters=_NUMBER_OF_CLUSTERS,
+        cluster_centroids_init=CentroidInitialization.LINEAR)
+    model.compile(loss='categorical_crossentropy', optimizer='sgd')
+
+  rng = np.random.RandomState(0)
+  x_train = rng.rand(40, 10).astype(np.float32)
+  y_train = keras.utils.to_categorical(rng.randint(5, size=(40, 1)), 5)
+  if use_dataset:
+    dataset = tf.data.Dataset.from_tensor_slices(
+        (x_train, y_train)).repeat().batch(10)
+    model.fit(dataset, epochs=2, steps_per_epoch=4)
+  else:
+    model.fit(x_train, y_train, batch_size=10, epochs=2)
+
+  stripped_model = cluster.strip_clustering(model)
+  return [layer.kernel.numpy() for layer in stripped_model.layers]
+
+
+class ClusterMultiWorkerTest(tf.test.TestCase):
+
+  def _assertClustered(self, kernels):
+    for kernel in kernels:
+      self.assertLessEqual(len(np.unique(kernel)), _NUMBER_OF_CLUSTERS)
+
+  def testMultiWorkerMirroredClustersSameWeightsOnEveryWorker(self):
+    worker_kernels = multi_worker_test_utils.run_multi_worker_mirrored(
+        _train, args=(False,))
+
+    self._assertClustered(worker_kernels[0])
+    for kernels in worker_kernels[1:]:
+      for kernel, expected_kernel in zip(kernels, worker_kernels[0]):
+        self.assertAllEqual(expected_kernel, kernel)
+
+  def testParameterServer(self):
+    self._assertClustered(
+        multi_worker_test_utils.run_parameter_server(_train, args=(True,)))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -470,6 +470,27 @@ class ClusterTest(test.TestCase, parameterized.TestCase):
     self.assertNotIsInstance(clustered_model.layers[3],
                              cluster_wrapper.ClusterWeights)
 
+  def testClusterModelWithPerLayerNumberOfClusters(self):
+    """Verifies that a dict of numbers of clusters clusters only its layers."""
+    model = keras.Sequential([
+        layers.Dense(10, input_shape=(10,), name='dense_1'),
+        layers.Dense(10, name='dense_2'),
+        layers.Dense(10, name='dense_3'),
+    ])
+    clustered_model = cluster.cluster_weights(
+        model,
+        number_of_clusters={'dense_1': 4, 'dense_3': 16},
+        cluster_centroids_init=cluster_config.CentroidInitialization.LINEAR)
+
+    self.assertIsInstance(clustered_model.layers[0],
+                          cluster_wrapper.ClusterWeights)
+    self.assertEqual(4, clustered_model.layers[0].number_of_clusters)
+    self.assertNotIsInstance(clustered_model.layers[1],
+                             cluster_wrapper.ClusterWeights)
+    self.assertIsInstance(clustered_model.layers[2],
+                          cluster_wrapper.ClusterWeights)
+    self.assertEqual(16, clustered_model.layers[2].number_of_clusters)
+
   def testClusterModelValidLayersSuccessful(self):
     """Verifies that clustering a sequential model results in all clusterable layers within the model being clustered."""
     model = keras.Sequential([
@@ -22,6 +22,8 @@ from tensorflow_model_optimization.python.core.clustering.keras import cluster_c
 from tensorflow_model_optimization.python.core.clustering.keras import clusterable_layer
 from tensorflow_model_optimization.python.core.clustering.keras import clustering_centroids
 from tensorflow_model_optimization.python.core.clustering.keras import clustering_registry
+from tensorflow_model_optimization.python.core.clustering.keras import clustering_schedule as clustering_sched
+from tensorflow_model_optimization.python.core.keras import utils
 from tensorflow_model_optimization.python.core.keras.compat import keras
 
 
@@ -53,6 +55,13 @@ class ClusterWeights(Wrapper):
   are initialized are passed in the wrapper's constructor.
 
   The initial values of cluster centroids are fine-tuned during the training.
+
+  The association of the weights to the cluster centroids is recomputed during
+  training in the steps selected by the `clustering_schedule`, which updates
+  them in every training step by default. In the other steps, and during
+  evaluation and inference, the last computed associations are reused. With
+  `preserve_sparsity`, the zero centroids are set back to zero together with
+  the associations only, and can drift in the other training steps.
   """
 
   def __init__(self,
@@ -62,6 +71,7 @@ class ClusterWeights(Wrapper):
                preserve_sparsity=False,
                cluster_per_channel=False,
                cluster_gradient_aggregation=GradientAggregation.SUM,
+               clustering_schedule=None,
                **kwargs):
     if not isinstance(layer, Layer):
       raise ValueError(
@@ -120,6 +130,14 @@ class ClusterWeights(Wrapper):
     # The way to aggregate the gradient of each cluster centroid
     self.cluster_gradient_aggregation = cluster_gradient_aggregation
 
+    # The training steps in which the cluster associations are updated
+    if clustering_schedule is None:
+      clustering_schedule = clustering_sched.ConstantFrequency()
+    self.clustering_schedule = clustering_schedule
+
+    # Counts the training steps, created in build if the schedule needs it
+    self.clustering_step = None
+
     # Stores the pairs of weight names and their respective sparsity masks
     self.sparsity_masks = {}
 
@@ -274,33 +292,42 @@ class ClusterWeights(Wrapper):
         self.zero_idx[weight_name] = tf.argmin(
             tf.abs(self.cluster_centroids[weight_name]), axis=-1)
 
-  def update_clustered_weights_associations(self):
+    if not self.clustering_schedule.updates_in_every_step():
+      # Add a scalar tracking the number of training steps of the wrapped
+      # layer. It is added after the other weights, and only when the schedule
+      # needs it, so that the weights saved without a schedule still load.
+      self.clustering_step = self.add_weight(
+          'clustering_step',
+          shape=[],
+          initializer=keras.initializers.get('zeros'),
+          dtype=tf.int64,
+          trainable=False,
+          # A single step, incremented once per training step: by the first
+          # replica of a mirrored training, and atomically on the parameter
+          # server by every worker of a parameter server training.
+          synchronization=tf.VariableSynchronization.ON_WRITE,
+          aggregation=tf.VariableAggregation.ONLY_FIRST_REPLICA,
+      )
+
+  def update_clustered_weights_associations(self, update_pulling_indices=True):
+    """Sets the clustered weights of the wrapped layer.
+
+    Args:
+      update_pulling_indices: A bool, or a bool tensor, whether to recompute
+        the associations of the weights to the cluster centroids. If False,
+        the last computed associations are used.
+    """
     for weight_name, original_weight in self.original_clusterable_weights.items(
     ):
 
       if self.preserve_sparsity:
-        # In the case of per-channel clustering, sparsity
-        # needs to be preserved per-channel
-        if self.cluster_per_channel:
-          for channel in range(self.num_channels):
-            zero_idx_mask = (
-                self._get_zero_idx_mask(
-                    self.cluster_centroids[weight_name][channel],
-                    self.cluster_centroids[weight_name][channel][
-                        self.zero_idx[weight_name][channel]]))
-            self.cluster_centroids[weight_name][channel].assign(
-                self._get_zero_centroid(
-                    self.cluster_centroids[weight_name][channel],
-                    zero_idx_mask))
-        else:
-          # Set the smallest centroid to zero to force sparsity
-          # and avoid extra cluster from forming
-          zero_idx_mask = self._get_zero_idx_mask(
-              self.cluster_centroids[weight_name],
-              self.cluster_centroids[weight_name][self.zero_idx[weight_name]])
-          self.cluster_centroids[weight_name].assign(
-              self._get_zero_centroid(self.cluster_centroids[weight_name],
-                                      zero_idx_mask))
+        # The zero centroids are only set again with the associations, so
+        # that the other calls don't write the centroids.
+        utils.smart_cond(
+            update_pulling_indices,
+            lambda weight_name=weight_name: self._set_zero_centroids(
+                weight_name),
+            tf.no_op)
 
         # During training, the original zero weights can drift slightly.
         # We want to prevent this by forcing them to stay zero at the places
@@ -309,10 +336,21 @@ class ClusterWeights(Wrapper):
                                            self.sparsity_masks[weight_name])
 
       # Update pulling indices (cluster associations)
-      pulling_indices = (
-          self.clustering_algorithms[weight_name].get_pulling_indices(
-              original_weight))
-      self.pulling_indices[weight_name].assign(pulling_indices)
+      def update_pulling_indices_fn(weight_name=weight_name,
+                                    original_weight=original_weight):
+        pulling_indices = (
+            self.clustering_algorithms[weight_name].get_pulling_indices(
+                original_weight))
+        with tf.control_dependencies(
+            [self.pulling_indices[weight_name].assign(pulling_indices)]):
+          return tf.identity(pulling_indices)
+
+      def read_pulling_indices_fn(weight_name=weight_name):
+        return tf.identity(self.pulling_indices[weight_name])
+
+      pulling_indices = utils.smart_cond(update_pulling_indices,
+                                         update_pulling_indices_fn,
+                                         read_pulling_indices_fn)
 
       # Update clustered weights
       clustered_weights = (
@@ -325,9 +363,54 @@ class ClusterWeights(Wrapper):
       self.set_weight_to_layer(weight_name,
                                clustered_weights)
 
+  def _set_zero_centroids(self, weight_name):
+    """Sets the zero centroids of a weight to zero to preserve its sparsity."""
+    if self.cluster_per_channel:
+      # In the case of per-channel clustering, sparsity needs to be preserved
+      # per-channel. The zero centroids of all the channels are gathered and
+      # set to zero at once.
+      zero_centroids = tf.gather(
+          self.cluster_centroids[weight_name],
+          self.zero_idx[weight_name],
+          batch_dims=1)
+      zero_idx_mask = self._get_zero_idx_mask(
+          self.cluster_centroids[weight_name],
+          tf.expand_dims(zero_centroids, axis=-1))
+    else:
+      # Set the smallest centroid to zero to force sparsity
+      # and avoid extra cluster from forming
+      zero_idx_mask = self._get_zero_idx_mask(
+          self.cluster_centroids[weight_name],
+          self.cluster_centroids[weight_name][self.zero_idx[weight_name]])
+    with tf.control_dependencies([
+        self.cluster_centroids[weight_name].assign(
+            self._get_zero_centroid(self.cluster_centroids[weight_name],
+                                    zero_idx_mask))
+    ]):
+      return tf.no_op('set_zero_centroids')
+
   def call(self, inputs, training=None, **kwargs):
-    # Update cluster associations in order to set the latest weights
-    self.update_clustered_weights_associations()
+    if training is None:
+      training = k.learning_phase()
+
+    def should_update_in_training():
+      if self.clustering_step is None:
+        return tf.constant(True)
+      # Reads the step with its increment, which is atomic on the parameter
+      # server, so that the workers of a parameter server training never see
+      # the same step and update the associations once per scheduled step.
+      step = tf.identity(self.clustering_step.assign_add(1)) - 1
+      return tf.identity(self.clustering_schedule(step))
+
+    def should_not_update():
+      return tf.constant(False)
+
+    # Update cluster associations in the training steps selected by the
+    # schedule, and set the clustered weights from the latest associations
+    update_pulling_indices = utils.smart_cond(training,
+                                              should_update_in_training,
+                                              should_not_update)
+    self.update_clustered_weights_associations(update_pulling_indices)
 
     return self.layer.call(inputs, **kwargs)
 
@@ -342,6 +425,7 @@ class ClusterWeights(Wrapper):
         'preserve_sparsity': self.preserve_sparsity,
         'cluster_gradient_aggregation': self.cluster_gradient_aggregation,
         'cluster_per_channel': self.cluster_per_channel,
+        'clustering_schedule': self.clustering_schedule.get_config(),
         **base_config
     }
     return config
@@ -363,6 +447,16 @@ class ClusterWeights(Wrapper):
     config['cluster_gradient_aggregation'] = cluster_gradient_aggregation
     config['cluster_per_channel'] = cluster_per_channel
 
+    # Models saved before the schedule was introduced keep the default one
+    if 'clustering_schedule' in config:
+      deserialize_keras_object = keras.utils.deserialize_keras_object
+      config['clustering_schedule'] = deserialize_keras_object(
+          config.pop('clustering_schedule'),
+          module_objects=globals(),
+          custom_objects={
+              'ConstantFrequency': clustering_sched.ConstantFrequency,
+          })
+
     layer = keras.layers.deserialize(
         config.pop('layer'), custom_objects=custom_objects
     )
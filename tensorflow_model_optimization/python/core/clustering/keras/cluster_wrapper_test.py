@@ -25,6 +25,7 @@ from tensorflow_model_optimization.python.core.clustering.keras import cluster
 from tensorflow_model_optimization.python.core.clustering.keras import cluster_config
 from tensorflow_model_optimization.python.core.clustering.keras import cluster_wrapper
 from tensorflow_model_optimization.python.core.clustering.keras import clusterable_layer
+from tensorflow_model_optimization.python.core.clustering.keras import clustering_schedule
 from tensorflow_model_optimization.python.core.keras.compat import keras
 
 
@@ -208,7 +209,7 @@ class ClusterWeightsTest(test.TestCase, parameterized.TestCase):
     centroids[1].assign(mean_weight + 2.0 * max_dist)
 
     # Update associations of weights to centroids
-    l.call(tf.ones(shape=input_shape))
+    l.call(tf.ones(shape=input_shape), training=True)
 
     # Weights should now be all clustered with the centroid 0
     assert_all_weights_associated(l.layer.kernel, centroid_index=0)
@@ -218,11 +219,125 @@ class ClusterWeightsTest(test.TestCase, parameterized.TestCase):
     centroids[1].assign(mean_weight)
 
     # Update associations of weights to centroids
-    l.call(tf.ones(shape=input_shape))
+    l.call(tf.ones(shape=input_shape), training=True)
 
     # Weights should now be all clustered with the centroid 1
     assert_all_weights_associated(l.layer.kernel, centroid_index=1)
 
+  def testClusterReassociationFollowsSchedule(self):
+    """Verifies that the associations are only updated in the training steps selected by the clustering schedule."""
+    input_shape = (1, 2,)
+    l = cluster_wrapper.ClusterWeights(
+        keras.layers.Dense(8, input_shape=input_shape),
+        number_of_clusters=2,
+        clustering_schedule=clustering_schedule.ConstantFrequency(
+            frequency=2),
+    )
+    l.build(input_shape)
+    centroids = l.cluster_centroids['kernel']
+    pulling_indices = l.pulling_indices['kernel']
+
+    mean_weight = tf.reduce_mean(l.layer.kernel)
+    max_dist = tf.reduce_max(l.layer.kernel) - tf.reduce_min(l.layer.kernel)
+
+    def associate_all_weights_with(centroid_index):
+      """Sets the centroids so that all weights are closest to one of them."""
+      centroids[centroid_index].assign(mean_weight)
+      centroids[1 - centroid_index].assign(mean_weight + 2.0 * max_dist)
+
+    # Step 0 updates the associations
+    associate_all_weights_with(0)
+    l.call(tf.ones(shape=input_shape), training=True)
+    self.assertAllEqual(pulling_indices, tf.zeros_like(pulling_indices))
+
+    # Step 1, evaluation and inference reuse the last associations
+    associate_all_weights_with(1)
+    l.call(tf.ones(shape=input_shape), training=True)
+    self.assertAllEqual(pulling_indices, tf.zeros_like(pulling_indices))
+    l.call(tf.ones(shape=input_shape), training=False)
+    self.assertAllEqual(pulling_indices, tf.zeros_like(pulling_indices))
+    # The clustered weights still follow the latest centroid values
+    self.assertAllEqual(l.layer.kernel,
+                        tf.fill(l.layer.kernel.shape, centroids[0]))
+
+    # Step 2 updates the associations
+    l.call(tf.ones(shape=input_shape), training=True)
+    self.assertAllEqual(pulling_indices, tf.ones_like(pulling_indices))
+    self.assertEqual(self.evaluate(l.clustering_step), 3)
+
+  def testZeroCentroidIsOnlySetWithAssociations(self):
+    """Verifies that the zero centroid is only written when the associations are updated."""
+    input_shape = (1, 4)
+    layer = keras.layers.Dense(4, input_shape=input_shape)
+    layer.build(input_shape)
+    # Half of the weights are pruned
+    layer.kernel.assign(
+        tf.constant([[0., 1., 0., 2.], [3., 0., 4., 0.],
+                     [0., 5., 0., 6.], [7., 0., 8., 0.]]))
+    l = cluster_wrapper.ClusterWeights(
+        layer, number_of_clusters=3, preserve_sparsity=True)
+    l.build(input_shape)
+    centroids = l.cluster_centroids['kernel']
+    zero_idx = self.evaluate(l.zero_idx['kernel'])
+    self.assertEqual(self.evaluate(centroids[zero_idx]), 0.)
+
+    centroids[zero_idx].assign(0.5)
+    l.call(tf.ones(shape=input_shape), training=False)
+    self.assertEqual(self.evaluate(centroids[zero_idx]), 0.5)
+
+    l.call(tf.ones(shape=input_shape), training=True)
+    self.assertEqual(self.evaluate(centroids[zero_idx]), 0.)
+
+  def testClusteringScheduleIsSerialised(self):
+    """Verifies that the clustering schedule is preserved in the config."""
+    l = cluster_wrapper.ClusterWeights(
+        keras.layers.Dense(8, input_shape=(2,)),
+        number_of_clusters=2,
+        clustering_schedule=clustering_schedule.ConstantFrequency(
+            frequency=10, begin_step=5, end_step=100),
+    )
+
+    loaded_layer = cluster_wrapper.ClusterWeights.from_config(l.get_config())
+
+    self.assertIsInstance(loaded_layer.clustering_schedule,
+                          clustering_schedule.ConstantFrequency)
+    self.assertEqual(l.clustering_schedule.__dict__,
+                     loaded_layer.clustering_schedule.__dict__)
+
+  def testLoadsWeightsSavedWithoutClusteringSchedule(self):
+    """Verifies that the weights saved before the clustering schedule load."""
+
+    class ClusteredDenseWithoutSchedule(keras.layers.Layer):
+      """Has the weights of a clustered Dense without clustering schedule."""
+
+      def build(self, input_shape):
+        self.bias = self.add_weight(
+            'bias', shape=(8,), initializer='random_normal')
+        self.kernel = self.add_weight(
+            'kernel', shape=(2, 8), initializer='random_normal')
+        self.cluster_centroids = self.add_weight(
+            'cluster_centroids_kernel', shape=(2,),
+            initializer='random_normal')
+        self.pulling_indices = self.add_weight(
+            'pulling_indices_kernel', shape=(2, 8), dtype=tf.int64,
+            initializer=keras.initializers.Constant(1), trainable=False)
+
+    saved_model = keras.Sequential(
+        [keras.Input((2,)), ClusteredDenseWithoutSchedule()])
+    model = keras.Sequential([
+        keras.Input((2,)),
+        cluster_wrapper.ClusterWeights(
+            keras.layers.Dense(8), number_of_clusters=2)
+    ])
+    with tempfile.TemporaryDirectory() as tmp_dir_name:
+      weights_file = os.path.join(tmp_dir_name, 'weights.h5')
+      saved_model.save_weights(weights_file)
+      model.load_weights(weights_file)
+
+    for weight, saved_weight in zip(model.layers[0].weights,
+                                    saved_model.layers[0].weights):
+      self.assertAllEqual(saved_weight, weight)
+
   def testSameWeightsAreReturnedBeforeAndAfterSerialisation(self):
     """Verify weights of cluster_wrapper are the same after serialisation."""
     # Create a dummy layer for this test
@@ -27,9 +27,9 @@ from tensorflow_model_optimization.python.core.clustering.keras.cluster_config i
 class ClusteringAlgorithm(object):
   """Class to implement highly efficient vectorised look-ups.
 
-    We do not utilise looping for that purpose, instead we `smartly` reshape and
-    tile arrays. The trade-off is that we are potentially using way more memory
-    than we would have if looping is used.
+    We do not utilise looping for that purpose, instead we `smartly` reshape
+    arrays, and find the closest centroids with a binary search in the sorted
+    centroids.
 
     Each class that inherits from this class is supposed to implement a
     particular lookup function for a certain shape.
@@ -127,17 +127,68 @@ class ClusteringAlgorithm(object):
       tf.int32. The returned array contain weight lookup indices
     """
 
+    weight = tf.convert_to_tensor(weight)
     cluster_centroids = centroids if centroids is not None else (
         self.cluster_centroids)
 
     # We find the nearest cluster centroids and store them so that ops can build
     # their kernels upon it.
-    pulling_indices = tf.argmin(
-        tf.abs(tf.expand_dims(weight, axis=-1) - cluster_centroids),
-        axis=-1)
+    pulling_indices = self._get_nearest_centroid_indices(
+        tf.reshape(weight, (1, -1)), tf.reshape(cluster_centroids, (1, -1)))
+    pulling_indices = tf.reshape(pulling_indices, tf.shape(weight))
+    pulling_indices.set_shape(weight.shape)
 
     return pulling_indices
 
+  def _get_nearest_centroid_indices(self, weight, cluster_centroids):
+    """Returns the indices of the closest centroids of batches of weights.
+
+    The centroids are sorted, and the two centroids around each weight are
+    found with a binary search. For N weights and K centroids, this takes
+    O(N log K) time and O(N) memory, instead of the O(N * K) memory of the
+    distances from every weight to every centroid.
+
+    Ties are broken as `tf.argmin` over those distances would: towards the
+    centroid with the lowest index.
+
+    Args:
+      weight: Tensor of shape (B, N) of B batches of N weights.
+      cluster_centroids: Tensor of shape (B, K) with the K centroids of every
+        batch of weights.
+
+    Returns:
+      Tensor of shape (B, N) and type tf.int64 with the index of the closest
+      centroid of every weight.
+    """
+    order = tf.argsort(cluster_centroids, axis=-1, stable=True)
+    sorted_centroids = tf.gather(cluster_centroids, order, batch_dims=1)
+    # The stable sort keeps equal centroids in order of their index. The lowest
+    # index of every centroid value is the one of its first occurrence.
+    first_equal = tf.searchsorted(
+        sorted_centroids, sorted_centroids, side="left")
+    sorted_indices = tf.gather(order, first_equal, batch_dims=1)
+
+    # The closest centroid is either the first centroid not less than the
+    # weight, or the one before it.
+    num_centroids = tf.shape(sorted_centroids)[-1]
+    upper = tf.searchsorted(sorted_centroids, weight, side="left")
+    lower = tf.maximum(upper - 1, 0)
+    upper = tf.minimum(upper, num_centroids - 1)
+
+    lower_distance = tf.abs(
+        weight - tf.gather(sorted_centroids, lower, batch_dims=1))
+    upper_distance = tf.abs(
+        weight - tf.gather(sorted_centroids, upper, batch_dims=1))
+    lower_index = tf.gather(sorted_indices, lower, batch_dims=1)
+    upper_index = tf.gather(sorted_indices, upper, batch_dims=1)
+
+    pulling_indices = tf.where(
+        lower_distance < upper_distance, lower_index,
+        tf.where(upper_distance < lower_distance, upper_index,
+                 tf.minimum(lower_index, upper_index)))
+
+    return tf.cast(pulling_indices, tf.int64)
+
   def get_clustered_weight(self, pulling_indices, original_weight):
     """Returns clustered weights with custom gradients.
 
@@ -195,14 +246,31 @@ class ClusteringAlgorithm(object):
 
 
 class ClusteringAlgorithmPerChannel(ClusteringAlgorithm):
-  """Class for Per-channel clustering of Conv2D layers."""
+  """Class for Per-channel clustering of Conv2D layers.
+
+  All the channels are processed at once: the weights are transposed so that
+  the channel is the first dimension, and the look-ups are batched over it.
+  """
+
+  def _channels_first_perm(self):
+    """Returns the permutation which moves the channel dimension first."""
+    if self.data_format == "channels_first":
+      return (1, 0, 2, 3)
+    return (3, 0, 1, 2)
+
+  def _channels_back_perm(self):
+    """Returns the inverse of the permutation of `_channels_first_perm`."""
+    if self.data_format == "channels_first":
+      return (1, 0, 2, 3)
+    return (1, 2, 3, 0)
 
   def get_pulling_indices(self, weight):
     """Returns indices of closest cluster centroids.
 
     This function is based on the function get_pulling_indices
-    of the base class ClusteringAlgorithm. We apply each per
-    channel of the convolutional layer.
+    of the base class ClusteringAlgorithm. We apply it to all the
+    channels of the convolutional layer at once, each channel with
+    its own centroids.
 
     Args:
       weight: ND array of weights. For each weight in this array the closest
@@ -212,26 +280,19 @@ class ClusteringAlgorithmPerChannel(ClusteringAlgorithm):
       ND array of the same shape as `weight` parameter of the type
       tf.int32. The returned array contain weight lookup indices.
     """
-    channel_indices = []
-
-    num_channels = (weight.shape[1] if self.data_format == "channels_first"
-                    else weight.shape[-1])
-
-    for channel in range(num_channels):
-      channel_weights = (
-          weight[:, channel, :, :]
-          if self.data_format == "channels_first" else weight[:, :, :, channel])
-      channel_centroids = self.cluster_centroids[channel]
-      pulling_indices = super().get_pulling_indices(channel_weights,
-                                                    channel_centroids)
-
-      channel_indices.append(pulling_indices)
-
-    pulling_indices = tf.convert_to_tensor(channel_indices)
+    weight = tf.convert_to_tensor(weight)
+    channel_weights = tf.transpose(weight, perm=self._channels_first_perm())
+    num_channels = tf.shape(channel_weights)[0]
+
+    # The weights of every channel are looked up in the centroids of the
+    # channel, which are the rows of the (C, K) centroids.
+    pulling_indices = self._get_nearest_centroid_indices(
+        tf.reshape(channel_weights, (num_channels, -1)),
+        self.cluster_centroids)
+    pulling_indices = tf.reshape(pulling_indices, tf.shape(channel_weights))
     pulling_indices = tf.transpose(
-        pulling_indices,
-        perm=(1, 0, 2, 3) if self.data_format == "channels_first" else
-        (1, 2, 3, 0))
+        pulling_indices, perm=self._channels_back_perm())
+    pulling_indices.set_shape(weight.shape)
 
     return pulling_indices
 
@@ -239,8 +300,8 @@ class ClusteringAlgorithmPerChannel(ClusteringAlgorithm):
     """Returns clustered weights with custom gradients.
 
     Take indices the per-channel pulling_indices as input and retrieve
-    the corresponding clustered weights by using the gather operation
-    for each of the channels.
+    the corresponding clustered weights by using a gather operation
+    batched over the channels.
     The original gradients will also be modified in two ways:
     - By averaging the gradient of cluster_centroids based on the size of
       each cluster.
@@ -256,34 +317,30 @@ class ClusteringAlgorithmPerChannel(ClusteringAlgorithm):
       is a member of self.cluster_centroids. The backward pass is modified by
       adding custom gradients.
     """
-    num_channels = (
-        original_weight.shape[1]
-        if self.data_format == "channels_first" else original_weight.shape[-1])
-
     # In case of channels_last, we have NHWC.
     # In case of channels_first, we have NCHW.
     # We need to transpose the tensor, so C is the first dimension
-    # and then we could loop over channels
-    pulling_indices = (
-        tf.transpose(
-            pulling_indices,
-            perm=(1, 0, 2, 3) if self.data_format == "channels_first" else
-            (3, 0, 1, 2)))
+    # and the look-ups can be batched over the channels.
+    pulling_indices = tf.transpose(
+        pulling_indices, perm=self._channels_first_perm())
 
     if self.cluster_gradient_aggregation == GradientAggregation.SUM:
       cluster_centroids = self.cluster_centroids
     elif self.cluster_gradient_aggregation == GradientAggregation.AVG:
-      cluster_sizes = []
-      for i in range(num_channels):
-        # Compute the size of each cluster for each channel
-        # (number of weights belonging to each cluster)
-        cluster_sizes.append(tf.math.bincount(
-            arr=tf.cast(pulling_indices[i], dtype=tf.int32),
-            minlength=tf.size(self.cluster_centroids[i]),
-            dtype=self.cluster_centroids.dtype,
-            ))
-
-      cluster_sizes = tf.convert_to_tensor(cluster_sizes)
+      # Compute the size of each cluster for each channel
+      # (number of weights belonging to each cluster) with a single bincount,
+      # by offsetting the indices of every channel by its number of clusters.
+      num_channels = tf.shape(self.cluster_centroids)[0]
+      num_clusters = tf.shape(self.cluster_centroids)[1]
+      channel_offsets = tf.reshape(
+          tf.range(num_channels) * num_clusters, (-1, 1, 1, 1))
+      cluster_sizes = tf.math.bincount(
+          arr=tf.cast(pulling_indices, dtype=tf.int32) + channel_offsets,
+          minlength=num_channels * num_clusters,
+          dtype=self.cluster_centroids.dtype,
+      )
+      cluster_sizes = tf.reshape(cluster_sizes,
+                                 (num_channels, num_clusters))
 
       # Modify the gradient of cluster_centroids to be averaged by cluster sizes
       cluster_centroids = self.average_centroids_gradient_by_cluster_size(
@@ -294,20 +351,13 @@ class ClusteringAlgorithmPerChannel(ClusteringAlgorithm):
       raise ValueError(f"self.cluster_gradient_aggregation="
                        f"{self.cluster_gradient_aggregation} not implemented.")
 
-    clustered_weights = []
-
-    for i in range(num_channels):
-      clustered_weights.append(
-          tf.gather(cluster_centroids[i], pulling_indices[i]))
-
-    clustered_weight = tf.convert_to_tensor(clustered_weights)
+    clustered_weight = tf.gather(
+        cluster_centroids, pulling_indices, batch_dims=1)
 
     # Permute weights to ensure the channels are first or last, as expected
     # based on the data_format attribute
-    clustered_weight = (
-        tf.transpose(clustered_weights, perm=[1, 0, 2, 3])
-        if self.data_format == "channels_first" else tf.transpose(
-            clustered_weights, perm=[1, 2, 3, 0]))
+    clustered_weight = tf.transpose(
+        clustered_weight, perm=self._channels_back_perm())
 
     # Add an estimated gradient to the original weight
     clustered_weight = self.add_gradient_to_original_weight(
@@ -16,6 +16,8 @@
 
 import tensorflow as tf
 
+from tensorflow_model_optimization.python.core.clustering.keras import cluster_wrapper
+from tensorflow_model_optimization.python.core.clustering.keras import clustering_algorithm
 from tensorflow_model_optimization.python.core.keras import compat
 from tensorflow_model_optimization.python.core.keras.compat import keras
 
@@ -26,14 +28,36 @@ class ClusteringSummaries(keras.callbacks.TensorBoard):
   This class is derived from keras.callbacks.TensorBoard and just adds
   functionality to write histograms with batch-wise frequency.
 
+  In the `'stats'` summary mode, the histograms of all the variables of the
+  clustered layers are replaced by statistics computed in the graph for every
+  clustered weight, so that only a few values are copied to the host:
+  * `occupancy`: histogram of the fraction of the weights in every cluster.
+  * `empty_clusters`: number of clusters without weights.
+  * `centroid_drift`: mean absolute change of the centroids since the last
+    summary.
+  * `mean_assignment_distance`: mean absolute distance between the weights and
+    their centroids.
+  * `weights_sample`: optional histogram of a random sample of the weights.
+
   Arguments:
       log_dir: The path to the directory where the log files are saved
       cluster_update_freq: determines the frequency of updates of the clustering
         histograms. Same behaviour as parameter update_freq of the base class,
         i.e. it accepts `'batch'`, `'epoch'` or integer.
+      summary_mode: `'histograms'` to write the histograms of all the variables
+        of the clustered layers, or `'stats'` to write the clustering
+        statistics.
+      histogram_sample_size: number of weights sampled for the histogram of
+        every clustered weight in the `'stats'` summary mode. `0` disables the
+        histogram.
   """
 
-  def __init__(self, log_dir='logs', cluster_update_freq='epoch', **kwargs):
+  def __init__(self,
+               log_dir='logs',
+               cluster_update_freq='epoch',
+               summary_mode='histograms',
+               histogram_sample_size=0,
+               **kwargs):
     super(ClusteringSummaries, self).__init__(log_dir=log_dir, **kwargs)
 
     if not isinstance(log_dir, str) or not log_dir:
@@ -41,6 +65,18 @@ class ClusteringSummaries(keras.callbacks.TensorBoard):
           '`log_dir` must be a non-empty string. You passed `log_dir`='
           '{input}.'.format(input=log_dir))
 
+    if summary_mode not in ('histograms', 'stats'):
+      raise ValueError(
+          '`summary_mode` must be `histograms` or `stats`. You passed '
+          '`summary_mode`={input}.'.format(input=summary_mode))
+
+    self.summary_mode = summary_mode
+    self.histogram_sample_size = histogram_sample_size
+
+    # Centroids at the last summary, by layer and weight names
+    self._previous_centroids = {}
+    self._compute_stats = tf.function(self._compute_clustering_stats)
+
     self.cluster_update_freq = (1 if cluster_update_freq == 'batch' else
                                 cluster_update_freq)
 
@@ -77,18 +113,119 @@ class ClusteringSummaries(keras.callbacks.TensorBoard):
     if self.cluster_update_freq == 'epoch':
       self._write_summary()
 
+  def _get_clustered_layers(self):
+    for layer in self.model.layers:
+      if not hasattr(layer, 'layer') or not hasattr(
+          layer.layer, 'get_clusterable_weights'):
+        continue  # skip layer
+      clusterable_weights = layer.layer.get_clusterable_weights()
+      if len(clusterable_weights) < 1:
+        continue  # skip layers without clusterable weights
+      yield layer
+
   def _write_summary(self):
+    if self.summary_mode == 'stats':
+      self._write_stats_summary()
+      return
+
     with self.writer.as_default():
-      for layer in self.model.layers:
-        if not hasattr(layer, 'layer') or not hasattr(
-            layer.layer, 'get_clusterable_weights'):
-          continue  # skip layer
-        clusterable_weights = layer.layer.get_clusterable_weights()
-        if len(clusterable_weights) < 1:
-          continue  # skip layers without clusterable weights
+      for layer in self._get_clustered_layers():
         prefix = 'clustering/'
         # Log variables
         for var in layer.variables:
           success = tf.summary.histogram(
               prefix + var.name, var, step=self.continuous_batch)
           assert success
+
+  def _compute_clustering_stats(self, original_weight, centroids,
+                                pulling_indices, previous_centroids,
+                                channels_first_perm):
+    """Computes the clustering statistics of one clustered weight.
+
+    Args:
+      original_weight: the weights before clustering.
+      centroids: the cluster centroids, of shape (C, K) for per-channel
+        clustering and (K,) otherwise.
+      pulling_indices: the index of the centroid of every weight.
+      previous_centroids: variable holding the centroids at the last summary,
+        updated to the current centroids.
+      channels_first_perm: permutation moving the channels of the weights
+        first for per-channel clustering, None otherwise.
+
+    Returns:
+      A dict of the statistics.
+    """
+    # Lay the weights and indices out as one row per set of centroids
+    centroids_rows = tf.reshape(centroids, [-1, centroids.shape[-1]])
+    num_rows, num_clusters = centroids_rows.shape
+    if channels_first_perm is not None:
+      original_weight = tf.transpose(original_weight, perm=channels_first_perm)
+      pulling_indices = tf.transpose(pulling_indices, perm=channels_first_perm)
+    weight_rows = tf.reshape(original_weight, [num_rows, -1])
+    index_rows = tf.cast(tf.reshape(pulling_indices, [num_rows, -1]), tf.int32)
+
+    # Count the weights of every cluster of every row at once
+    cluster_ids = index_rows + tf.range(num_rows)[:, tf.newaxis] * num_clusters
+    cluster_sizes = tf.math.bincount(
+        tf.reshape(cluster_ids, [-1]),
+        minlength=num_rows * num_clusters,
+        maxlength=num_rows * num_clusters)
+
+    clustered_weight_rows = tf.gather(centroids_rows, index_rows, batch_dims=1)
+
+    stats = {
+        'occupancy':
+            tf.cast(cluster_sizes, tf.float32) /
+            tf.cast(tf.shape(index_rows)[1], tf.float32),
+        'empty_clusters':
+            tf.math.count_nonzero(tf.math.equal(cluster_sizes, 0)),
+        'centroid_drift':
+            tf.reduce_mean(tf.math.abs(centroids - previous_centroids)),
+        'mean_assignment_distance':
+            tf.reduce_mean(tf.math.abs(weight_rows - clustered_weight_rows)),
+    }
+    if self.histogram_sample_size:
+      flat_weight = tf.reshape(original_weight, [-1])
+      stats['weights_sample'] = tf.gather(
+          flat_weight,
+          tf.random.uniform([self.histogram_sample_size],
+                            maxval=tf.size(flat_weight),
+                            dtype=tf.int32))
+
+    with tf.control_dependencies(list(stats.values())):
+      previous_centroids.assign(centroids)
+    return stats
+
+  def _write_stats_summary(self):
+    with self.writer.as_default():
+      for layer in self._get_clustered_layers():
+        if not isinstance(layer, cluster_wrapper.ClusterWeights):
+          continue  # skip layers without clustering state
+        for weight_name, original_weight in (
+            layer.original_clusterable_weights.items()):
+          centroids = layer.cluster_centroids[weight_name]
+          key = (layer.name, weight_name)
+          if key not in self._previous_centroids:
+            self._previous_centroids[key] = tf.Variable(
+                centroids, trainable=False)
+
+          algorithm = layer.clustering_algorithms[weight_name]
+          channels_first_perm = (
+              algorithm._channels_first_perm()  # pylint: disable=protected-access
+              if isinstance(algorithm,
+                            clustering_algorithm.ClusteringAlgorithmPerChannel)
+              else None)
+          stats = self._compute_stats(original_weight, centroids,
+                                      layer.pulling_indices[weight_name],
+                                      self._previous_centroids[key],
+                                      channels_first_perm)
+
+          prefix = 'clustering/{}/{}/'.format(layer.name, weight_name)
+          for stat_name, value in stats.items():
+            if value.shape.rank:
+              success = tf.summary.histogram(
+                  prefix + stat_name, value, step=self.continuous_batch)
+            else:
+              success = tf.summary.scalar(
+                  prefix + stat_name, value, step=self.continuous_batch)
+            assert success
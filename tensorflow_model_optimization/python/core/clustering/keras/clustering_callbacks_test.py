@@ -0,0 +1,107 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for Clustering callbacks."""
+
+import glob
+import os
+import tempfile
+
+from absl.testing import parameterized
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.clustering.keras import cluster
+from tensorflow_model_optimization.python.core.clustering.keras import cluster_config
+from tensorflow_model_optimization.python.core.clustering.keras import clustering_callbacks
+from tensorflow_model_optimization.python.core.keras.compat import keras
+
+
+CentroidInitialization = cluster_config.CentroidInitialization
+
+
+class ClusteringSummariesTest(tf.test.TestCase, parameterized.TestCase):
+
+  def _get_summary_tags(self, log_dir):
+    tags = set()
+    for event_file in glob.glob(os.path.join(log_dir, 'events.out.tfevents*')):
+      for event in tf.compat.v1.train.summary_iterator(event_file):
+        tags.update(value.tag for value in event.summary.value)
+    return tags
+
+  def testUnknownSummaryModeIsNotSupported(self):
+    with self.assertRaises(ValueError):
+      clustering_callbacks.ClusteringSummaries(
+          log_dir=tempfile.mkdtemp(), summary_mode='DEADBEEF')
+
+  @parameterized.parameters(False, True)
+  def testWritesStatsSummaries(self, cluster_per_channel):
+    log_dir = tempfile.mkdtemp()
+    clustered_model = cluster.cluster_weights(
+        keras.Sequential([
+            keras.layers.Conv2D(4, 3, input_shape=(5, 5, 2), name='conv'),
+            keras.layers.Flatten(),
+        ]),
+        number_of_clusters=4,
+        cluster_centroids_init=CentroidInitialization.LINEAR,
+        cluster_per_channel=cluster_per_channel)
+    clustered_model.compile(loss='mse', optimizer='sgd')
+
+    clustered_model.fit(
+        np.random.rand(4, 5, 5, 2),
+        np.random.rand(4, 36),
+        batch_size=2,
+        epochs=2,
+        callbacks=[
+            clustering_callbacks.ClusteringSummaries(
+                log_dir=log_dir,
+                cluster_update_freq='batch',
+                summary_mode='stats',
+                histogram_sample_size=8)
+        ])
+
+    prefix = 'clustering/cluster_conv/kernel/'
+    self.assertContainsSubset([
+        prefix + 'occupancy', prefix + 'empty_clusters',
+        prefix + 'centroid_drift', prefix + 'mean_assignment_distance',
+        prefix + 'weights_sample'
+    ], self._get_summary_tags(log_dir))
+
+  def testComputesStats(self):
+    clustered_model = cluster.cluster_weights(
+        keras.Sequential([keras.layers.Dense(3, input_shape=(2,))]),
+        number_of_clusters=4,
+        cluster_centroids_init=CentroidInitialization.LINEAR)
+    layer = clustered_model.layers[0]
+    kernel = layer.original_clusterable_weights['kernel']
+    kernel.assign([[0., 0., 0.], [0., 0., 3.]])
+    layer.cluster_centroids['kernel'].assign([0., 1., 2., 3.])
+    layer.pulling_indices['kernel'].assign([[0, 0, 0], [0, 0, 3]])
+    previous_centroids = tf.Variable([0., 1., 1., 1.])
+
+    callback = clustering_callbacks.ClusteringSummaries(
+        log_dir=tempfile.mkdtemp(), summary_mode='stats')
+    stats = callback._compute_stats(kernel, layer.cluster_centroids['kernel'],
+                                    layer.pulling_indices['kernel'],
+                                    previous_centroids, None)
+
+    self.assertAllClose([5. / 6., 0., 0., 1. / 6.], stats['occupancy'])
+    self.assertEqual(2, self.evaluate(stats['empty_clusters']))
+    self.assertAllClose(0.75, stats['centroid_drift'])
+    self.assertAllClose(0., stats['mean_assignment_distance'])
+    self.assertAllClose([0., 1., 2., 3.], previous_centroids)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -15,14 +15,13 @@
 """Clusters centroids initialization API for Keras clustering API."""
 
 import abc
+import math
 import six
 import tensorflow as tf
 from tensorflow.python.ops import clustering_ops
 from tensorflow_model_optimization.python.core.clustering.keras import cluster_config
-from tensorflow_model_optimization.python.core.keras.compat import keras
 
 
-k = keras.backend
 CentroidInitialization = cluster_config.CentroidInitialization
 
 
@@ -78,6 +77,14 @@ class AbstractCentroidsInitialisation:
 
     return cluster_centroids
 
+  def _get_channel_weights(self):
+    """Returns the weights of every channel, one channel per row."""
+    channels_first_perm = ([1, 0, 2, 3] if self.data_format == 'channels_first'
+                           else [3, 0, 1, 2])
+    return tf.reshape(
+        tf.transpose(self.weights, perm=channels_first_perm),
+        [self.num_channels, -1])
+
   def _per_channel_clustering(self):
     """Implements per channel clustering."""
 
@@ -242,6 +249,175 @@ class KmeansPlusPlusCentroidsInitialisation(AbstractCentroidsInitialisation):
     return tf.reshape(cluster_centroids, [number_of_clusters_for_interval])
 
 
+class KmeansCentroidsInitialisation(KmeansPlusPlusCentroidsInitialisation):
+  """Cluster centroids based on kmeans++ seeding refined by k-means.
+
+  The kmeans++ centroids are refined with Lloyd iterations until they
+  converge. In one dimension every cluster is a contiguous range of the sorted
+  weights, so an iteration only needs to binary search the boundaries between
+  the clusters and to read the sums of their weights from the prefix sums of
+  the sorted weights. Its cost does not depend on the number of weights, and
+  the weights of all the channels are refined at once for per-channel
+  clustering. Their kmeans++ seeds are also chosen at once, with one loop over
+  the clusters shared by all the channels.
+  """
+
+  # Upper bound on the number of Lloyd iterations
+  _MAX_ITERATIONS = 100
+
+  # Seed of the sampling of the kmeans++ seeding
+  _SEED = 9
+
+  def _get_seed_centroids(self, weight_interval,
+                          number_of_clusters_for_interval):
+    return super(KmeansCentroidsInitialisation,
+                 self)._calculate_centroids_for_interval(
+                     weight_interval, number_of_clusters_for_interval)
+
+  def _get_batch_seed_centroids(self, weights, number_of_clusters):
+    """Returns the kmeans++ seeds of every row of the weights.
+
+    As in `clustering_ops.kmeans_plus_plus_initialization`, every seed after
+    the first one is the best of `2 + log(number_of_clusters)` candidates,
+    sampled with probabilities proportional to their squared distances to the
+    closest seed.
+
+    Args:
+      weights: 2-D tensor, every row holds the weights of one clustering.
+      number_of_clusters: The number of seeds of every row, a python int.
+
+    Returns:
+      2-D tensor of the seed centroids of every row.
+    """
+    number_of_clusters = int(number_of_clusters)
+    num_candidates = 2 + int(math.log(number_of_clusters))
+    values = tf.cast(weights, tf.float32)
+    batch_size = tf.shape(values)[0]
+    num_weights = tf.shape(values)[-1]
+
+    first_indices = tf.random.stateless_uniform(
+        [batch_size, 1],
+        seed=[self._SEED, 0],
+        maxval=num_weights,
+        dtype=tf.int32)
+    first_centroids = tf.gather(values, first_indices, batch_dims=1)
+    cluster_indices = tf.range(number_of_clusters)
+
+    def add_centroid(index, centroids, distances):
+      # Weights at a zero distance from a seed are never sampled, unless all
+      # the weights of the row are.
+      logits = tf.where(distances > 0.,
+                        tf.math.log(tf.maximum(distances, 1e-30)), -1e30)
+      candidate_indices = tf.random.stateless_categorical(
+          logits, num_candidates, seed=tf.stack([self._SEED, index]))
+      candidates = tf.gather(values, candidate_indices, batch_dims=1)
+      potentials = tf.stack([
+          tf.math.reduce_sum(
+              tf.minimum(distances,
+                         tf.math.squared_difference(
+                             values, candidates[:, i:i + 1])),
+              axis=-1) for i in range(num_candidates)
+      ], axis=-1)
+      best_candidates = tf.gather(
+          candidates, tf.math.argmin(potentials, axis=-1)[:, tf.newaxis],
+          batch_dims=1)
+
+      centroids = tf.where(cluster_indices == index, best_candidates,
+                           centroids)
+      distances = tf.minimum(
+          distances, tf.math.squared_difference(values, best_candidates))
+      return index + 1, centroids, distances
+
+    _, centroids, _ = tf.while_loop(
+        lambda index, centroids, distances: index < number_of_clusters,
+        add_centroid,
+        (tf.constant(1),
+         tf.tile(first_centroids, [1, number_of_clusters]),
+         tf.math.squared_difference(values, first_centroids)))
+
+    return tf.cast(centroids, weights.dtype)
+
+  def _run_kmeans(self, weights, seed_centroids):
+    """Runs k-means independently on every row of the weights.
+
+    Args:
+      weights: 2-D tensor, every row holds the weights of one clustering.
+      seed_centroids: 2-D tensor, the initial centroids of every row.
+
+    Returns:
+      2-D tensor of the sorted centroids of every row.
+    """
+    sorted_weights = tf.sort(weights, axis=-1)
+    batch_size = tf.shape(sorted_weights)[0]
+    num_weights = tf.shape(sorted_weights)[-1]
+
+    # prefix_sums[:, i] is the sum of the i smallest weights of every row
+    prefix_sums = tf.pad(
+        tf.math.cumsum(tf.cast(sorted_weights, tf.float64), axis=-1),
+        [[0, 0], [1, 0]])
+    first_index = tf.zeros([batch_size, 1], dtype=tf.int32)
+    last_index = tf.fill([batch_size, 1], num_weights)
+
+    def update_centroids(centroids):
+      # Weights halfway between two centroids belong to the lower one, as
+      # in ClusteringAlgorithm.get_pulling_indices
+      boundaries = (centroids[:, :-1] + centroids[:, 1:]) / 2.
+      splits = tf.searchsorted(
+          sorted_weights, boundaries, side='right', out_type=tf.int32)
+      begin = tf.concat([first_index, splits], axis=-1)
+      end = tf.concat([splits, last_index], axis=-1)
+
+      counts = end - begin
+      sums = (
+          tf.gather(prefix_sums, end, batch_dims=1) -
+          tf.gather(prefix_sums, begin, batch_dims=1))
+      means = tf.cast(
+          sums / tf.cast(tf.maximum(counts, 1), tf.float64), centroids.dtype)
+
+      # Empty clusters keep their centroid
+      return tf.sort(tf.where(counts > 0, means, centroids), axis=-1)
+
+    def should_continue(iteration, centroids, previous_centroids):
+      return tf.math.logical_and(
+          tf.math.less(iteration, self._MAX_ITERATIONS),
+          tf.math.reduce_any(tf.math.not_equal(centroids, previous_centroids)))
+
+    def lloyd_iteration(iteration, centroids, previous_centroids):
+      del previous_centroids  # Unused
+      return iteration + 1, update_centroids(centroids), centroids
+
+    seed_centroids = tf.sort(
+        tf.cast(seed_centroids, sorted_weights.dtype), axis=-1)
+    _, centroids, _ = tf.while_loop(
+        should_continue, lloyd_iteration,
+        (tf.constant(1), update_centroids(seed_centroids), seed_centroids))
+
+    return centroids
+
+  def _calculate_centroids_for_interval(self, weight_interval,
+                                        number_of_clusters_for_interval):
+    if tf.math.less_equal(number_of_clusters_for_interval, 0):
+      # Return an empty array of centroids
+      return tf.constant([])
+
+    seed_centroids = self._get_seed_centroids(weight_interval,
+                                              number_of_clusters_for_interval)
+    cluster_centroids = self._run_kmeans(
+        tf.reshape(weight_interval, [1, -1]),
+        tf.expand_dims(seed_centroids, axis=0))
+
+    return tf.reshape(cluster_centroids, [number_of_clusters_for_interval])
+
+  def _per_channel_clustering(self):
+    """Implements per channel clustering, refining all channels at once."""
+    channel_weights = self._get_channel_weights()
+
+    seed_centroids = self._get_batch_seed_centroids(channel_weights,
+                                                    self.number_of_clusters)
+
+    return self._run_kmeans(channel_weights, seed_centroids)
+
+
 class RandomCentroidsInitialisation(AbstractCentroidsInitialisation):
   """Sample centroids randomly and uniformly from the interval [min(weights), max(weights)]."""
 
@@ -295,76 +471,77 @@ class TFLinearEquationSolver:
 
 
 class TFCumulativeDistributionFunction:
-  """Takes an array and builds cumulative distribution function(CDF)."""
+  """Takes an array and builds cumulative distribution function(CDF).
+
+  The weights are sorted once, then the CDF values at any number of points are
+  found with a binary search. A 2-D array holds one set of weights per row.
+  """
 
   def __init__(self, weights):
     self.weights = weights
+    self._sorted_weights = tf.sort(weights, axis=-1)
 
   def get_cdf_value(self, given_weight):
-    mask = tf.less_equal(self.weights, given_weight)
-    less_than = tf.cast(tf.math.count_nonzero(mask), dtype=tf.float32)
-    return less_than / tf.size(self.weights, out_type=tf.float32)
-
-
-class DensityBasedCentroidsInitialisation(AbstractCentroidsInitialisation):
-  r"""Density-based centroids initialisation.
-
-  This initialisation means that we build a cumulative distribution
-  function(CDF), then linearly space y-axis of this function then find the
-  corresponding x-axis points.
-
-  In order to simplify the implementation, here is
-  a plan how it is achieved:
-  1. Calculate CDF values at points spaced linearly between weight_min and
-  weight_max(e.g. 20 points)
-  2. Build an array of values linearly spaced between 0 and 1(probability)
-  3. Go through the second array and find segment of CDF that contains this
-  y-axis value, \hat{y}
-  4. interpolate linearly between those two points, get a line equation y=ax+b
-  5. solve equation \hat{y}=ax+b for x. The found x value is a new cluster
-  centroid.
-  """
-
-  def _get_centroids(self, cdf_x_grid, cdf_values, matching_indices):
-    """Interpolates linearly.
-
-    Between every found index using 'i' as the current position and 'i-1' as
-    a second point. The value of 'x' is a new cluster centroid.
+    """Returns the fraction of the weights less or equal to given_weight.
 
     Args:
-      cdf_x_grid: grid of x values.
-      cdf_values: cdf values at grid.
-      matching_indices: indices of each
+      given_weight: a scalar, or a tensor of points with the same number of
+        rows as the weights.
 
     Returns:
-      centroids.
+      The CDF values at the given points.
     """
+    given_weight = tf.convert_to_tensor(
+        given_weight, dtype=self._sorted_weights.dtype)
+    points = (
+        given_weight
+        if given_weight.shape.rank else tf.reshape(given_weight, [1]))
+    less_equal = tf.searchsorted(self._sorted_weights, points, side='right')
+    cdf_values = tf.cast(less_equal, dtype=tf.float32) / tf.cast(
+        tf.shape(self._sorted_weights)[-1], dtype=tf.float32)
+    return tf.reshape(cdf_values, tf.shape(given_weight))
 
-    def get_single_centroid(i):
-      i_clipped = tf.minimum(i, tf.size(cdf_values) - 1)
-      i_previous = tf.maximum(0, i_clipped - 1)
 
-      x1 = cdf_x_grid[i_clipped]
-      x2 = cdf_x_grid[i_previous]
-      y1 = cdf_values[i_clipped]
-      y2 = cdf_values[i_previous]
+class DensityBasedCentroidsInitialisation(AbstractCentroidsInitialisation):
+  """Density-based centroids initialisation.
+
+  This initialisation means that we build the cumulative distribution
+  function(CDF) of the weights, then linearly space y-axis of this function
+  then find the corresponding x-axis points.
+
+  The CDF is the exact empirical CDF of the weights, so the centroids are the
+  quantiles of the weights at probability levels spaced linearly between 0.01
+  and 1. They are taken directly from the sorted weights, interpolating
+  linearly between the two order statistics around every probability level.
+  The weights of all the channels are processed together for per-channel
+  clustering.
+  """
 
-      # Check whether interpolation is possible
-      if y2 == y1:
-        # If there's no delta y it doesn't make sense to try to interpolate
-        # the value of x, so just take the lower bound instead
-        single_centroid = x1
-      else:
-        # Interpolate linearly
-        s = TFLinearEquationSolver(x1=x1, y1=y1, x2=x2, y2=y2)
-        single_centroid = s.solve_for_x(y1)
+  def _calculate_batch_centroids(self, weights, number_of_clusters):
+    """Calculates the centroids of every row of the weights.
 
-      return single_centroid
+    Args:
+      weights: 2-D tensor, every row holds the weights of one clustering.
+      number_of_clusters: number of centroids of every row.
 
-    centroids = k.map_fn(get_single_centroid,
-                         matching_indices,
-                         dtype=tf.float32)
-    return centroids
+    Returns:
+      2-D tensor of the centroids of every row.
+    """
+    sorted_weights = tf.sort(weights, axis=-1)
+    num_weights = tf.shape(sorted_weights)[-1]
+
+    # Fractional positions of the quantiles in the sorted weights
+    probability_space = tf.linspace(0 + 0.01, 1, number_of_clusters)
+    positions = probability_space * tf.cast(num_weights - 1,
+                                            probability_space.dtype)
+    lower = tf.math.floor(positions)
+    fraction = tf.cast(positions - lower, sorted_weights.dtype)
+    lower = tf.cast(lower, tf.int32)
+    upper = tf.minimum(lower + 1, num_weights - 1)
+
+    lower_weights = tf.gather(sorted_weights, lower, axis=-1)
+    upper_weights = tf.gather(sorted_weights, upper, axis=-1)
+    return lower_weights + fraction * (upper_weights - lower_weights)
 
   def _calculate_centroids_for_interval(self, weight_interval,
                                         number_of_clusters_for_interval):
@@ -372,39 +549,18 @@ class DensityBasedCentroidsInitialisation(AbstractCentroidsInitialisation):
       # Return an empty array of centroids
       return tf.constant([])
 
-    # Get the limits of the weight interval
-    weights_min = tf.reduce_min(weight_interval)
-    weights_max = tf.reduce_max(weight_interval)
-
-    # Calculate the gap to put at either side of the given interval
-    weights_gap = 0.01 if not self.preserve_sparsity else tf.minimum(
-        0.01,
-        tf.minimum(tf.math.abs(weights_min), tf.math.abs(weights_max)) / 2)
-
-    # Calculating the interpolation nodes for the given weights.
-    # A gap is introduced on either side to guarantee that the CDF will have
-    # 0 and 1 as the first and last value respectively.
-    # The value 30 is a guess, we just need a sufficiently large number here
-    # since we are going to interpolate values linearly anyway and the initial
-    # guess will drift away. For these reasons we do not really
-    # care about the granularity of the lookup
-    cdf_x_grid = tf.linspace(weights_min - weights_gap,
-                             weights_max + weights_gap, 30)
-
-    # Calculate the centroids within the given interval
-    cdf = TFCumulativeDistributionFunction(weights=weight_interval)
-    cdf_values = k.map_fn(cdf.get_cdf_value, cdf_x_grid)
-    probability_space = tf.linspace(0 + 0.01, 1,
-                                    number_of_clusters_for_interval)
-    matching_indices = tf.searchsorted(
-        sorted_sequence=cdf_values, values=probability_space, side='right')
-
-    centroids = self._get_centroids(cdf_x_grid, cdf_values, matching_indices)
+    centroids = self._calculate_batch_centroids(
+        tf.reshape(weight_interval, [1, -1]), number_of_clusters_for_interval)
     cluster_centroids = tf.reshape(centroids,
                                    (number_of_clusters_for_interval,))
 
     return cluster_centroids
 
+  def _per_channel_clustering(self):
+    """Implements per channel clustering of all channels at once."""
+    return self._calculate_batch_centroids(self._get_channel_weights(),
+                                           self.number_of_clusters)
+
 
 class CentroidsInitializerFactory:
   """Factory that creates concrete initializers for factory centroids.
@@ -424,6 +580,8 @@ class CentroidsInitializerFactory:
           DensityBasedCentroidsInitialisation,
       CentroidInitialization.KMEANS_PLUS_PLUS:
           KmeansPlusPlusCentroidsInitialisation,
+      CentroidInitialization.KMEANS:
+          KmeansCentroidsInitialisation,
   }
 
   @classmethod
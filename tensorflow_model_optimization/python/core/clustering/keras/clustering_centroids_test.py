@@ -41,6 +41,7 @@ class ClusteringCentroidsTest(tf.test.TestCase, parameterized.TestCase):
       (CentroidInitialization.RANDOM),
       (CentroidInitialization.DENSITY_BASED),
       (CentroidInitialization.KMEANS_PLUS_PLUS),
+      (CentroidInitialization.KMEANS),
   )
   def testExistingInitsAreSupported(self, init_type):
     """Verifies that the given centroid initialization methods are supported."""
@@ -58,6 +59,8 @@ class ClusteringCentroidsTest(tf.test.TestCase, parameterized.TestCase):
        clustering_centroids.DensityBasedCentroidsInitialisation),
       (CentroidInitialization.KMEANS_PLUS_PLUS,
        clustering_centroids.KmeansPlusPlusCentroidsInitialisation),
+      (CentroidInitialization.KMEANS,
+       clustering_centroids.KmeansCentroidsInitialisation),
   )
   def testReturnsMethodForExistingInit(self, init_type, method):
     """Verifies that the centroid initializer factory method returns the expected classes for the given initialization methods."""
@@ -137,6 +140,14 @@ class ClusteringCentroidsTest(tf.test.TestCase, parameterized.TestCase):
         K.batch_get_value([cdf_calc.get_cdf_value(point)])[0]
     )
 
+  def testCDFValuesOfEveryRow(self):
+    """Verifies that TFCumulativeDistributionFunction yields the CDF values of every row of 2-D weights."""
+    cdf_calc = clustering_centroids.TFCumulativeDistributionFunction(
+        [[7., 1., 6., 2.], [9., 3., 1., 5.]])
+    cdf_values = cdf_calc.get_cdf_value([[0., 2., 7.], [1., 4., 10.]])
+    self.assertAllClose([[0., 0.5, 1.], [0.25, 0.5, 1.]],
+                        K.batch_get_value([cdf_values])[0])
+
   @parameterized.parameters(
       ([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 5, [0., 2.5, 5., 7.5, 10.]),
       ([0, 1, 2, 3, 3.1, 3.2, 3.3, 3.4, 3.5], 3, [0., 1.75, 3.5]),
@@ -162,10 +173,10 @@ class ClusteringCentroidsTest(tf.test.TestCase, parameterized.TestCase):
 
   @parameterized.parameters(
       ([0, 1, 2, 3, 3.1, 3.2, 3.3, 3.4, 3.5
-       ], 5, [0.11137931, 2.0534482, 3.145862, 3.3886206, 3.51]),
-      ([0, 1, 2, 3, 3.1, 3.2, 3.3, 3.4, 3.5], 3, [0.11137931, 3.145862, 3.51]),
+       ], 5, [0.08, 2.06, 3.104, 3.302, 3.5]),
+      ([0, 1, 2, 3, 3.1, 3.2, 3.3, 3.4, 3.5], 3, [0.08, 3.104, 3.5]),
       ([0., 1., 2., 3., 4., 5., 6., 7., 8., 9.
-       ], 3, [0.3010345, 5.2775865, 9.01]))
+       ], 3, [0.09, 4.545, 9.]))
   def testDensityBasedClusterCentroids(self, weights, number_of_clusters,
                                        centroids):
     dbci = clustering_centroids.DensityBasedCentroidsInitialisation(
@@ -175,13 +186,13 @@ class ClusteringCentroidsTest(tf.test.TestCase, parameterized.TestCase):
 
   @parameterized.parameters(
       ([0., -1., -2., -3., -4., -5., -6.
-       ], 4, [-5.836897, -2.8941379, -0.98999995, 0.]),
+       ], 4, [-5.95, -3.475, -1., 0.]),
       ([0., 0., 1., 2., 3., 4., 5., 6., 7., 8., 9.
-       ], 5, [0., 1.2665517, 4.032069, 7.0741386, 9.01]),
+       ], 5, [0., 1.08, 3.72, 6.36, 9.]),
       ([-4., -3., -2., -1., 0., 0., 0., 1., 2., 3., 4., 5., 6., 7.
-       ], 6, [-3.9058623, -0.99, 0., 1.1975863, 4.103793, 7.01]),
+       ], 6, [-3.97, -1., 0., 1.06, 4.03, 7.]),
       ([0., 1., 2., 3., -3.1, -3.2, -3.3, -0.005, 3.5
-       ], 3, [-3.1887069, 0., 1.0768965]), ([0., 0., 0., 0.], 2, [0.]))
+       ], 3, [-3.297, 0., 1.03]), ([0., 0., 0., 0.], 2, [0.]))
   def testDensityBasedClusterCentroidsWithSparsityPreservation(
       self, weights, number_of_clusters, centroids):
     dbci = clustering_centroids.DensityBasedCentroidsInitialisation(
@@ -240,11 +251,60 @@ class ClusteringCentroidsTest(tf.test.TestCase, parameterized.TestCase):
     calc_centroids = K.batch_get_value([kmci.get_cluster_centroids()])[0]
     self.assertAllClose(centroids, calc_centroids)
 
+  # The k-means of the weights converge to their optimum from any seeds.
+  @parameterized.parameters(
+      ([0., 1., 2., 10., 11., 12.], 2, [1., 11.]),
+      ([1., 1., 1., 5., 5., 5., 9., 9., 9.], 3, [1., 5., 9.]))
+  def testKmeansClusterCentroids(self, weights, number_of_clusters,
+                                 centroids):
+    """Verifies that the kmeans++ centroids are refined until convergence."""
+    kmci = clustering_centroids.KmeansCentroidsInitialisation(
+        weights, number_of_clusters)
+    calc_centroids = K.batch_get_value([kmci.get_cluster_centroids()])[0]
+    self.assertSequenceAlmostEqual(centroids, calc_centroids, places=4)
+
+  def testKmeansClusterCentroidsWithSparsityPreservation(self):
+    weights = [-4., -3., -2., -1., 0., 1.1, 2.2, 3.3, 4.4, 5.5, 6.6, 7.7, 8.8,
+               9.]
+    kmci = clustering_centroids.KmeansCentroidsInitialisation(
+        weights, 6, preserve_sparsity=True)
+    calc_centroids = K.batch_get_value([kmci.get_cluster_centroids()])[0]
+    self.assertSequenceAlmostEqual([-3.5, -1.5, 0., 2.2, 5.5, 8.5],
+                                   calc_centroids,
+                                   places=4)
+
+  @parameterized.parameters(
+      ([[[[0., 2.]], [[1., 3.]]], [[[10., 12.]], [[11., 13.]]]
+       ], 2, [[0.5, 10.5], [2.5, 12.5]], "channels_last"),
+      ([[[[0., 2.]], [[1., 3.]]], [[[10., 12.]], [[11., 13.]]]
+       ], 2, [[1., 11.], [2., 12.]], "channels_first"))
+  def testKmeansClusterCentroidsWithPerChannelClustering(
+      self, weights, number_of_clusters, centroids, data_format):
+    kmci = clustering_centroids.KmeansCentroidsInitialisation(
+        np.array(weights, dtype="float32"),
+        number_of_clusters,
+        cluster_per_channel=True,
+        data_format=data_format)
+    calc_centroids = K.batch_get_value([kmci.get_cluster_centroids()])[0]
+    self.assertAllClose(centroids, calc_centroids)
+
+  def testKmeansPerChannelSeedsAreWeightsOfTheChannel(self):
+    # Every channel has as many distinct weights as clusters, which are all
+    # chosen by the kmeans++ seeding.
+    weights = np.array([[1., 4., 4., 7., 7., 1.], [-2., 0., 3., 3., -2., 0.]],
+                       dtype="float32")
+    kmci = clustering_centroids.KmeansCentroidsInitialisation(
+        np.transpose(weights).reshape([1, 1, 6, 2]), 3,
+        cluster_per_channel=True)
+    seeds = K.batch_get_value(
+        [kmci._get_batch_seed_centroids(tf.constant(weights), 3)])[0]
+    self.assertAllEqual([[1., 4., 7.], [-2., 0., 3.]], np.sort(seeds, axis=-1))
+
   @parameterized.parameters(
       ([[[[0.0, 1.0]], [[2.0, 3.0]]], [[[4.0, 5.0]], [[6.0, 7.0]]]
-       ], 2, [[0.197586, 6.01], [1.197586, 7.01]], "channels_last"),
+       ], 2, [[0.06, 6.], [1.06, 7.]], "channels_last"),
       ([[[[0.0, 1.0]], [[2.0, 3.0]]], [[[4.0, 5.0]], [[6.0, 7.0]]]
-       ], 2, [[0.163103, 5.01], [2.163104, 7.01]], "channels_first"))
+       ], 2, [[0.03, 5.], [2.03, 7.]], "channels_first"))
   def testDensityBasedClusterCentroidsWithPerChannelClustering(
       self, weights, number_of_clusters, centroids, data_format):
     dbci = clustering_centroids.DensityBasedCentroidsInitialisation(
@@ -144,6 +144,30 @@ class ClusteringAlgorithmTest(tf.test.TestCase, parameterized.TestCase):
 
     self._check_pull_values(clustering_algo, pulling_indices, expected_output)
 
+  @parameterized.parameters(
+      # Unsorted centroids.
+      ([3., -1., 0.5, 2.],),
+      # Duplicated centroids, the lowest index is picked.
+      ([1., 0., 1., 2., 0.],),
+      # Weights at the middle of two centroids are ties.
+      ([0., 1., -1., 0.25],),
+  )
+  def testPullingIndicesMatchArgmin(self, clustering_centroids):
+    """Verifies that pulling indices match an argmin over all distances."""
+    clustering_centroids = tf.Variable(clustering_centroids, dtype=tf.float32)
+    clustering_algo = clustering_registry.ClusteringAlgorithm(
+        clustering_centroids, GradientAggregation.SUM
+    )
+    weight = tf.reshape(tf.range(-3., 4., 0.125), (8, 7))
+
+    pulling_indices = clustering_algo.get_pulling_indices(weight)
+
+    expected_pulling_indices = tf.argmin(
+        tf.abs(tf.expand_dims(weight, axis=-1) - clustering_centroids),
+        axis=-1)
+    self.assertEqual(pulling_indices.shape, weight.shape)
+    self.assertAllEqual(pulling_indices, expected_pulling_indices)
+
   @parameterized.parameters(
       (GradientAggregation.AVG, [[0, 0, 0], [1, 1, 1], [0, 0, 0]], [1, 1]),
       (GradientAggregation.SUM, [[0, 0, 0], [1, 1, 1], [0, 0, 0]], [6, 3]),
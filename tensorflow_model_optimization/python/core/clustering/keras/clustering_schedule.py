@@ -0,0 +1,175 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Clustering Schedule classes to control weight re-association in training."""
+
+import abc
+import six
+import tensorflow as tf
+
+
+@six.add_metaclass(abc.ABCMeta)
+class ClusteringSchedule(object):
+  """Specifies when to re-associate the weights with the cluster centroids.
+
+  ClusteringSchedule controls clustering during training by notifying at each
+  step whether the association of the layer's weights to the cluster centroids
+  (the pulling indices) should be recomputed. In the other steps, and during
+  evaluation and inference, the last computed associations are reused.
+
+  It can be invoked as a `callable` by providing the training `step` Tensor. It
+  returns a bool tensor.
+
+  ```python
+    should_update = clustering_schedule(step)
+  ```
+
+  You can inherit this class to write your own custom clustering schedule.
+  """
+
+  def _should_update_in_step(self, step, begin_step, end_step, frequency):
+    """Checks if associations should be updated in the current training step.
+
+    Associations should only be updated within the [`begin_step`, `end_step`]
+    range every `frequency` number of steps.
+
+    Args:
+      step: Current training step.
+      begin_step: Step at which to begin updating the associations.
+      end_step: Step at which to end updating the associations.
+      frequency: Only update the associations every `frequency` steps.
+
+    Returns:
+      True/False, if associations should be updated in current step.
+    """
+    step = tf.cast(step, tf.int64)
+    is_in_update_range = tf.math.logical_and(
+        tf.math.greater_equal(step, begin_step),
+        # If end_step is negative, keep updating forever!
+        tf.math.logical_or(
+            tf.math.less_equal(step, end_step), tf.math.less(end_step, 0)))
+
+    is_update_turn = tf.math.equal(
+        tf.math.floormod(tf.math.subtract(step, begin_step), frequency), 0)
+
+    return tf.math.logical_and(is_in_update_range, is_update_turn)
+
+  def _validate_step(self, begin_step, end_step, frequency):
+    """Checks whether the parameters for clustering schedule are valid.
+
+    Args:
+      begin_step: Step at which to begin updating the associations.
+      end_step: Step at which to end updating the associations. Special value
+        of `-1` implies updating can continue forever.
+      frequency: Only update the associations every `frequency` steps.
+
+    Returns:
+      None
+    """
+
+    if begin_step < 0:
+      raise ValueError('begin_step should be >= 0')
+
+    if end_step != -1:
+      if end_step < 0:
+        raise ValueError('end_step can be -1 or >= 0')
+      if end_step < begin_step:
+        raise ValueError('begin_step should be <= end_step if end_step != -1')
+
+    if frequency <= 0:
+      raise ValueError('frequency should be > 0')
+
+  @abc.abstractmethod
+  def __call__(self, step):
+    """Returns whether the associations should be updated.
+
+    Args:
+      step: Current step in graph execution.
+
+    Returns:
+      A bool tensor, True if the associations of the weights to the cluster
+      centroids should be recomputed in the step.
+    """
+    raise NotImplementedError(
+        'ClusteringSchedule implementation must override __call__')
+
+  def updates_in_every_step(self):
+    """Returns whether the associations are updated in every training step.
+
+    The wrappers with such a schedule don't count their training steps, and
+    keep the weights of the wrappers without a schedule.
+
+    Returns:
+      A python bool, False by default.
+    """
+    return False
+
+  @abc.abstractmethod
+  def get_config(self):
+    raise NotImplementedError(
+        'ClusteringSchedule implementation override get_config')
+
+  @classmethod
+  def from_config(cls, config):
+    """Instantiates a `ClusteringSchedule` from its config.
+
+    Args:
+        config: Output of `get_config()`.
+
+    Returns:
+        A `ClusteringSchedule` instance.
+    """
+    return cls(**config)
+
+
+class ConstantFrequency(ClusteringSchedule):
+  """Clustering schedule updating the associations at a constant frequency."""
+
+  def __init__(self, frequency=1, begin_step=0, end_step=-1):
+    """Initializes a Clustering schedule with a constant frequency.
+
+    The associations are updated in the interval [`begin_step`, `end_step`]
+    every `frequency` training steps. The default values update them in every
+    training step.
+
+    Args:
+      frequency: Only update the associations every `frequency` steps.
+      begin_step: Step at which to begin updating the associations.
+      end_step: Step at which to end updating the associations. `-1` by
+        default. `-1` implies continuing to update them till the end of
+        training.
+    """
+
+    self.frequency = frequency
+    self.begin_step = begin_step
+    self.end_step = end_step
+
+    self._validate_step(self.begin_step, self.end_step, self.frequency)
+
+  def __call__(self, step):
+    return self._should_update_in_step(step, self.begin_step, self.end_step,
+                                       self.frequency)
+
+  def updates_in_every_step(self):
+    return self.frequency == 1 and self.begin_step == 0 and self.end_step == -1
+
+  def get_config(self):
+    return {
+        'class_name': self.__class__.__name__,
+        'config': {
+            'frequency': self.frequency,
+            'begin_step': self.begin_step,
+            'end_step': self.end_step,
+        }
+    }
@@ -0,0 +1,102 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for Clustering Schedule."""
+
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.clustering.keras import clustering_schedule
+from tensorflow_model_optimization.python.core.keras import compat
+from tensorflow_model_optimization.python.core.keras.compat import keras
+
+
+class ConstantFrequencyTest(tf.test.TestCase):
+  """Test to verify ConstantFrequency behavior for step parameters."""
+
+  def testBeginStepGreaterThanEqualsZero(self):
+    with self.assertRaises(ValueError):
+      clustering_schedule.ConstantFrequency(begin_step=-1)
+
+    clustering_schedule.ConstantFrequency(begin_step=0)
+    clustering_schedule.ConstantFrequency(begin_step=100)
+
+  def testEndStepGreaterThanEqualsBeginStep(self):
+    with self.assertRaises(ValueError):
+      clustering_schedule.ConstantFrequency(begin_step=10, end_step=5)
+    with self.assertRaises(ValueError):
+      clustering_schedule.ConstantFrequency(begin_step=10, end_step=-5)
+
+    clustering_schedule.ConstantFrequency(begin_step=10, end_step=10)
+    clustering_schedule.ConstantFrequency(begin_step=10, end_step=-1)
+
+  def testFrequencyIsPositive(self):
+    with self.assertRaises(ValueError):
+      clustering_schedule.ConstantFrequency(frequency=0)
+    with self.assertRaises(ValueError):
+      clustering_schedule.ConstantFrequency(frequency=-5)
+
+    clustering_schedule.ConstantFrequency(frequency=1)
+    clustering_schedule.ConstantFrequency(frequency=10)
+
+  def testUpdatesEveryStepByDefault(self):
+    schedule = clustering_schedule.ConstantFrequency()
+
+    steps = [tf.Variable(step) for step in [0, 1, 2, 1000]]
+    compat.initialize_variables(self)
+
+    for step in steps:
+      self.assertTrue(self.evaluate(schedule(step)))
+    self.assertTrue(schedule.updates_in_every_step())
+    self.assertFalse(
+        clustering_schedule.ConstantFrequency(frequency=2)
+        .updates_in_every_step())
+    self.assertFalse(
+        clustering_schedule.ConstantFrequency(end_step=10)
+        .updates_in_every_step())
+
+  def testUpdatesOnlyInBeginEndStepRangeAtValidFrequencySteps(self):
+    schedule = clustering_schedule.ConstantFrequency(
+        frequency=10, begin_step=100, end_step=200)
+
+    step_90 = tf.Variable(90)
+    step_100 = tf.Variable(100)
+    step_105 = tf.Variable(105)
+    step_110 = tf.Variable(110)
+    step_200 = tf.Variable(200)
+    step_210 = tf.Variable(210)
+    compat.initialize_variables(self)
+
+    self.assertFalse(self.evaluate(schedule(step_90)))
+    self.assertTrue(self.evaluate(schedule(step_100)))
+    self.assertFalse(self.evaluate(schedule(step_105)))
+    self.assertTrue(self.evaluate(schedule(step_110)))
+    self.assertTrue(self.evaluate(schedule(step_200)))
+    self.assertFalse(self.evaluate(schedule(step_210)))
+
+  def testSerializeDeserialize(self):
+    schedule = clustering_schedule.ConstantFrequency(10, 20, 100)
+
+    config = schedule.get_config()
+    schedule_deserialized = keras.utils.deserialize_keras_object(
+        config,
+        custom_objects={
+            'ConstantFrequency': clustering_schedule.ConstantFrequency,
+        },
+    )
+
+    self.assertEqual(schedule.__dict__, schedule_deserialized.__dict__)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -92,7 +92,10 @@ def cluster_weights(
         instance.
       number_of_clusters: the number of cluster centroids to form when
         clustering a layer/model. For example, if number_of_clusters=8 then only
-        8 unique values will be used in each weight array.
+        8 unique values will be used in each weight array. Can also be a dict
+        mapping layer names to their numbers of clusters, as returned by
+        `select_number_of_clusters`, in which case the layers missing from the
+        dict are not clustered.
       cluster_centroids_init: `tfmot.clustering.keras.CentroidInitialization`
         instance that determines how the cluster centroids will be initialized.
       preserve_sparsity: optional boolean value that determines whether or not
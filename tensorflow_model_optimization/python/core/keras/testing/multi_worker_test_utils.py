@@ -0,0 +1,181 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Utils for testing MOT code on multi-worker clusters of local processes.
+
+Every task of the cluster is a separate process on the local machine, talking
+to the other tasks over gRPC on the loopback interface. The function run on the
+cluster, its arguments and its results are sent to and from the processes with
+pickle, so the function must be defined at the top level of a module, and
+should return numpy values.
+
+Example:
+
+  def train(strategy, epochs):
+    with strategy.scope():
+      model = ...
+    model.fit(..., epochs=epochs)
+    return model.get_weights()
+
+  worker_weights = multi_worker_test_utils.run_multi_worker_mirrored(
+      train, num_workers=2, args=(3,))
+"""
+
+import json
+import multiprocessing
+import os
+import socket
+import traceback
+
+import tensorflow as tf
+
+
+# Seconds to wait for the results of a cluster, including its start up.
+_TIMEOUT = 300
+
+
+def _pick_unused_ports(num_ports):
+  """Returns ports of the loopback interface that no process listens to."""
+  sockets = []
+  try:
+    for _ in range(num_ports):
+      s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+      s.bind(('localhost', 0))
+      sockets.append(s)
+    return [s.getsockname()[1] for s in sockets]
+  finally:
+    for s in sockets:
+      s.close()
+
+
+def create_cluster_spec(num_workers=0, num_ps=0, has_chief=False):
+  """Returns the spec of a cluster of tasks on the local machine.
+
+  Args:
+    num_workers: The number of 'worker' tasks.
+    num_ps: The number of 'ps' tasks.
+    has_chief: Whether the cluster has a 'chief' task.
+
+  Returns:
+    A dict mapping the task types to lists of 'localhost:port' addresses.
+  """
+  num_tasks = {'chief': int(has_chief), 'worker': num_workers, 'ps': num_ps}
+  ports = _pick_unused_ports(sum(num_tasks.values()))
+  cluster_spec = {}
+  for task_type, num in num_tasks.items():
+    if num:
+      cluster_spec[task_type] = [
+          'localhost:{}'.format(ports.pop()) for _ in range(num)
+      ]
+  return cluster_spec
+
+
+def _run_task(fn, args, cluster_spec, task_type, task_index, results):
+  """Entry point of the processes running the tasks of a cluster."""
+  try:
+    os.environ['TF_CONFIG'] = json.dumps({
+        'cluster': cluster_spec,
+        'task': {
+            'type': task_type,
+            'index': task_index
+        },
+        'rpc_layer': 'grpc',
+    })
+    cluster_resolver = tf.distribute.cluster_resolver.TFConfigClusterResolver()
+    if 'ps' not in cluster_spec:
+      strategy = tf.distribute.MultiWorkerMirroredStrategy(
+          cluster_resolver=cluster_resolver)
+    elif task_type == 'chief':
+      strategy = tf.distribute.experimental.ParameterServerStrategy(
+          cluster_resolver)
+    else:
+      # The workers and parameter servers only run the ops sent by the
+      # coordinator, until they are terminated.
+      server = tf.distribute.Server(
+          cluster_resolver.cluster_spec(),
+          job_name=task_type,
+          task_index=task_index,
+          protocol='grpc',
+          start=True)
+      server.join()
+      return
+    results.put((task_type, task_index, fn(strategy, *args), None))
+  except Exception:  # pylint: disable=broad-except
+    results.put((task_type, task_index, None, traceback.format_exc()))
+
+
+def _run_cluster(fn, args, cluster_spec, result_task_type):
+  """Runs `fn` on a cluster and returns the results of a type of tasks."""
+  context = multiprocessing.get_context('spawn')
+  results = context.Queue()
+  processes = []
+  for task_type, addresses in cluster_spec.items():
+    for task_index in range(len(addresses)):
+      processes.append(
+          context.Process(
+              target=_run_task,
+              args=(fn, args, cluster_spec, task_type, task_index, results),
+              daemon=True))
+  for process in processes:
+    process.start()
+
+  try:
+    task_results = {}
+    while len(task_results) < len(cluster_spec[result_task_type]):
+      task_type, task_index, result, error = results.get(timeout=_TIMEOUT)
+      if error is not None:
+        raise RuntimeError('Task {}:{} failed:\n{}'.format(
+            task_type, task_index, error))
+      task_results[task_index] = result
+    return [task_results[i] for i in range(len(task_results))]
+  finally:
+    # The tasks which don't return, like parameter servers, or which wait for
+    # a failed task, are stopped.
+    for process in processes:
+      process.join(timeout=1)
+      if process.is_alive():
+        process.terminate()
+        process.join()
+
+
+def run_multi_worker_mirrored(fn, num_workers=2, args=()):
+  """Runs `fn` on every worker of a `MultiWorkerMirroredStrategy` cluster.
+
+  Args:
+    fn: A function called with the strategy of the worker and `args`.
+    num_workers: The number of worker processes.
+    args: The other arguments of `fn`.
+
+  Returns:
+    The list of the results of `fn` on the workers, by task index.
+  """
+  return _run_cluster(
+      fn, args, create_cluster_spec(num_workers=num_workers), 'worker')
+
+
+def run_parameter_server(fn, num_workers=2, num_ps=1, args=()):
+  """Runs `fn` on the coordinator of a `ParameterServerStrategy` cluster.
+
+  Args:
+    fn: A function called with the strategy of the coordinator and `args`.
+    num_workers: The number of worker processes.
+    num_ps: The number of parameter server processes.
+    args: The other arguments of `fn`.
+
+  Returns:
+    The result of `fn`.
+  """
+  cluster_spec = create_cluster_spec(
+      num_workers=num_workers, num_ps=num_ps, has_chief=True)
+  return _run_cluster(fn, args, cluster_spec, 'chief')[0]
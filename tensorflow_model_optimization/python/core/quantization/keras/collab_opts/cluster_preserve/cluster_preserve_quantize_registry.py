@@ -88,34 +88,41 @@ def get_centroids(layer, weight, data_format):
     return centroids, tf.size(centroids), index, False
 
   # In case of cluster_per_channel we need to extract
-  # unique values (centroids) for each channel.
+  # unique values (centroids) for each channel. The values of all the
+  # channels are sorted at once, and a new centroid starts wherever the
+  # sorted value changes.
   num_channels = weight.shape[1 if data_format == 'channels_first' else -1]
-  channel_centroids = []
-  channel_indices = []
-  num_centroids = []
-
-  for channel in range(num_channels):
-    channel_weights = weight[:, :, :, channel]
-    centroids, indices = get_unique(channel_weights)
-
-    channel_centroids.append(centroids)
-    channel_indices.append(indices)
-    num_centroids.append(tf.size(centroids))
-
-  max_centroid = max(num_centroids)
-  max_diff = max_centroid - min(num_centroids)
+  channel_weights = tf.transpose(weight, perm=(3, 0, 1, 2))[:num_channels]
+  channel_shape = channel_weights.shape
+  channel_weights = tf.reshape(channel_weights, (num_channels, -1))
+
+  order = tf.argsort(channel_weights, axis=-1, stable=True)
+  sorted_weights = tf.gather(channel_weights, order, batch_dims=1)
+  is_new_centroid = tf.concat([
+      tf.ones((num_channels, 1), dtype=tf.bool),
+      tf.not_equal(sorted_weights[:, 1:], sorted_weights[:, :-1])
+  ], axis=-1)
+  sorted_indices = tf.cumsum(tf.cast(is_new_centroid, tf.int32), axis=-1) - 1
+  num_centroids = sorted_indices[:, -1] + 1
+
+  max_centroid = tf.reduce_max(num_centroids)
+  max_diff = max_centroid - tf.reduce_min(num_centroids)
 
   if max_diff > 1:
     centroids, index = get_unique(weight)
     return centroids, tf.size(centroids), index, False
 
-  for i, centroid in enumerate(channel_centroids):
-    if num_centroids[i] != max_centroid:
-      one_padding = tf.ones([max_centroid - num_centroids[i]])
-      channel_centroids[i] = tf.concat([centroid, one_padding], 0)
-
-  centroids = tf.convert_to_tensor(channel_centroids)
-  lookup = tf.convert_to_tensor(channel_indices)
+  # Channels with fewer centroids are padded with ones.
+  channel_ids = tf.broadcast_to(
+      tf.range(num_channels)[:, tf.newaxis], tf.shape(sorted_indices))
+  centroids = tf.tensor_scatter_nd_update(
+      tf.ones((num_channels, max_centroid), dtype=weight.dtype),
+      tf.stack([channel_ids, sorted_indices], axis=-1), sorted_weights)
+
+  # Scatter the indices of the sorted weights back to their positions.
+  lookup = tf.gather(
+      sorted_indices, tf.argsort(order, axis=-1, stable=True), batch_dims=1)
+  lookup = tf.reshape(lookup, channel_shape)
 
   lookup = tf.transpose(
       lookup,
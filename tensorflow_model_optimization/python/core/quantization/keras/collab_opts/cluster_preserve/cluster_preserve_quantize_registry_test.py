@@ -81,6 +81,25 @@ class ClusterPreserveQuantizeRegistryTest(tf.test.TestCase):
     def get_config(self):
       return {}
 
+  def testGetCentroidsPerChannel(self):
+    # Kernel of shape (2, 1, 1, 3): channels have 2, 1 and 2 unique values.
+    weight = tf.constant([[[[1., 3., 5.]]], [[[2., 3., 6.]]]])
+    wrapper = keras.layers.Wrapper(self.layer_conv2d)
+
+    centroids, num_centroids, lookup, cluster_per_channel = (
+        cluster_preserve_quantize_registry.get_centroids(
+            wrapper, weight, 'channels_last'))
+
+    self.assertTrue(cluster_per_channel)
+    self.assertEqual(num_centroids, 2)
+    self.assertAllEqual(centroids, [[1., 2.], [3., 1.], [5., 6.]])
+    self.assertEqual(lookup.shape, weight.shape)
+    # Every weight is looked up from the centroids of its channel.
+    self.assertAllEqual(
+        tf.transpose(
+            tf.gather(centroids, tf.transpose(lookup, (3, 0, 1, 2)),
+                      batch_dims=1), (1, 2, 3, 0)), weight)
+
   def testSupportsKerasLayer(self):
     # test registered layer
     self.assertTrue(
@@ -0,0 +1,109 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark for `ModelTransformer.transform` on large synthetic models.
+
+Applies the default 8-bit layout transforms to functional models made of
+Conv2D + BatchNormalization + ReLU blocks, which the transforms fuse, and
+reports the transformation time for models of increasing size. Two shapes of
+models are measured: a deep chain of blocks, and wide models whose parallel
+branches of blocks are concatenated.
+
+Example:
+
+  python benchmark_model_transformer.py --num_blocks=100,200,400
+"""
+
+from __future__ import print_function
+
+import time
+
+from absl import app
+from absl import flags
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.quantization.keras.default_8bit import default_8bit_quantize_layout_transform
+
+_NUM_BLOCKS = flags.DEFINE_list(
+    'num_blocks', ['100', '200', '400'],
+    'Comma-separated number of Conv2D + BatchNormalization + ReLU blocks of '
+    'the benchmarked models.')
+_BRANCH_DEPTH = flags.DEFINE_integer(
+    'branch_depth', 4, 'Number of blocks of every branch of the wide models.')
+
+
+def _block(x):
+  x = keras.layers.Conv2D(4, 3, padding='same')(x)
+  x = keras.layers.BatchNormalization()(x)
+  return keras.layers.ReLU()(x)
+
+
+def _deep_model(num_blocks):
+  inp = keras.layers.Input((8, 8, 4))
+  x = inp
+  for _ in range(num_blocks):
+    x = _block(x)
+  return keras.Model(inp, x)
+
+
+def _wide_model(num_blocks, branch_depth):
+  """Returns a model of parallel branches, concatenated every 2 branches."""
+  inp = keras.layers.Input((8, 8, 4))
+  outputs = []
+  for _ in range(max(num_blocks // (2 * branch_depth), 1)):
+    branches = []
+    for _ in range(2):
+      x = inp
+      for _ in range(branch_depth):
+        x = _block(x)
+      branches.append(x)
+    outputs.append(keras.layers.Concatenate()(branches))
+  return keras.Model(inp, outputs)
+
+
+def _benchmark(model):
+  """Returns the time in seconds to apply the default 8-bit transforms."""
+  layer_quantize_map = {layer.name: {} for layer in model.layers}
+  start = time.time()
+  default_8bit_quantize_layout_transform.Default8BitQuantizeLayoutTransform(
+  ).apply(model, layer_quantize_map)
+  return time.time() - start
+
+
+def run(num_blocks_list, branch_depth):
+  """Prints the transformation time of every model."""
+  print('{:>6} {:>8} {:>8} {:>16} {:>20}'.format('shape', 'blocks', 'layers',
+                                                 'transform (s)',
+                                                 'per layer (ms)'))
+  for num_blocks in num_blocks_list:
+    for shape, model in [('deep', _deep_model(num_blocks)),
+                         ('wide', _wide_model(num_blocks, branch_depth))]:
+      transform_time = _benchmark(model)
+      num_layers = len(model.layers)
+      print('{:>6} {:>8} {:>8} {:>16.2f} {:>20.2f}'.format(
+          shape, num_blocks, num_layers, transform_time,
+          transform_time / num_layers * 1000.))
+      keras.backend.clear_session()
+
+
+def main(argv):
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  run([int(num_blocks) for num_blocks in _NUM_BLOCKS.value],
+      _BRANCH_DEPTH.value)
+
+
+if __name__ == '__main__':
+  app.run(main)
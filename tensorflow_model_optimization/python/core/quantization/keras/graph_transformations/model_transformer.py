@@ -17,11 +17,15 @@
 
 import collections
 import copy
+import fractions
+import heapq
+import itertools
 import re
 
 import tensorflow as tf
 
 from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.quantization.keras import utils as quantize_utils
 from tensorflow_model_optimization.python.core.quantization.keras.graph_transformations import transforms as transforms_mod
 
 
@@ -62,6 +66,9 @@ class ModelTransformer(object):
     self.candidate_layers = candidate_layers
     self.layer_metadata = layer_metadata
 
+    # Compiled regexes of the pattern class names and config values.
+    self._compiled_patterns = {}
+
   def _is_sequential_or_functional_model(self, model):
     return ModelTransformer._is_functional_model(self, model) or isinstance(
         model, keras.Sequential)
@@ -99,15 +106,119 @@ class ModelTransformer(object):
 
     return inbound_layer_names
 
-  def _get_consuming_layers(self, check_layer):
-    """Returns all the layers which are out nodes from the layer."""
-    consuming_layers = []
-    check_layer_name = check_layer['config']['name']
+  def _index_layers(self):
+    """Builds the name -> layer and producer -> consumers maps of the model.
+
+    The maps let pattern matching look up layers and their consumers without
+    scanning all the layers of the model. The orders of the layers increase
+    along `self._config['layers']`. Layers of Sequential models are also linked
+    to the previous and next layers, so that a replacement only updates the
+    orders and links of the layers it adds.
+    """
+    self._layers_map = collections.OrderedDict()
+    self._layer_order = {}
+    self._layer_order_counter = itertools.count()
+    # Map of layer name -> {consuming layer name: None}, an ordered set.
+    self._consumers_map = {}
+    # Maps of layer name -> previous or next layer name in Sequential models.
+    self._previous_layer_names = {}
+    self._next_layer_names = {}
+
+    previous_layer_name = None
     for layer in self._config['layers']:
-      if check_layer_name in self._get_inbound_layer_names(layer):
-        consuming_layers.append(layer)
+      self._add_layer(layer)
+      if not self._is_functional_model(self.model):
+        layer_name = layer['config']['name']
+        self._link_layer(layer_name, previous_layer_name, None)
+        previous_layer_name = layer_name
+
+  def _add_layer(self, layer, order=None):
+    layer_name = layer['config']['name']
+    self._layers_map[layer_name] = layer
+    if order is None:
+      order = next(self._layer_order_counter)
+    self._layer_order[layer_name] = order
+    self._connect_layer(layer)
+
+  def _remove_layer(self, layer):
+    layer_name = layer['config']['name']
+    self._disconnect_layer(layer)
+    if not self._is_functional_model(self.model):
+      self._unlink_layer(layer_name)
+    del self._layers_map[layer_name]
+    del self._layer_order[layer_name]
+
+  def _link_layer(self, layer_name, previous_layer_name, next_layer_name):
+    """Inserts the layer between two layers of a Sequential model."""
+    self._previous_layer_names[layer_name] = previous_layer_name
+    self._next_layer_names[layer_name] = next_layer_name
+    if previous_layer_name is not None:
+      self._next_layer_names[previous_layer_name] = layer_name
+    if next_layer_name is not None:
+      self._previous_layer_names[next_layer_name] = layer_name
+
+  def _unlink_layer(self, layer_name):
+    """Removes the layer from the chain of layers of a Sequential model."""
+    previous_layer_name = self._previous_layer_names.pop(layer_name)
+    next_layer_name = self._next_layer_names.pop(layer_name)
+    if previous_layer_name is not None:
+      self._next_layer_names[previous_layer_name] = next_layer_name
+    if next_layer_name is not None:
+      self._previous_layer_names[next_layer_name] = previous_layer_name
+
+  def _get_orders_between(self, previous_layer_name, next_layer_name, count):
+    """Returns increasing orders of layers inserted between two layers.
+
+    Args:
+      previous_layer_name: Name of the layer before the inserted layers, or
+        None if they are inserted at the start of the model.
+      next_layer_name: Name of the layer after the inserted layers, or None
+        if they are inserted at the end of the model.
+      count: Number of inserted layers.
 
-    return consuming_layers
+    Returns:
+      List of `count` orders between the orders of the two layers.
+    """
+    lower = self._layer_order.get(previous_layer_name)
+    upper = self._layer_order.get(next_layer_name)
+    if lower is None and upper is None:
+      lower, upper = 0, count + 1
+    elif lower is None:
+      lower = upper - count - 1
+    elif upper is None:
+      upper = lower + count + 1
+    step = fractions.Fraction(upper - lower, count + 1)
+    return [lower + step * (i + 1) for i in range(count)]
+
+  def _connect_layer(self, layer):
+    """Adds the layer to the consumers of its inbound layers."""
+    if not self._is_functional_model(self.model):
+      return
+
+    layer_name = layer['config']['name']
+    for inbound_layer_name in self._get_inbound_layer_names(layer):
+      self._consumers_map.setdefault(inbound_layer_name, {})[layer_name] = None
+
+  def _disconnect_layer(self, layer):
+    """Removes the layer from the consumers of its inbound layers."""
+    if not self._is_functional_model(self.model):
+      return
+
+    layer_name = layer['config']['name']
+    for inbound_layer_name in self._get_inbound_layer_names(layer):
+      consumers = self._consumers_map.get(inbound_layer_name)
+      if consumers is None:
+        continue
+      consumers.pop(layer_name, None)
+      if not consumers:
+        del self._consumers_map[inbound_layer_name]
+
+  def _get_consuming_layers(self, check_layer):
+    """Returns all the layers which are out nodes from the layer."""
+    return [
+        self._layers_map[layer_name] for layer_name in self._consumers_map.get(
+            check_layer['config']['name'], {})
+    ]
 
   def _get_output_consumers(self, check_layer):
     """Returns if any tensors from the layer are outputs of the model."""
@@ -118,22 +229,39 @@ class ModelTransformer(object):
     return output_consumers
 
   def _get_layers(self, layer_names):
-    return [
-        layer for layer in self._config['layers']
-        if layer['config']['name'] in layer_names
+    """Returns the layers with the given names, in model order."""
+    layer_names = [
+        layer_name for layer_name in set(layer_names)
+        if layer_name in self._layers_map
     ]
+    layer_names.sort(key=self._layer_order.__getitem__)
+    return [self._layers_map[layer_name] for layer_name in layer_names]
 
   def _get_layer_weights(self, layer_name):
+    # Weights of the original layers are only read once a pattern needs them.
+    if (layer_name not in self._layer_weights_map and
+        layer_name in self._keras_layers_map):
+      self._layer_weights_map[layer_name] = self._get_keras_layer_weights(
+          self._keras_layers_map[layer_name])
     return self._layer_weights_map.get(layer_name, {})
 
   def _get_layer_names_and_weights(self, layer_name):
+    if (layer_name not in self._layer_names_and_weights_map and
+        layer_name in self._keras_layers_map):
+      self._layer_names_and_weights_map[
+          layer_name] = self._get_keras_layer_names_and_weights(
+              self._keras_layers_map[layer_name])
     return self._layer_names_and_weights_map.get(layer_name, {})
 
   def _get_layer_metadata(self, layer_name):
     return self._layer_metadata_map.get(layer_name, {})
 
   def _match_pattern(self, target, pattern):
-    return re.match('^' + pattern + '$', target) is not None
+    regex = self._compiled_patterns.get(pattern)
+    if regex is None:
+      regex = re.compile('^' + pattern + '$')
+      self._compiled_patterns[pattern] = regex
+    return regex.match(target) is not None
 
   def _match_layer(self, layer, pattern):
     """Check if specific layer matches the pattern."""
@@ -204,13 +332,12 @@ class ModelTransformer(object):
       inbound_nodes = layer['inbound_nodes']
       return [connection_info[0] for connection_info in inbound_nodes[0]]
     else:  # Sequential model.
-      layers = self._config['layers']
-      i = layers.index(layer)
-      if i == 0:
+      previous_layer_name = self._previous_layer_names[layer['config']['name']]
+      if previous_layer_name is None:
         # First layer has no inputs.
         return []
       else:
-        return [layers[i - 1]['config']['name']]
+        return [previous_layer_name]
 
   def _match_layer_with_inputs(self, layer, pattern, is_head_node):
     """Match pattern at this layer, and continue to match at its inputs."""
@@ -260,17 +387,6 @@ class ModelTransformer(object):
                      self._get_layer_metadata(layer['config']['name']),
                      self._get_layer_names_and_weights(layer['config']['name']))
 
-  def _find_pattern(self, pattern, matched_layers=None):
-    for layer in self._config['layers']:
-      if matched_layers and layer['config']['name'] in matched_layers:
-        continue
-      match_layer = self._match_layer_with_inputs(
-          layer, pattern, is_head_node=True)
-      if match_layer:
-        return match_layer
-
-    return None
-
   def _get_leaf_layers(self, match_layer):
     """Return leaf layers from this sub-graph tree."""
 
@@ -296,10 +412,11 @@ class ModelTransformer(object):
   def _remove_layers(self, layers_to_remove, layers_to_remove_names):
     # Remove layers.
     for layer_to_remove in layers_to_remove:
-      self._config['layers'].remove(layer_to_remove)
+      self._remove_layer(layer_to_remove)
     # Remove entry from weight and metadata maps,
     # now that layer has been removed.
     for layer_name in layers_to_remove_names:
+      self._keras_layers_map.pop(layer_name, None)
       self._layer_weights_map.pop(layer_name, None)
       self._layer_names_and_weights_map.pop(layer_name, None)
       self._layer_metadata_map.pop(layer_name, None)
@@ -335,12 +452,14 @@ class ModelTransformer(object):
             connection_info[3][key][0] = replacement_name
 
     for consumer in consuming_layers:
+      self._disconnect_layer(consumer)
       for inbound_node in self._inbound_node_generator(consumer):
         if isinstance(inbound_node, dict):
           inbound_node = inbound_node.values()
         for connection_info in inbound_node:
           _replace_layer_name_for_connection_info(connection_info, match_name,
                                                   replacement_name)
+      self._connect_layer(consumer)
 
     output_consumers = self._get_output_consumers(match_layer_node.layer)
     for output_consumer in output_consumers:
@@ -404,7 +523,7 @@ class ModelTransformer(object):
     # 5. Add in the new layers.
     def _add_replacement_layer(layer_node):
       """Recursively add new layers."""
-      self._config['layers'].append(layer_node.layer)
+      self._add_layer(layer_node.layer)
       layer_name = layer_node.layer['config']['name']
       # TODO(b/184603494): Remove weight map structure from model_transformer.
       if layer_node.weights:
@@ -430,9 +549,10 @@ class ModelTransformer(object):
 
     # These variables are needed when adding the new layers
     # and must be set before _remove_layers removes them.
-    first_layer_removed = layers_to_remove[0]
-    first_layer_removed_index = self._config['layers'].index(
-        first_layer_removed)
+    previous_layer_name = self._previous_layer_names[
+        layers_to_remove[0]['config']['name']]
+    next_layer_name = self._next_layer_names[
+        layers_to_remove[-1]['config']['name']]
 
     self._remove_layers(layers_to_remove, layers_to_remove_names)
 
@@ -448,14 +568,18 @@ class ModelTransformer(object):
 
       return replacement_nodes
 
-    def _add_replacement_nodes(first_layer_removed_index, replacement_nodes):
+    def _add_replacement_nodes(previous_layer_name, replacement_nodes):
       """Add replacement nodes to Sequential model."""
 
-      # Potentially insert nodes into middle of model.
-      i = first_layer_removed_index
-      for replacement_node in replacement_nodes:
-        self._config['layers'].insert(i, replacement_node.layer)
+      # Potentially insert nodes into middle of model, between the layers
+      # around the removed layers.
+      orders = self._get_orders_between(previous_layer_name, next_layer_name,
+                                        len(replacement_nodes))
+      for replacement_node, order in zip(replacement_nodes, orders):
+        self._add_layer(replacement_node.layer, order)
         layer_name = replacement_node.layer['config']['name']
+        self._link_layer(layer_name, previous_layer_name, next_layer_name)
+        previous_layer_name = layer_name
         if replacement_node.weights:
           self._layer_weights_map[layer_name] = replacement_node.weights
         if replacement_node.names_and_weights:
@@ -465,10 +589,9 @@ class ModelTransformer(object):
           self._layer_metadata_map[layer_name] = replacement_node.metadata
         if self.candidate_layers:
           self.candidate_layers.add(layer_name)
-        i += 1
 
     replacement_nodes = _get_replacement_nodes(replacement_layer_node)
-    _add_replacement_nodes(first_layer_removed_index, replacement_nodes)
+    _add_replacement_nodes(previous_layer_name, replacement_nodes)
 
   def _weight_name(self, name):
     """Extracts the weight name by removing layer from TF variable name.
@@ -519,15 +642,68 @@ class ModelTransformer(object):
     return obj.__class__.__name__
 
   def _get_matched_layers(self, transform):
-    return self._transform_matched_layers_map.get(self._name(transform), [])
+    return self._transform_matched_layers_map.get(self._name(transform), set())
 
   def _store_successful_match(self, transform, layer_node):
     if self._name(transform) not in self._transform_matched_layers_map:
-      self._transform_matched_layers_map[self._name(transform)] = []
+      self._transform_matched_layers_map[self._name(transform)] = set()
 
-    self._transform_matched_layers_map[self._name(transform)].append(
+    self._transform_matched_layers_map[self._name(transform)].add(
         layer_node.layer['config']['name'])
 
+  def _get_pattern_depth(self, pattern):
+    """Returns the number of layers in the longest chain of the pattern."""
+    return 1 + max(
+        [self._get_pattern_depth(inp) for inp in pattern.inputs] or [0])
+
+  def _get_neighbor_layer_names(self, layer_name):
+    """Returns the names of the layers connected to the layer."""
+    if self._is_functional_model(self.model):
+      return (self._get_inbound_layer_names(self._layers_map[layer_name]) +
+              list(self._consumers_map.get(layer_name, {})))
+
+    return [
+        neighbor_name
+        for neighbor_name in (self._previous_layer_names[layer_name],
+                              self._next_layer_names[layer_name])
+        if neighbor_name is not None
+    ]
+
+  def _get_affected_layer_names(self, replacement_layer_node, radius):
+    """Returns the layers whose pattern matches may change after a replacement.
+
+    A match at a head layer depends only on the layers it reaches through the
+    pattern and on the consumers of those layers. Hence only layers within
+    `radius`, the depth of the deepest pattern, of the replacement layers need
+    to be matched again.
+
+    Args:
+      replacement_layer_node: `LayerNode` which has been added to the model.
+      radius: Number of connections to follow from the replacement layers.
+
+    Returns:
+      Set of names of the affected layers.
+    """
+    affected_layer_names = set(self._get_layer_names(replacement_layer_node))
+    frontier = list(affected_layer_names)
+    for _ in range(radius):
+      next_frontier = []
+      for layer_name in frontier:
+        for neighbor_name in self._get_neighbor_layer_names(layer_name):
+          if (neighbor_name in self._layers_map and
+              neighbor_name not in affected_layer_names):
+            affected_layer_names.add(neighbor_name)
+            next_frontier.append(neighbor_name)
+      frontier = next_frontier
+
+    return affected_layer_names
+
+  def _push_layers(self, worklists, layer_names):
+    """Adds the layers to the worklists of all the transforms."""
+    for worklist in worklists:
+      for layer_name in layer_names:
+        heapq.heappush(worklist, (self._layer_order[layer_name], layer_name))
+
   def transform(self):
     """Transforms the Keras model by applying all the specified transforms.
 
@@ -565,14 +741,13 @@ class ModelTransformer(object):
     # Same transform should not match+replace the same layer more than once
     # to prevent infinite loops.
     self._transform_matched_layers_map = {}
+    self._index_layers()
+    # Original layers of the model which have not been replaced. Their
+    # weights are copied directly into the transformed model.
+    self._keras_layers_map = {layer.name: layer for layer in self.model.layers}
     self._layer_weights_map = {}
     self._layer_names_and_weights_map = {}
 
-    for layer in self.model.layers:
-      self._layer_weights_map[layer.name] = self._get_keras_layer_weights(layer)
-      self._layer_names_and_weights_map[
-          layer.name] = self._get_keras_layer_names_and_weights(layer)
-
     # Maintains a current mutable copy of the metadata through transformation.
     self._layer_metadata_map = copy.deepcopy(self.layer_metadata)
 
@@ -580,20 +755,46 @@ class ModelTransformer(object):
     # patterns are found. This allows recursive pattern matching where a
     # modification by one transform may lead to another match.
     #
+    # Every transform keeps a worklist of candidate head layers, ordered by
+    # their position in the model. It starts with all the layers, and a
+    # replacement only adds back the layers near it, since a match elsewhere
+    # cannot have changed. Popping the first layer of the worklist is then
+    # equivalent to restarting the search from the start of the model.
+    #
     # TODO(pulkitb): This leads to infinite loops with poor patterns which may
     # match their replacement. Add counters with limits to fix it.
+    patterns = [transform.pattern() for transform in self.transforms]
+    radius = max([self._get_pattern_depth(pattern) for pattern in patterns] or
+                 [0])
+    # Layers are indexed in order, so the sorted lists are valid heaps.
+    worklists = [[(self._layer_order[layer_name], layer_name)
+                  for layer_name in self._layers_map]
+                 for _ in self.transforms]
     while True:
       match_found = False
-      for transform in self.transforms:
+      for transform, pattern, worklist in zip(self.transforms, patterns,
+                                              worklists):
         # A transform may find multiple instances of a pattern in the model.
         # Keep finding and replacing till done.
-        while True:
-          match_layer_node = self._find_pattern(
-              transform.pattern(), self._get_matched_layers(transform))
+        last_entry = None
+        while worklist:
+          entry = heapq.heappop(worklist)
+          layer_order, layer_name = entry
+          # Skip duplicates, and layers removed by a replacement.
+          if (entry == last_entry or
+              self._layer_order.get(layer_name) != layer_order):
+            continue
+          last_entry = entry
+
+          if layer_name in self._get_matched_layers(transform):
+            continue
 
-          # Pattern did not match any layer. Move to next transform.
+          match_layer_node = self._match_layer_with_inputs(
+              self._layers_map[layer_name], pattern, is_head_node=True)
+
+          # Pattern did not match this layer. Move to next layer.
           if not match_layer_node:
-            break
+            continue
 
           self._store_successful_match(transform, match_layer_node)
 
@@ -611,11 +812,18 @@ class ModelTransformer(object):
 
           match_found = True
           self._replace(match_layer_node, replacement_layer_node)
+          self._push_layers(
+              worklists,
+              self._get_affected_layer_names(replacement_layer_node, radius))
+          last_entry = None
 
       # None of the transforms found a pattern. We can stop now.
       if not match_found:
         break
 
+    # Layers of Sequential models are not indexed in model order.
+    self._config['layers'] = self._get_layers(self._layers_map)
+
     custom_objects = {}
     for transform in self.transforms:
       custom_objects.update(transform.custom_objects())
@@ -628,6 +836,11 @@ class ModelTransformer(object):
                                                        custom_objects)
 
     for layer in transformed_model.layers:
+      if layer.name in self._keras_layers_map:
+        quantize_utils.copy_layer_weights(
+            self._keras_layers_map[layer.name], layer)
+        continue
+
       weights = self._layer_weights_map.get(layer.name)
       if weights:
         self._set_layer_weights(layer, weights)
@@ -638,4 +851,5 @@ class ModelTransformer(object):
 
     # Ensures old Keras serialization format
     transformed_model.use_legacy_config = True
-    return transformed_model, copy.deepcopy(self._layer_metadata_map)
+    # The metadata map is recreated by every call, so it is not copied again.
+    return transformed_model, self._layer_metadata_map
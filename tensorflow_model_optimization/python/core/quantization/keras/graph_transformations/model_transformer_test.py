@@ -19,6 +19,7 @@ from __future__ import division
 from __future__ import print_function
 
 from absl.testing import parameterized
+import mock
 import numpy as np
 import tensorflow as tf
 
@@ -617,6 +618,101 @@ class ModelTransformerTest(tf.test.TestCase, parameterized.TestCase):
 
     self.assertEqual(transformed_model.layers[-1].__class__.__name__, 'ELU')
 
+  @parameterized.parameters(['sequential', 'functional'])
+  def testPatternMatches_AfterReplacementOfItsInputs(self, model_type):
+    """Verifies a replacement leads to new matches at the consuming layers."""
+
+    class ReplaceSoftmaxWithDense(Transform):
+
+      def pattern(self):
+        return LayerPattern('Softmax')
+
+      def replacement(self, match_layer):
+        replace_layer = quantize_utils.serialize_layer(
+            keras.layers.Dense(2), use_legacy_format=True
+        )
+        replace_layer['name'] = replace_layer['config']['name']
+        return LayerNode(replace_layer)
+
+    # The ReLU only matches after the Softmax has been replaced by the second
+    # transform.
+    transform = self.VerifyMatch(
+        LayerPattern('ReLU', inputs=[LayerPattern('Dense')]))
+
+    if model_type == 'functional':
+      inp = keras.layers.Input((2,))
+      x = keras.layers.Softmax()(inp)
+      out = keras.layers.ReLU(6.0)(x)
+      model = keras.Model(inp, out)
+    else:
+      model = keras.Sequential(
+          [keras.layers.Softmax(input_shape=(2,)),
+           keras.layers.ReLU(6.0)])
+
+    ModelTransformer(model,
+                     [transform, ReplaceSoftmaxWithDense()]).transform()
+    self.assertTrue(transform.matched())
+
+  @parameterized.parameters(['sequential', 'functional'])
+  def testReplaceLayers_DeepModel(self, model_type):
+    num_layers = 50
+    if model_type == 'functional':
+      inp = keras.layers.Input((3,))
+      x = inp
+      for _ in range(num_layers):
+        x = keras.layers.Dense(3)(x)
+      model = keras.Model(inp, x)
+    else:
+      model = keras.Sequential([keras.layers.Dense(3, input_shape=(3,))] + [
+          keras.layers.Dense(3) for _ in range(num_layers - 1)
+      ])
+
+    transformed_model, _ = ModelTransformer(
+        model, [self.ReplaceDenseLayer()]).transform()
+
+    self.assertLen([
+        layer for layer in transformed_model.layers
+        if layer.__class__.__name__ == 'MyDense'
+    ], num_layers)
+    self._assert_model_results_equal(model, transformed_model)
+
+  def testReplaceLayers_LongSequentialModel_IndexesLayersOnce(self):
+    num_layers = 200
+    model = keras.Sequential(
+        [keras.layers.Dense(3, input_shape=(3,))] +
+        [keras.layers.Dense(3) for _ in range(num_layers - 1)])
+
+    with mock.patch.object(
+        ModelTransformer,
+        '_index_layers',
+        autospec=True,
+        side_effect=ModelTransformer._index_layers) as index_layers:
+      transformed_model, _ = ModelTransformer(
+          model, [self.ReplaceDenseLayer()]).transform()
+
+    # Replacements update the index around the replaced layers.
+    self.assertEqual(1, index_layers.call_count)
+    self.assertEqual(['MyDense'] * num_layers, [
+        layer.__class__.__name__ for layer in transformed_model.layers
+    ])
+    self._assert_model_results_equal(model, transformed_model)
+
+  @parameterized.parameters(['sequential', 'functional'])
+  def testCopiesWeights_OfLayersNotReplaced(self, model_type):
+    pattern = LayerPattern('Conv2D')
+    transform = self.VerifyMatch(pattern)
+
+    model = self._simple_dense_model(model_type)
+    transformed_model, _ = ModelTransformer(model, [transform]).transform()
+
+    self.assertFalse(transform.matched())
+    dense_layer = self._get_layer(model, 0, model_type)
+    transformed_dense_layer = self._get_layer(transformed_model, 0, model_type)
+    for weight, transformed_weight in zip(dense_layer.weights,
+                                          transformed_dense_layer.weights):
+      self.assertIsNot(weight, transformed_weight)
+      self.assertAllEqual(weight, transformed_weight)
+
   @parameterized.parameters(['sequential', 'functional'])
   def testDoesNotMatchForever_IfReplacementEqualsMatch(self, model_type):
 
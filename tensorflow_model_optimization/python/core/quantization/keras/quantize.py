@@ -114,6 +114,11 @@ def quantize_model(to_quantize, quantized_layer_name_prefix='quant_'):
   it preserves the original weights, training it will not modify the weights
   of the original model.
 
+  The model is rebuilt three times: by a clone removing the annotations, by the
+  layout transforms of the `scheme`, and by a clone adding the quantization
+  wrappers. The weights are assigned from variable to variable, and the
+  returned model never shares variables with `model`.
+
   Args:
     to_quantize: keras model to be quantized. It can have pre-trained weights.
     quantized_layer_name_prefix: Name prefix for the quantized layers. The
@@ -365,20 +370,21 @@ def quantize_apply(
                      'been built yet. Please call `model.build(input_shape)` '
                      'before quantizing your model.')
 
-  def _clone_model_with_weights(model_to_clone):
-    cloned_model = keras.models.clone_model(model_to_clone)
-    cloned_model.set_weights(model_to_clone.get_weights())
-
-    return cloned_model
-
   def _extract_original_model(model_to_unwrap):
-    """Extracts original model by removing wrappers."""
+    """Extracts a copy of the original model by removing wrappers."""
     layer_quantize_map = {}
     requires_output_quantize = set()
+    # Pairs of (original layer, cloned layer) to copy the weights of.
+    cloned_layers = []
+
+    def _clone_layer(layer, cloned_layer):
+      cloned_layers.append((layer, cloned_layer))
+      return cloned_layer
 
     def _unwrap(layer):
       if not isinstance(layer, quantize_annotate_mod.QuantizeAnnotate):
-        return layer
+        return _clone_layer(layer, layer.__class__.from_config(
+            layer.get_config()))
 
       annotate_wrapper = layer
       # pylint: disable=protected-access
@@ -393,10 +399,18 @@ def quantize_apply(
       layer_quantize_map[annotate_wrapper.layer.name] = {
           'quantize_config': annotate_wrapper.quantize_config
       }
-      return annotate_wrapper.layer
+      # Annotated layers are deserialized like QuantizeAnnotate.from_config
+      # does, so custom layers must be in the `quantize_scope`.
+      return _clone_layer(
+          annotate_wrapper.layer,
+          quantize_utils.deserialize_layer(
+              quantize_utils.serialize_layer(annotate_wrapper.layer)))
 
     unwrapped_model = keras.models.clone_model(
         model_to_unwrap, input_tensors=None, clone_function=_unwrap)
+    for layer, cloned_layer in cloned_layers:
+      quantize_utils.copy_layer_weights(layer, cloned_layer)
+
     return unwrapped_model, layer_quantize_map, requires_output_quantize
 
   def _quantize(layer):  # pylint: disable=missing-docstring
@@ -454,26 +468,23 @@ def quantize_apply(
     return quantize_wrapper.QuantizeWrapperV2(
         layer, quantize_config, name_prefix=quantized_layer_name_prefix)
 
-  # 1. Create a copy of the model with the same weights. This ensures
-  # modifications don't affect the original model, or its weights.
+  # 1. Create a copy of the model with the same weights, and without the
+  # QuantizeAnnotate wrappers of its layers. The copy ensures modifications
+  # don't affect the original model, or its weights. Removing the wrappers
+  # extracts the original model structure (easier to transform), and stores
+  # relevant quantization information in a map. Both are done by the same
+  # clone of the model. The transforms below rebuild the model once more, and
+  # the quantization wraps the layers in a last clone.
   try:
-    model_copy = _clone_model_with_weights(model)
+    (unwrapped_model, layer_quantize_map, requires_output_quantize) = (
+        _extract_original_model(model)
+    )
   except (ValueError, TypeError) as er:
     raise ValueError(
         'Unable to clone model. This generally happens if you used custom '
         'Keras layers or objects in your model. Please specify them via '
         '`quantize_scope` for your calls to `quantize_model` and '
         '`quantize_apply`. [%s].' % er) from er
-
-  if hasattr(model, 'use_legacy_config'):
-    model_copy.use_legacy_config = model.use_legacy_config
-
-  # 2. Remove QuantizeAnnotate wrappers from the layers in the model. This
-  # extracts the original model structure (easier to transform), and
-  # stores relevant quantization information in a map.
-  (unwrapped_model, layer_quantize_map, requires_output_quantize) = (
-      _extract_original_model(model_copy)
-  )
   # Model cloning excludes input layers. Add input layers into the map
   # since they need to be matched for patterns as well.
   # pylint: disable=protected-access
@@ -483,7 +494,7 @@ def quantize_apply(
         layer_quantize_map[input_layer.name] = {}
   # pylint: enable=protected-access
 
-  # 3. Apply the graph transformations required to match model passes on
+  # 2. Apply the graph transformations required to match model passes on
   # target device/dialect.
   quantize_transform = scheme.get_layout_transformer()
   # layer_quantize_map gets modified by the transformations.
@@ -493,7 +504,7 @@ def quantize_apply(
   # TODO(pulkitb): Think more about how to introduce Default specific code.
   quantize_registry = scheme.get_quantize_registry()
 
-  # 4. Actually quantize all the relevant layers in the model. This is done by
+  # 3. Actually quantize all the relevant layers in the model. This is done by
   # wrapping the layers with QuantizeWrapper, and passing the associated
   # `QuantizeConfig`.
 
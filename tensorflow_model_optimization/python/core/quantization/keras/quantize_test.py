@@ -19,6 +19,7 @@ from __future__ import division
 from __future__ import print_function
 
 from absl.testing import parameterized
+import mock
 import numpy as np
 import tensorflow as tf
 
@@ -452,6 +453,28 @@ class QuantizeApplyTest(tf.test.TestCase):
 
     self.assertTrue(quantized_model.built)
 
+  def testQuantizeApply_CopiesWeightsIntoNewVariables(self):
+    model = keras_test_utils.build_simple_dense_model()
+    annotated_model = quantize_annotate_model(model)
+
+    with mock.patch.object(
+        keras.models, 'clone_model',
+        wraps=keras.models.clone_model) as clone_model:
+      quantized_model = quantize_apply(annotated_model)
+
+    # One clone removes the annotations and one adds the quantization
+    # wrappers, on each side of the rebuild of the layout transforms.
+    self.assertEqual(2, clone_model.call_count)
+    original_weights = {weight.ref() for weight in model.weights}
+    for weight in quantized_model.weights:
+      self.assertNotIn(weight.ref(), original_weights)
+    for layer, quantized_layer in zip(model.layers,
+                                      quantized_model.layers[1:]):
+      # The wrappers hold the weights of their layers first.
+      for weight, quantized_weight in zip(layer.get_weights(),
+                                          quantized_layer.get_weights()):
+        self.assertAllEqual(weight, quantized_weight)
+
   def _get_simple_functional_model(self):
     inputs = keras.Input(shape=(28, 28, 1))
     x = keras.layers.Conv2D(32, 5, activation='relu')(inputs)
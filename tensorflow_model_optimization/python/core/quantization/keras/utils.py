@@ -85,6 +85,35 @@ def deserialize_activation(config, use_legacy_format=False):
     return keras.activations.deserialize(config)
 
 
+def copy_layer_weights(source_layer, target_layer):
+  """Copies the weights of `source_layer` into `target_layer`.
+
+  In eager mode, the variables of `target_layer` are assigned from the
+  variables of `source_layer` without going through numpy arrays as with
+  `get_weights` and `set_weights`. The weights are still copied: the layers do
+  not share their variables.
+
+  Args:
+    source_layer: Keras layer to copy the weights from.
+    target_layer: Keras layer with the same weights as `source_layer`.
+  """
+  if len(source_layer.weights) != len(target_layer.weights):
+    raise ValueError(
+        'Layer {} has {} weights, but layer {} has {} weights.'.format(
+            source_layer.name, len(source_layer.weights), target_layer.name,
+            len(target_layer.weights)))
+
+  if tf.executing_eagerly():
+    for target_weight, source_weight in zip(target_layer.weights,
+                                            source_layer.weights):
+      target_weight.assign(source_weight)
+  else:
+    keras.backend.batch_set_value(
+        list(
+            zip(target_layer.weights,
+                keras.backend.batch_get_value(source_layer.weights))))
+
+
 def convert_keras_to_tflite(model,
                             output_path,
                             custom_objects=None,
@@ -0,0 +1,389 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Permutation of channels to retain more magnitude under m_by_n sparsity.
+
+The m_by_n sparsity groups consecutive input channels of the weights. The
+order of the input channels of a layer can be changed without changing the
+function of the model, by permuting the output channels of the layer producing
+its inputs the same way. This module searches the order retaining the largest
+weight magnitude once the m_by_n sparsity is applied.
+"""
+
+import numpy as np
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_utils
+
+layers = keras.layers
+
+# Layers which compute every channel independently of the other channels.
+_CHANNEL_WISE_LAYERS = (
+    layers.Activation,
+    layers.AveragePooling2D,
+    layers.Dropout,
+    layers.ELU,
+    layers.GlobalAveragePooling2D,
+    layers.GlobalMaxPooling2D,
+    layers.LeakyReLU,
+    layers.MaxPooling2D,
+    layers.ReLU,
+    layers.ZeroPadding2D,
+)
+
+
+def _is_channels_last(layer):
+  return getattr(layer, 'data_format', 'channels_last') == 'channels_last'
+
+
+def _is_dense_or_conv2d(layer):
+  if isinstance(layer, layers.Dense):
+    return True
+  return (isinstance(layer, layers.Conv2D) and
+          not isinstance(layer,
+                         (layers.Conv2DTranspose, layers.DepthwiseConv2D)) and
+          _is_channels_last(layer) and layer.groups == 1)
+
+
+def _is_channel_wise(layer):
+  """Returns whether the layer and its weights are channel-wise."""
+  if isinstance(layer, _CHANNEL_WISE_LAYERS):
+    return _is_channels_last(layer)
+  if isinstance(layer, layers.BatchNormalization):
+    return list(layer.axis) in ([-1], [len(layer.input_shape) - 1])
+  if isinstance(layer, layers.DepthwiseConv2D):
+    return _is_channels_last(layer) and layer.depth_multiplier == 1
+  return False
+
+
+def _get_producers(layer):
+  producers = []
+  for node in layer._inbound_nodes:  # pylint: disable=protected-access
+    if isinstance(node.inbound_layers, list):
+      producers.extend(node.inbound_layers)
+    else:
+      producers.append(node.inbound_layers)
+  return producers
+
+
+def _get_permuted_chain(consumer):
+  """Returns the layers whose channels are permuted with the consumer inputs.
+
+  Args:
+    consumer: a Dense or Conv2D layer.
+
+  Returns:
+    The list of layers from the producer of the inputs of the consumer to the
+    last channel-wise layer before the consumer, or None if the inputs cannot
+    be permuted.
+  """
+  # pylint: disable=protected-access
+  chain = []
+  layer = consumer
+  while True:
+    if len(layer._inbound_nodes) != 1:
+      return None
+    producers = _get_producers(layer)
+    if len(producers) != 1:
+      return None
+    layer = producers[0]
+    # The outputs of the layer must not be used by other layers
+    if len(layer._outbound_nodes) != 1 or len(layer._inbound_nodes) != 1:
+      return None
+
+    chain.insert(0, layer)
+    if _is_dense_or_conv2d(layer):
+      return chain
+    if not _is_channel_wise(layer):
+      return None
+
+
+# Maximum number of float32 values of the temporary arrays of the search.
+_MAX_CHUNK_SIZE = 1 << 22
+
+
+def _get_input_channel_rows(kernel):
+  """Returns the magnitudes of the kernel, one row per input channel."""
+  kernel = np.abs(np.asarray(kernel, dtype=np.float32))
+  return np.moveaxis(kernel, -2, 0).reshape([kernel.shape[-2], -1])
+
+
+def _get_group_scores(groups, num_kept):
+  """Returns the magnitude retained in every group under m_by_n sparsity.
+
+  Args:
+    groups: array of shape (..., n, R), the magnitudes of the weights of the n
+      channels of every group.
+    num_kept: the number of non-zero values of every n values.
+
+  Returns:
+    The array of shape (...) with the retained magnitude of every group.
+  """
+  kept_values = np.sort(groups, axis=-2)[..., groups.shape[-2] - num_kept:, :]
+  return np.sum(kept_values, axis=(-2, -1))
+
+
+def _get_replacement_terms(groups, num_kept):
+  """Returns the terms of the gains of replacing the channels of every group.
+
+  Replacing the channel s of group a by a channel with the magnitudes x
+  changes the retained magnitude of the group by
+  `sum(maximum(x - thresholds[a, s], 0)) - removed[a, s]`: the channel s
+  removes its values kept over the next largest values of the group, and x
+  keeps its values larger than the smallest values kept without s.
+
+  Args:
+    groups: array of shape (G, n, R), the magnitudes of the weights of every
+      group of n channels.
+    num_kept: the number of non-zero values of every n values, less than n.
+
+  Returns:
+    A tuple of the thresholds, of shape (G, n, R), and of the removed
+    magnitudes, of shape (G, n).
+  """
+  order = np.argsort(-groups, axis=1, kind='stable')
+  is_kept = np.argsort(order, axis=1) < num_kept
+  sorted_groups = np.take_along_axis(groups, order, axis=1)
+  last_kept = sorted_groups[:, num_kept - 1:num_kept]
+  first_dropped = sorted_groups[:, num_kept:num_kept + 1]
+
+  thresholds = np.where(is_kept, first_dropped, last_kept)
+  removed = np.sum(
+      np.where(is_kept, groups - first_dropped, np.float32(0.)), axis=-1)
+  return thresholds, removed
+
+
+def _get_swap_gains(groups, thresholds, removed, group_indices,
+                    other_indices):
+  """Returns the gains of swapping the channels of pairs of groups.
+
+  Args:
+    groups: array of shape (G, n, R), the magnitudes of the weights of every
+      group of n channels.
+    thresholds: the thresholds of `_get_replacement_terms`.
+    removed: the removed magnitudes of `_get_replacement_terms`.
+    group_indices: array of shape (P,), the first group of every pair.
+    other_indices: array of shape (P,), the second group of every pair.
+
+  Returns:
+    An array of shape (P, n, n) where the element [p, s, t] is the change of
+    the retained magnitude of the pair p when the channel s of its first
+    group is swapped with the channel t of its second group.
+  """
+  rows = groups[group_indices]
+  other_rows = groups[other_indices]
+  # Shape (P, s, t): the first group receives the channel t in its slot s
+  gains = np.sum(
+      np.maximum(
+          other_rows[:, np.newaxis] -
+          thresholds[group_indices][:, :, np.newaxis], np.float32(0.)),
+      axis=-1) - removed[group_indices][:, :, np.newaxis]
+  # The second group receives the channel s in its slot t
+  gains += np.sum(
+      np.maximum(
+          rows[:, :, np.newaxis] - thresholds[other_indices][:, np.newaxis],
+          np.float32(0.)),
+      axis=-1) - removed[other_indices][:, np.newaxis]
+  return gains
+
+
+def _search_permutation(kernel, m_by_n, max_iterations,
+                        max_candidate_groups=32):
+  """Searches the order of the input channels retaining the most magnitude.
+
+  Starting from the original order, every iteration evaluates the swaps of
+  the channels of every group with the channels of `max_candidate_groups`
+  other groups, and applies the best improving swap of every pair of groups,
+  as long as the swaps involve disjoint groups. The candidate groups are
+  sampled anew in every iteration, unless all the groups are candidates.
+
+  Args:
+    kernel: the kernel of a Dense or Conv2D layer.
+    m_by_n: tuple of 2 integers, m zeros out of n consecutive input channels.
+    max_iterations: the maximum number of iterations of the search.
+    max_candidate_groups: the number of groups paired with every group in an
+      iteration.
+
+  Returns:
+    The permutation of the input channels, as an array of channel indices.
+  """
+  num_zeros, n = m_by_n
+  num_kept = n - num_zeros
+  rows = _get_input_channel_rows(kernel)
+  num_channels = rows.shape[0]
+  permutation = np.arange(num_channels)
+  num_groups = num_channels // n
+  if num_groups < 2 or num_kept >= n:
+    return permutation
+
+  # Ignores the gains of the rounding errors
+  tolerance = 1e-5 * np.sum(rows, dtype=np.float64) / num_groups
+  # Pairs every group with the groups at these offsets.
+  all_offsets = np.arange(1, num_groups)
+  samples_offsets = len(all_offsets) > max_candidate_groups
+  random_state = np.random.RandomState(0)
+  pairs_per_chunk = max(1, _MAX_CHUNK_SIZE // (n * n * rows.shape[1]))
+
+  for _ in range(max_iterations):
+    groups = rows[permutation].reshape([num_groups, n, -1])
+    thresholds, removed = _get_replacement_terms(groups, num_kept)
+
+    offsets = all_offsets
+    if samples_offsets:
+      offsets = random_state.choice(
+          all_offsets, max_candidate_groups, replace=False)
+    group_indices = np.repeat(np.arange(num_groups), len(offsets))
+    other_indices = (group_indices + np.tile(offsets, num_groups)) % num_groups
+    # Every unordered pair of groups is evaluated once
+    pairs = np.unique(
+        np.stack([
+            np.minimum(group_indices, other_indices),
+            np.maximum(group_indices, other_indices)
+        ], axis=1), axis=0)
+
+    best_gains = np.empty([len(pairs)], dtype=np.float32)
+    best_swaps = np.empty([len(pairs)], dtype=np.int64)
+    for begin in range(0, len(pairs), pairs_per_chunk):
+      chunk = pairs[begin:begin + pairs_per_chunk]
+      swap_gains = _get_swap_gains(groups, thresholds, removed, chunk[:, 0],
+                                   chunk[:, 1]).reshape([len(chunk), n * n])
+      best_swaps[begin:begin + len(chunk)] = np.argmax(swap_gains, axis=-1)
+      best_gains[begin:begin + len(chunk)] = np.max(swap_gains, axis=-1)
+
+    swapped_groups = set()
+    for pair_index in np.argsort(best_gains, kind='stable')[::-1]:
+      if best_gains[pair_index] <= tolerance:
+        break
+      group_a, group_b = pairs[pair_index]
+      if group_a in swapped_groups or group_b in swapped_groups:
+        continue
+      swapped_groups.update([group_a, group_b])
+      slot_a, slot_b = divmod(best_swaps[pair_index], n)
+      channel_a, channel_b = group_a * n + slot_a, group_b * n + slot_b
+      permutation[[channel_a, channel_b]] = permutation[[channel_b, channel_a]]
+
+    if not swapped_groups and not samples_offsets:
+      break
+
+  return permutation
+
+
+def _permute_output_channels(layer, permutation):
+  """Permutes the output channels of a producer or channel-wise layer."""
+  weights = layer.get_weights()
+  if isinstance(layer, layers.DepthwiseConv2D):
+    # The kernel has shape (height, width, channels, 1)
+    weights[0] = weights[0][:, :, permutation, :]
+    weights[1:] = [weight[permutation] for weight in weights[1:]]
+  elif _is_dense_or_conv2d(layer):
+    weights[0] = weights[0][..., permutation]
+    weights[1:] = [weight[permutation] for weight in weights[1:]]
+  else:
+    weights = [weight[permutation] for weight in weights]
+  layer.set_weights(weights)
+
+
+def _permute_input_channels(layer, permutation):
+  """Permutes the input channels of a consumer layer."""
+  weights = layer.get_weights()
+  weights[0] = np.take(weights[0], permutation, axis=-2)
+  layer.set_weights(weights)
+
+
+def get_retained_magnitude(kernel, m_by_n=(2, 4)):
+  """Returns the magnitude of the kernel retained under m_by_n sparsity.
+
+  Args:
+    kernel: the kernel of a Dense or Conv2D layer.
+    m_by_n: tuple of 2 integers, m zeros out of n consecutive input channels.
+
+  Returns:
+    The sum of the absolute values of the weights kept by m_by_n sparsity.
+  """
+  num_zeros, n = pruning_utils.convert_to_tuple_of_two_int(m_by_n, 'm_by_n')
+  rows = _get_input_channel_rows(kernel)
+  return float(
+      np.sum(
+          _get_group_scores(
+              rows.reshape([rows.shape[0] // n, n, -1]), n - num_zeros)))
+
+
+def permute_channels_for_m_by_n(model,
+                                m_by_n=(2, 4),
+                                max_iterations=100,
+                                max_candidate_groups=32):
+  """Permutes the channels of a model to retain more magnitude under m_by_n.
+
+  The m_by_n sparsity keeps the n - m largest values of every n consecutive
+  input channels of the Dense and Conv2D kernels. For every such layer whose
+  inputs are computed by another Dense or Conv2D layer, possibly followed by
+  channel-wise layers like BatchNormalization, ReLU or DepthwiseConv2D, this
+  function searches an order of the input channels which retains more weight
+  magnitude. It then permutes the input channels of the layer, and the output
+  channels of the layers computing its inputs, so that the returned model
+  computes the same outputs as the original model.
+
+  The search is greedy. Every iteration evaluates the swaps of the channels of
+  every group of n channels with the channels of up to `max_candidate_groups`
+  other groups, so that its cost grows linearly with the number of channels.
+  It is meant to be run once, before `prune_low_magnitude` with
+  `sparsity_m_by_n`, to reduce the fine-tuning needed to recover accuracy.
+
+  Usage:
+
+  ```python
+  permuted_model = permute_channels_for_m_by_n(model, m_by_n=(2, 4))
+  pruned_model = prune_low_magnitude(permuted_model, sparsity_m_by_n=(2, 4))
+  ```
+
+  Args:
+    model: a built functional or `keras.Sequential` model, which is not pruned
+      yet.
+    m_by_n: tuple of 2 integers, m zeros out of n consecutive input channels.
+    max_iterations: the maximum number of iterations of the search of every
+      layer.
+    max_candidate_groups: the number of groups whose swaps with every group are
+      evaluated in an iteration. They are sampled in every iteration of the
+      layers with more groups.
+
+  Returns:
+    A new `keras.Model` with permuted channels.
+
+  Raises:
+    ValueError: if the model is subclassed.
+  """
+  m_by_n = pruning_utils.convert_to_tuple_of_two_int(m_by_n, 'm_by_n')
+  # pylint: disable=protected-access
+  if not model._is_graph_network and not isinstance(model, keras.Sequential):
+    raise ValueError('Subclassed models are not supported currently.')
+
+  permuted_model = keras.models.clone_model(model)
+  permuted_model.set_weights(model.get_weights())
+
+  n = m_by_n[1]
+  for layer in model.layers:
+    if not _is_dense_or_conv2d(layer) or layer.kernel.shape[-2] % n:
+      continue
+    chain = _get_permuted_chain(layer)
+    if chain is None:
+      continue
+
+    permutation = _search_permutation(layer.kernel.numpy(), m_by_n,
+                                      max_iterations, max_candidate_groups)
+    for chain_layer in chain:
+      _permute_output_channels(
+          permuted_model.get_layer(chain_layer.name), permutation)
+    _permute_input_channels(permuted_model.get_layer(layer.name), permutation)
+
+  return permuted_model
@@ -0,0 +1,140 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the permutation of channels for m_by_n sparsity."""
+
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.sparsity.keras import channel_permutation
+
+
+layers = keras.layers
+
+
+class ChannelPermutationTest(tf.test.TestCase):
+
+  def testSearchKeepsLargestChannels(self):
+    # With the original order, the first group holds all the large channels
+    # and 2:4 sparsity drops half of them.
+    kernel = np.concatenate(
+        [np.full([4, 3], 10.), np.full([4, 3], 1.)]).astype(np.float32)
+    self.assertEqual(
+        2 * 3 * (10. + 1.),
+        channel_permutation.get_retained_magnitude(kernel, (2, 4)))
+
+    permutation = channel_permutation._search_permutation(
+        kernel, (2, 4), max_iterations=10)
+
+    self.assertAllEqual(np.arange(8), np.sort(permutation))
+    self.assertEqual(
+        4 * 3 * 10.,
+        channel_permutation.get_retained_magnitude(kernel[permutation],
+                                                   (2, 4)))
+
+  def testSwapGainsMatchRetainedMagnitudes(self):
+    np.random.seed(0)
+    groups = np.random.rand(3, 4, 5).astype(np.float32)
+    # Ties between the channels of a group
+    groups[0, 1] = groups[0, 2]
+    thresholds, removed = channel_permutation._get_replacement_terms(groups, 2)
+
+    gains = channel_permutation._get_swap_gains(
+        groups, thresholds, removed, np.array([0, 0, 1]), np.array([1, 2, 2]))
+
+    for pair, (group_a, group_b) in enumerate([(0, 1), (0, 2), (1, 2)]):
+      before = channel_permutation._get_group_scores(
+          groups[[group_a, group_b]], 2)
+      for slot_a in range(4):
+        for slot_b in range(4):
+          swapped = groups[[group_a, group_b]].copy()
+          swapped[0, slot_a] = groups[group_b, slot_b]
+          swapped[1, slot_b] = groups[group_a, slot_a]
+          after = channel_permutation._get_group_scores(swapped, 2)
+          self.assertNear(
+              np.sum(after - before), gains[pair, slot_a, slot_b], 1e-5)
+
+  def testSearchSamplesCandidateGroupsOfLargeKernels(self):
+    np.random.seed(1)
+    kernel = np.random.standard_normal([1024, 64]).astype(np.float32)
+
+    permutation = channel_permutation._search_permutation(
+        kernel, (2, 4), max_iterations=3, max_candidate_groups=8)
+
+    self.assertAllEqual(np.arange(1024), np.sort(permutation))
+    self.assertGreater(
+        channel_permutation.get_retained_magnitude(kernel[permutation]),
+        channel_permutation.get_retained_magnitude(kernel))
+
+  def testPermutedDenseModelComputesSameOutputs(self):
+    model = keras.Sequential([
+        layers.Dense(16, input_shape=(8,)),
+        layers.ReLU(),
+        layers.Dense(4),
+    ])
+    permuted_model = channel_permutation.permute_channels_for_m_by_n(model)
+
+    inputs = np.random.rand(5, 8).astype(np.float32)
+    self.assertAllClose(model(inputs), permuted_model(inputs), atol=1e-5)
+    self.assertGreaterEqual(
+        channel_permutation.get_retained_magnitude(
+            permuted_model.layers[2].kernel),
+        channel_permutation.get_retained_magnitude(model.layers[2].kernel))
+
+  def testPermutedConvModelComputesSameOutputs(self):
+    inputs = keras.Input(shape=(6, 6, 3))
+    x = layers.Conv2D(8, 3, padding='same')(inputs)
+    x = layers.BatchNormalization()(x)
+    x = layers.ReLU()(x)
+    x = layers.DepthwiseConv2D(3, padding='same')(x)
+    x = layers.Conv2D(8, 1)(x)
+    outputs = layers.Conv2D(4, 1)(x)
+    model = keras.Model(inputs, outputs)
+    # Makes the batch normalization non-trivial
+    batch_normalization = model.layers[2]
+    batch_normalization.set_weights(
+        [np.random.rand(8).astype(np.float32) + 0.5
+         for _ in batch_normalization.get_weights()])
+
+    permuted_model = channel_permutation.permute_channels_for_m_by_n(model)
+
+    data = np.random.rand(2, 6, 6, 3).astype(np.float32)
+    self.assertAllClose(model(data), permuted_model(data), atol=1e-4)
+
+  def testSharedOutputsAreNotPermuted(self):
+    inputs = keras.Input(shape=(8,))
+    x = layers.Dense(8)(inputs)
+    outputs = layers.Add()([layers.Dense(8)(x), x])
+    model = keras.Model(inputs, outputs)
+
+    permuted_model = channel_permutation.permute_channels_for_m_by_n(model)
+
+    for weight, permuted_weight in zip(model.get_weights(),
+                                       permuted_model.get_weights()):
+      self.assertAllEqual(weight, permuted_weight)
+
+  def testSubclassedModelIsNotSupported(self):
+
+    class SubclassedModel(keras.Model):
+
+      def call(self, inputs):
+        return inputs
+
+    with self.assertRaises(ValueError):
+      channel_permutation.permute_channels_for_m_by_n(SubclassedModel())
+
+
+if __name__ == '__main__':
+  tf.test.main()
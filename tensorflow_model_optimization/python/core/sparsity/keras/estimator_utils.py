@@ -34,9 +34,13 @@ class PruningEstimatorSpec(tf_estimator.EstimatorSpec):
           "Must provide train_op for creating a PruningEstimatorSpec")
 
     for layer in model.layers:
+      if (isinstance(layer, PruneLowMagnitude) and
+          layer.step_source == "OPTIMIZER"):
+        layer.set_shared_pruning_step(
+            tf.train.get_or_create_global_step() if step is None else step)
       # If the model is newly created/initialized, set the 'pruning_step' to 0.
       # Otherwise, do nothing.
-      if isinstance(layer, PruneLowMagnitude) and layer.pruning_step == -1:
+      elif isinstance(layer, PruneLowMagnitude) and layer.pruning_step == -1:
         tf.assign(layer.pruning_step, 0)
 
     def _get_step_increment_ops(model, step=None):
@@ -44,7 +48,8 @@ class PruningEstimatorSpec(tf_estimator.EstimatorSpec):
       increment_ops = []
 
       for layer in model.layers:
-        if isinstance(layer, PruneLowMagnitude):
+        if (isinstance(layer, PruneLowMagnitude) and
+            layer.step_source == "LAYER"):
           if step is None:
             # Add ops to increment the pruning_step by 1
             increment_ops.append(tf.assign_add(layer.pruning_step, 1))
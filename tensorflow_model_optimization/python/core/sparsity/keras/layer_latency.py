@@ -0,0 +1,198 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Measurement of the TFLite latency of layers on the local CPU.
+
+Every layer is converted to a single-layer TFLite model, with its kernel
+pruned to a given sparsity and block size, and timed with the TFLite
+interpreter. The latencies are cached on disk, keyed by the configuration of
+the layer, its input shape and the pruning settings, so that a layer is only
+measured once per machine.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+
+_DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser('~'), '.cache', 'tensorflow_model_optimization',
+    'layer_latency.json')
+
+
+def _get_sparse_weight(weight, sparsity, block_size):
+  """Prunes the blocks of the weight with the smallest average magnitude.
+
+  Args:
+    weight: array of rank 2 or more.
+    sparsity: the fraction of the blocks to prune.
+    block_size: the dimensions of the blocks, over the last 2 dimensions.
+
+  Returns:
+    The pruned weight.
+  """
+  block_height, block_width = block_size
+  height, width = weight.shape[-2:]
+  padding = [(0, 0)] * (weight.ndim - 2) + [(0, -height % block_height),
+                                            (0, -width % block_width)]
+  padded_weight = np.pad(np.abs(weight), padding)
+  block_magnitudes = padded_weight.reshape(
+      list(weight.shape[:-2]) + [
+          padded_weight.shape[-2] // block_height, block_height,
+          padded_weight.shape[-1] // block_width, block_width
+      ]).mean(axis=(-3, -1))
+
+  block_mask = np.ones(block_magnitudes.size, dtype=weight.dtype)
+  num_pruned = int(round(sparsity * block_magnitudes.size))
+  block_mask[np.argsort(block_magnitudes, axis=None)[:num_pruned]] = 0.
+  block_mask = block_mask.reshape(block_magnitudes.shape)
+  mask = np.repeat(np.repeat(block_mask, block_height, axis=-2), block_width,
+                   axis=-1)[..., :height, :width]
+  return weight * mask
+
+
+def _get_cache_key(config):
+  return hashlib.sha1(
+      json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class LayerLatencyProfiler(object):
+  """Measures and caches the TFLite latency of layers on the local CPU."""
+
+  def __init__(self,
+               cache_path=_DEFAULT_CACHE_PATH,
+               num_threads=1,
+               num_runs=50,
+               num_warmup_runs=5):
+    """Creates a LayerLatencyProfiler.
+
+    Args:
+      cache_path: The JSON file caching the measured latencies, or None to
+        disable the cache.
+      num_threads: The number of threads of the TFLite interpreter.
+      num_runs: The number of timed invocations of every model.
+      num_warmup_runs: The number of invocations before the timed ones.
+    """
+    self._cache_path = cache_path
+    self._num_threads = num_threads
+    self._num_runs = num_runs
+    self._num_warmup_runs = num_warmup_runs
+    self._cache = None
+
+  def _load_cache(self):
+    if self._cache is None:
+      self._cache = {}
+      if self._cache_path and os.path.exists(self._cache_path):
+        with open(self._cache_path) as f:
+          self._cache = json.load(f)
+    return self._cache
+
+  def _save_cache(self):
+    if not self._cache_path:
+      return
+    cache_dir = os.path.dirname(self._cache_path)
+    if cache_dir:
+      os.makedirs(cache_dir, exist_ok=True)
+    # Writes to a temporary file first so that concurrent readers never see a
+    # partially written cache.
+    with tempfile.NamedTemporaryFile(
+        'w', dir=cache_dir or None, delete=False) as f:
+      json.dump(self._cache, f, sort_keys=True)
+    os.replace(f.name, self._cache_path)
+
+  def _get_cached_latency(self, config, measure_fn):
+    cache = self._load_cache()
+    config = dict(
+        config,
+        num_threads=self._num_threads,
+        tensorflow_version=tf.__version__)
+    key = _get_cache_key(config)
+    if key not in cache:
+      cache[key] = measure_fn()
+      self._save_cache()
+    return cache[key]
+
+  def _measure_tflite_latency(self, model, sparse):
+    """Returns the median TFLite latency of the model in milliseconds."""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if sparse:
+      converter.optimizations = [tf.lite.Optimize.EXPERIMENTAL_SPARSITY]
+    interpreter = tf.lite.Interpreter(
+        model_content=converter.convert(), num_threads=self._num_threads)
+    interpreter.allocate_tensors()
+    for input_details in interpreter.get_input_details():
+      interpreter.set_tensor(
+          input_details['index'],
+          np.random.standard_normal(input_details['shape']).astype(
+              input_details['dtype']))
+
+    for _ in range(self._num_warmup_runs):
+      interpreter.invoke()
+    latencies = []
+    for _ in range(self._num_runs):
+      start = time.perf_counter()
+      interpreter.invoke()
+      latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies)) * 1000.
+
+  def measure_layer(self, layer, sparsity=0., block_size=(1, 1)):
+    """Returns the latency of a layer with its kernel pruned, in milliseconds.
+
+    Args:
+      layer: A built keras layer with a single input and a `kernel`.
+      sparsity: The fraction of the blocks of the kernel which are pruned.
+      block_size: The block size of the pruned kernel.
+
+    Returns:
+      The median TFLite latency of the layer, for a batch of size 1.
+    """
+    input_shape = tf.TensorShape(layer.input_shape)[1:].as_list()
+    block_size = tuple(block_size)
+    config = layer.get_config()
+    config.pop('name', None)
+
+    def measure_fn():
+      model_layer = layer.__class__.from_config(layer.get_config())
+      model = keras.Sequential(
+          [keras.Input(shape=input_shape, batch_size=1), model_layer])
+      weights = layer.get_weights()
+      kernel_index = [weight is layer.kernel for weight in layer.weights
+                     ].index(True)
+      weights[kernel_index] = _get_sparse_weight(weights[kernel_index],
+                                                 sparsity, block_size)
+      model_layer.set_weights(weights)
+      return self._measure_tflite_latency(model, sparse=sparsity > 0.)
+
+    return self._get_cached_latency(
+        {
+            'layer': layer.__class__.__name__,
+            'config': config,
+            'input_shape': input_shape,
+            'sparsity': float(sparsity),
+            'block_size': block_size,
+        }, measure_fn)
+
+  def measure_model(self, model):
+    """Returns the latency of the dense model in milliseconds."""
+    return self._get_cached_latency(
+        {
+            'model': model.__class__.__name__,
+            'config': model.get_config(),
+        }, lambda: self._measure_tflite_latency(model, sparse=False))
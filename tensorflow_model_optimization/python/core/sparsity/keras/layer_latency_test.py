@@ -0,0 +1,67 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the measurement of the latency of layers."""
+
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.sparsity.keras import layer_latency
+
+
+class CachedOnlyProfiler(layer_latency.LayerLatencyProfiler):
+
+  def _measure_tflite_latency(self, model, sparse):
+    raise AssertionError('The latency should be read from the cache.')
+
+
+class LayerLatencyTest(tf.test.TestCase):
+
+  def testSparseWeightPrunesSmallestBlocks(self):
+    weight = np.array([[1., 1., 5., 5.],
+                       [1., 1., 5., 5.],
+                       [9., 9., -2., 2.]], dtype=np.float32)
+
+    sparse_weight = layer_latency._get_sparse_weight(weight, 0.5, (2, 2))
+
+    self.assertAllEqual(
+        [[0., 0., 5., 5.],
+         [0., 0., 5., 5.],
+         [9., 9., 0., 0.]], sparse_weight)
+
+  def testMeasuredLatencyIsCached(self):
+    cache_path = os.path.join(self.get_temp_dir(), 'latency.json')
+    layer = keras.layers.Dense(32)
+    keras.Sequential([keras.Input(shape=(16,)), layer])
+
+    latency = layer_latency.LayerLatencyProfiler(
+        cache_path, num_runs=2, num_warmup_runs=1).measure_layer(
+            layer, sparsity=0.5)
+
+    self.assertGreater(latency, 0.)
+    self.assertTrue(os.path.exists(cache_path))
+    # Another layer with the same configuration has the same latency
+    other_layer = keras.layers.Dense(32)
+    keras.Sequential([keras.Input(shape=(16,)), other_layer])
+    self.assertEqual(
+        latency,
+        CachedOnlyProfiler(cache_path).measure_layer(
+            other_layer, sparsity=0.5))
+
+
+if __name__ == '__main__':
+  tf.test.main()
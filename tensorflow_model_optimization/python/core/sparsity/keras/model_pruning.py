@@ -0,0 +1,294 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Model-level magnitude pruning, updating the masks of many layers at once."""
+
+import collections
+import json
+
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.keras import compat as tf_compat
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_impl
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_threshold
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_utils
+
+
+# Threshold engines whose result is exactly the k-th largest magnitude. Layers
+# using them are ranked together by a single segmented radix select.
+_EXACT_THRESHOLD_ENGINES = (pruning_threshold.TopKThreshold,
+                            pruning_threshold.RadixSelectThreshold)
+
+
+class _PruningGroup(object):
+  """Layers sharing a pruning schedule, updated under a single condition."""
+
+  def __init__(self, pruning_schedule, global_ranking, global_normalization,
+               sparsity_m_by_n):
+    self.pruning_schedule = pruning_schedule
+    self.global_ranking = global_ranking
+    self.global_normalization = global_normalization
+    self.sparsity_m_by_n = sparsity_m_by_n
+    self.step_fn = None
+    # (weight, mask, threshold) tuples ranked by the fused radix select.
+    self.fused_vars = []
+    # (pruning_obj, weight, mask, threshold) tuples updated one by one.
+    self.layer_vars = []
+
+
+class ModelPruning(object):
+  """Fused magnitude-based pruning of all the layers of a model.
+
+  Every `PruneLowMagnitude` layer updates its own masks by default, with one
+  `tf.cond` and one threshold computation per layer. `ModelPruning` instead
+  groups the layers sharing a pruning schedule and updates all the masks of a
+  group under a single condition. The thresholds of all the weights of a group
+  are found together with one segmented radix select over their magnitudes.
+
+  Layers whose `mask_update_mode` is 'GLOBAL' form their own groups. The
+  magnitudes of all the weights of such a group are ranked together and a
+  single threshold is used for all of them, so that the schedule's sparsity is
+  reached over the group as a whole rather than layer by layer. The ranking
+  merges the magnitude histograms of the layers one layer at a time, and never
+  concatenates their weights. With a `global_normalization` of 'L2' or 'MAX',
+  the magnitudes of each layer are first divided by the L2 norm or the largest
+  magnitude of the layer.
+
+  Layers using block sparsity, m_by_n sparsity or an approximate threshold
+  engine keep their per-layer mask computation, but still share the condition
+  of their group.
+
+  The weights of layers whose `masking_mode` is 'FORWARD' are not multiplied
+  by their masks between the updates. Their masked values are ranked instead,
+  and the weights are multiplied by their new masks after every update.
+
+  The saving is limited to the number of conditions and to the threshold
+  computations. An update still writes the mask and the threshold of every
+  weight, as the per-layer updates do. `UpdatePruningStep` runs it as its own
+  function before every training batch, outside of the training step, which
+  adds a dispatch per batch even when the schedules don't prune.
+  """
+
+  def __init__(self, prunable_layers):
+    """Creates the fused pruning logic for a list of pruned layers.
+
+    Args:
+      prunable_layers: A list of built `PruneLowMagnitude` layers whose
+        `mask_update_mode` is 'MODEL' or 'GLOBAL'.
+    """
+    self._groups = collections.OrderedDict()
+    # References of the weights of the layers with the 'FORWARD' masking mode.
+    self._masked_forward_weights = set()
+    for layer in prunable_layers:
+      self._add_layer(layer)
+
+  def _add_layer(self, layer):
+    """Adds the pruning variables of `layer` to the group of its schedule."""
+    global_ranking = layer.mask_update_mode == 'GLOBAL'
+    global_normalization = layer.global_normalization if global_ranking else None
+    key = (json.dumps(layer.pruning_schedule.get_config(), sort_keys=True),
+           global_ranking, global_normalization, layer.sparsity_m_by_n,
+           layer.step_source)
+    if key not in self._groups:
+      group = _PruningGroup(layer.pruning_schedule, global_ranking,
+                            global_normalization, layer.sparsity_m_by_n)
+      if layer.step_source == 'LAYER':
+        # The masks are updated before the training step in which the wrapper
+        # increments `pruning_step`, so the step of the update is one ahead.
+        group.step_fn = lambda step=layer.pruning_step: step + 1
+      else:
+        group.step_fn = layer.get_shared_pruning_step
+      self._groups[key] = group
+    group = self._groups[key]
+
+    masked_forward = layer.masking_mode == 'FORWARD'
+    if masked_forward:
+      self._masked_forward_weights.update(
+          weight.ref() for weight, _, _ in layer.pruning_vars)
+
+    # Layers ranked globally are always fused, the wrapper makes sure they
+    # don't use block or m_by_n sparsity.
+    is_fused = global_ranking or (
+        all(dim == 1 for dim in layer.block_size) and
+        not layer.sparsity_m_by_n and
+        isinstance(layer.threshold_engine, _EXACT_THRESHOLD_ENGINES))
+    if is_fused:
+      group.fused_vars.extend(layer.pruning_vars)
+    else:
+      pruning_obj = pruning_impl.Pruning(
+          training_step_fn=group.step_fn,
+          pruning_vars=layer.pruning_vars,
+          pruning_schedule=layer.pruning_schedule,
+          block_size=layer.block_size,
+          block_pooling_type=layer.block_pooling_type,
+          sparsity_m_by_n=layer.sparsity_m_by_n,
+          threshold_engine=layer.threshold_engine,
+          masked_forward=masked_forward)
+      for weight, mask, threshold in layer.pruning_vars:
+        group.layer_vars.append((pruning_obj, weight, mask, threshold))
+
+  def _num_kept(self, num_elements, sparsity):
+    """Number of weights kept, with the same rounding as `Pruning`."""
+    return tf.dtypes.cast(
+        tf.math.maximum(
+            tf.math.round(
+                tf.constant(num_elements, dtype=tf.float32) * (1 - sparsity)),
+            1), tf.int32)
+
+  def _layer_ranked_assign_objs(self, pruning_vars, sparsity):
+    """Returns the assign objs for weights of a group sharing a dtype."""
+    sizes = [weight.shape.num_elements() for weight, _, _ in pruning_vars]
+    abs_weights = tf.concat(
+        [tf.reshape(tf.math.abs(weight), [-1]) for weight, _, _ in pruning_vars],
+        axis=0)
+
+    segment_ids = tf.repeat(tf.range(len(sizes)), sizes)
+    thresholds = pruning_threshold.radix_select(
+        abs_weights,
+        self._num_kept(sizes, sparsity),
+        segment_ids=segment_ids,
+        num_segments=len(sizes))
+    new_masks = tf.math.greater_equal(abs_weights, tf.repeat(thresholds, sizes))
+
+    assign_objs = []
+    for (weight, mask, threshold), new_mask, new_threshold in zip(
+        pruning_vars, tf.split(new_masks, sizes), tf.unstack(thresholds)):
+      assign_objs.append(
+          tf_compat.assign(threshold,
+                           tf.dtypes.cast(new_threshold, threshold.dtype)))
+      assign_objs.append(
+          tf_compat.assign(
+              mask,
+              pruning_utils.pack_mask(
+                  tf.reshape(new_mask, weight.shape), mask.dtype)))
+    return assign_objs
+
+  def _global_assign_objs(self, pruning_vars, sparsity, normalization):
+    """Returns the assign objs for weights ranked together."""
+
+    def abs_weight(weight):
+      return tf.reshape(tf.math.abs(tf.dtypes.cast(weight, tf.float32)), [-1])
+
+    # The magnitudes of the layers are computed one layer after the other, so
+    # that only the normalized magnitudes of a single layer are alive at once.
+    scales = []
+    for weight, _, _ in pruning_vars:
+      with tf.control_dependencies(scales[-1:]):
+        if normalization == 'L2':
+          scale = tf.norm(abs_weight(weight))
+        elif normalization == 'MAX':
+          scale = tf.math.reduce_max(abs_weight(weight))
+        else:
+          scale = tf.constant(1.0)
+        # Leave all-zero weights unscaled.
+        scales.append(tf.where(scale > 0.0, scale, tf.ones_like(scale)))
+
+    def normalized_abs_weight(weight, scale):
+      return lambda: abs_weight(weight) / scale
+
+    # The histograms of the layers are merged by the radix select, which
+    # computes the normalized magnitudes of every layer when it needs them
+    # rather than keeping them alive through the whole selection.
+    num_weights = sum(
+        weight.shape.num_elements() for weight, _, _ in pruning_vars)
+    global_threshold = pruning_threshold.radix_select(
+        [
+            normalized_abs_weight(weight, scale)
+            for (weight, _, _), scale in zip(pruning_vars, scales)
+        ],
+        tf.reshape(self._num_kept(num_weights, sparsity), [1]))[0]
+
+    assign_objs = []
+    for (weight, mask, threshold), scale in zip(pruning_vars, scales):
+      with tf.control_dependencies(assign_objs[-1:]):
+        new_mask = tf.math.greater_equal(
+            normalized_abs_weight(weight, scale)(), global_threshold)
+        # The threshold of each layer is reported in its own magnitude units.
+        assign_objs.append(
+            tf_compat.assign(
+                threshold,
+                tf.dtypes.cast(global_threshold * scale, threshold.dtype)))
+        assign_objs.append(
+            tf_compat.assign(
+                mask,
+                pruning_utils.pack_mask(
+                    tf.reshape(new_mask, weight.shape), mask.dtype)))
+    return assign_objs
+
+  def _update_group(self, group):
+    """Returns the op updating the masks of a group if its schedule says so."""
+
+    def update():
+      assign_objs = []
+      _, sparsity = group.pruning_schedule(group.step_fn())
+
+      # The weights of the 'FORWARD' masking mode are ranked on their masked
+      # values, which the assign objs below only read through their shape
+      # and dtype.
+      masked_weights = collections.OrderedDict()
+      for weight, mask, _ in group.fused_vars:
+        if weight.ref() in self._masked_forward_weights:
+          masked_weights[weight.ref()] = weight * pruning_utils.unpack_mask(
+              mask, weight.shape, weight.dtype)
+      fused_vars = [(masked_weights.get(weight.ref(), weight), mask, threshold)
+                    for weight, mask, threshold in group.fused_vars]
+
+      if group.global_ranking:
+        assign_objs.extend(
+            self._global_assign_objs(fused_vars, sparsity,
+                                     group.global_normalization))
+      else:
+        fused_vars_by_dtype = collections.OrderedDict()
+        for weight, mask, threshold in fused_vars:
+          fused_vars_by_dtype.setdefault(weight.dtype.base_dtype, []).append(
+              (weight, mask, threshold))
+        for pruning_vars in fused_vars_by_dtype.values():
+          assign_objs.extend(
+              self._layer_ranked_assign_objs(pruning_vars, sparsity))
+
+      for pruning_obj, weight, mask, threshold in group.layer_vars:
+        masked_weight = pruning_obj._get_ranked_weight(weight, mask)  # pylint: disable=protected-access
+        new_threshold, new_mask = pruning_obj._maybe_update_block_mask(  # pylint: disable=protected-access
+            masked_weight)
+        assign_objs.append(tf_compat.assign(threshold, new_threshold))
+        assign_objs.append(
+            tf_compat.assign(mask, pruning_utils.pack_mask(new_mask,
+                                                           mask.dtype)))
+        if weight.ref() in self._masked_forward_weights:
+          assign_objs.append(tf_compat.assign(weight, masked_weight * new_mask))
+
+      if masked_weights:
+        with tf.control_dependencies(list(assign_objs)):
+          for weight, mask, _ in group.fused_vars:
+            if weight.ref() in masked_weights:
+              new_mask = pruning_utils.unpack_mask(
+                  mask.read_value(), weight.shape, weight.dtype)
+              assign_objs.append(
+                  tf_compat.assign(weight,
+                                   masked_weights[weight.ref()] * new_mask))
+
+      return tf.group(assign_objs)
+
+    if group.sparsity_m_by_n:
+      # Update structured sparsity masks only at step 1
+      should_prune = tf.math.equal(group.step_fn(), 1)
+    else:
+      should_prune = group.pruning_schedule(group.step_fn())[0]
+    return tf.cond(should_prune, update, tf.no_op)
+
+  def conditional_mask_update(self):
+    """Returns an op to update the masks of all layers as per their schedule."""
+    with tf.name_scope('model_pruning_ops'):
+      return tf.group([self._update_group(group)
+                       for group in self._groups.values()])
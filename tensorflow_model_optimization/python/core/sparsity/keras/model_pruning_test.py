@@ -0,0 +1,199 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for model-level pruning."""
+
+from absl.testing import parameterized
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.sparsity.keras import model_pruning
+from tensorflow_model_optimization.python.core.sparsity.keras import prune
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_callbacks
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_schedule
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_threshold
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_wrapper
+
+
+layers = keras.layers
+
+
+class ModelPruningTest(tf.test.TestCase, parameterized.TestCase):
+
+  def _build_pruned_layers(self, mask_update_mode, schedules, **kwargs):
+    np.random.seed(0)
+    pruned_layers = []
+    for i, schedule in enumerate(schedules):
+      layer = pruning_wrapper.PruneLowMagnitude(
+          layers.Dense(8 + 4 * i),
+          pruning_schedule=schedule,
+          mask_update_mode=mask_update_mode,
+          **kwargs)
+      layer.build((None, 16 + 8 * i))
+      layer.pruning_step.assign(0)
+      for weight in layer.prunable_weights:
+        weight.assign(np.random.standard_normal(weight.shape))
+      pruned_layers.append(layer)
+    return pruned_layers
+
+  def _masks(self, pruned_layers):
+    return [
+        mask.numpy()
+        for layer in pruned_layers
+        for _, mask, _ in layer.pruning_vars
+    ]
+
+  @parameterized.parameters(
+      pruning_threshold.TopKThreshold(),
+      pruning_threshold.RadixSelectThreshold(),
+      pruning_threshold.HistogramThreshold(),
+  )
+  def testMatchesLayerMaskUpdate(self, threshold_engine):
+    schedules = [
+        pruning_schedule.ConstantSparsity(0.5, 0, frequency=1),
+        pruning_schedule.ConstantSparsity(0.5, 0, frequency=1),
+        pruning_schedule.PolynomialDecay(0.2, 0.8, 0, 10, frequency=1),
+    ]
+    layer_pruned = self._build_pruned_layers(
+        'LAYER', schedules, threshold_engine=threshold_engine)
+    model_pruned = self._build_pruned_layers(
+        'MODEL', schedules, threshold_engine=threshold_engine)
+
+    for layer in layer_pruned:
+      # The wrapper increments its step before updating the mask.
+      layer.pruning_step.assign_add(1)
+      layer.pruning_obj.conditional_mask_update()
+    model_pruning.ModelPruning(model_pruned).conditional_mask_update()
+
+    for layer_mask, model_mask in zip(
+        self._masks(layer_pruned), self._masks(model_pruned)):
+      self.assertAllEqual(layer_mask, model_mask)
+
+  def testGroupsLayersBySchedule(self):
+    schedules = [
+        pruning_schedule.ConstantSparsity(0.5, 0, frequency=1),
+        pruning_schedule.ConstantSparsity(0.5, 10, frequency=1),
+    ]
+    pruned_layers = self._build_pruned_layers('MODEL', schedules)
+
+    model_pruning.ModelPruning(pruned_layers).conditional_mask_update()
+
+    masks = self._masks(pruned_layers)
+    self.assertAllClose(0.5, np.mean(masks[0]), atol=0.01)
+    # The second schedule only starts at step 10.
+    self.assertAllEqual(np.ones_like(masks[1]), masks[1])
+
+  def testGlobalRanking(self):
+    schedule = pruning_schedule.ConstantSparsity(0.75, 0, frequency=1)
+    pruned_layers = self._build_pruned_layers('GLOBAL', [schedule] * 3)
+    # Make the weights of the first layer much smaller than the others.
+    kernel = pruned_layers[0].prunable_weights[0]
+    kernel.assign(kernel * 0.01)
+
+    model_pruning.ModelPruning(pruned_layers).conditional_mask_update()
+
+    masks = self._masks(pruned_layers)
+    weights = [
+        weight.numpy()
+        for layer in pruned_layers
+        for weight, _, _ in layer.pruning_vars
+    ]
+    num_weights = sum(mask.size for mask in masks)
+    num_kept = sum(np.count_nonzero(mask) for mask in masks)
+    self.assertEqual(round(num_weights * 0.25), num_kept)
+    self.assertEqual(0, np.count_nonzero(masks[0]))
+
+    thresholds = [
+        threshold.numpy()
+        for layer in pruned_layers
+        for _, _, threshold in layer.pruning_vars
+    ]
+    self.assertAllEqual([thresholds[0]] * len(thresholds), thresholds)
+    kept_weights = np.concatenate(
+        [np.abs(w[m == 1]) for w, m in zip(weights, masks)])
+    pruned_weights = np.concatenate(
+        [np.abs(w[m == 0]) for w, m in zip(weights, masks)])
+    self.assertGreaterEqual(kept_weights.min(), pruned_weights.max())
+
+  @parameterized.parameters('L2', 'MAX')
+  def testGlobalRankingWithNormalization(self, global_normalization):
+    schedule = pruning_schedule.ConstantSparsity(0.75, 0, frequency=1)
+    pruned_layers = self._build_pruned_layers(
+        'GLOBAL', [schedule] * 3, global_normalization=global_normalization)
+    # Normalization makes the ranking independent of the scale of a layer.
+    kernel = pruned_layers[0].prunable_weights[0]
+    kernel.assign(kernel * 0.01)
+
+    model_pruning.ModelPruning(pruned_layers).conditional_mask_update()
+
+    masks = self._masks(pruned_layers)
+    num_weights = sum(mask.size for mask in masks)
+    num_kept = sum(np.count_nonzero(mask) for mask in masks)
+    self.assertEqual(round(num_weights * 0.25), num_kept)
+    self.assertGreater(np.count_nonzero(masks[0]), 0)
+
+    weight, mask, threshold = pruned_layers[0].pruning_vars[0]
+    abs_weight = np.abs(weight.numpy())
+    self.assertGreaterEqual(abs_weight[mask.numpy() == 1].min(),
+                            threshold.numpy() * (1 - 1e-6))
+    self.assertLess(abs_weight[mask.numpy() == 0].max(), threshold.numpy())
+
+  @parameterized.parameters('MODEL', 'GLOBAL')
+  def testPrunesModelWithCallback(self, mask_update_mode):
+    model = keras.Sequential([
+        layers.Dense(32, activation='relu', input_shape=(10,)),
+        layers.Dense(16, activation='relu'),
+        layers.Dense(5, activation='softmax'),
+    ])
+    pruned_model = prune.prune_low_magnitude(
+        model,
+        pruning_schedule=pruning_schedule.ConstantSparsity(0.5, 0, frequency=1),
+        mask_update_mode=mask_update_mode)
+    pruned_model.compile(
+        loss='categorical_crossentropy', optimizer='sgd', metrics=['accuracy'])
+
+    pruned_model.fit(
+        np.random.rand(20, 10),
+        keras.utils.to_categorical(np.random.randint(5, size=(20, 1)), 5),
+        epochs=2,
+        batch_size=10,
+        callbacks=[pruning_callbacks.UpdatePruningStep()])
+
+    stripped_model = prune.strip_pruning(pruned_model)
+    weights = [layer.kernel.numpy() for layer in stripped_model.layers]
+    num_weights = sum(weight.size for weight in weights)
+    num_zeros = sum(weight.size - np.count_nonzero(weight)
+                    for weight in weights)
+    self.assertAllClose(0.5, num_zeros / num_weights, atol=0.01)
+
+  def testGlobalModeRejectsBlockSparsity(self):
+    with self.assertRaises(ValueError):
+      pruning_wrapper.PruneLowMagnitude(
+          layers.Dense(10), block_size=(2, 2), mask_update_mode='GLOBAL')
+
+  def testInvalidGlobalNormalization(self):
+    with self.assertRaises(ValueError):
+      pruning_wrapper.PruneLowMagnitude(
+          layers.Dense(10), mask_update_mode='GLOBAL',
+          global_normalization='L1')
+
+  def testInvalidMaskUpdateMode(self):
+    with self.assertRaises(ValueError):
+      pruning_wrapper.PruneLowMagnitude(
+          layers.Dense(10), mask_update_mode='NETWORK')
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -20,7 +20,9 @@ import tensorflow as tf
 from tensorflow_model_optimization.python.core.keras import metrics
 from tensorflow_model_optimization.python.core.keras.compat import keras
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_schedule as pruning_sched
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_utils
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_wrapper
+from tensorflow_model_optimization.python.core.sparsity.keras import sparse_layers
 
 
 custom_object_scope = keras.utils.custom_object_scope
@@ -61,6 +63,12 @@ def prune_low_magnitude(to_prune,
                         block_pooling_type='AVG',
                         pruning_policy=None,
                         sparsity_m_by_n=None,
+                        threshold_engine=None,
+                        mask_update_mode='LAYER',
+                        global_normalization=None,
+                        step_source='LAYER',
+                        masking_mode='WEIGHT',
+                        mask_storage='FLOAT',
                         **kwargs):
   """Modify a keras layer or model to be pruned during training.
 
@@ -92,6 +100,18 @@ def prune_low_magnitude(to_prune,
       ]), **pruning_params)
   ```
 
+  Prune a model to a model-wide sparsity, ranking the weights of all the layers
+  together:
+
+  ```python
+  model = prune_low_magnitude(
+      model,
+      pruning_schedule=PolynomialDecay(initial_sparsity=0.2,
+          final_sparsity=0.8, begin_step=1000, end_step=2000),
+      mask_update_mode='GLOBAL',
+      global_normalization='L2')
+  ```
+
   Prune a layer:
 
   ```python
@@ -132,17 +152,54 @@ def prune_low_magnitude(to_prune,
         instance.
       pruning_schedule: A `PruningSchedule` object that controls pruning rate
         throughout training.
-      block_size: (optional) The dimensions (height, weight) for the block
-        sparse pattern in rank-2 weight tensors.
+      block_size: (optional) The dimensions for the block sparse pattern,
+        applied to the last dimensions of the weight tensors, e.g. (height,
+        width) of rank-2 weight tensors or (input channels, output channels)
+        of Conv2D kernels.
       block_pooling_type: (optional) The function to use to pool weights in the
         block. Must be 'AVG' or 'MAX'.
       pruning_policy: (optional) The object that controls to which layers
-        `PruneLowMagnitude` wrapper will be applied. This API is experimental
-        and is subject to change.
+        `PruneLowMagnitude` wrapper will be applied, and with which pruning
+        parameters. This API is experimental and is subject to change.
       sparsity_m_by_n: default None, otherwise a tuple of 2 integers, indicates
         pruning with m_by_n sparsity, e.g., (2, 4): 2 zeros out of 4 consecutive
         elements. It check whether we can do pruning with m_by_n sparsity. If
         this type of sparsity is not applicable, then an error is thrown.
+      threshold_engine: (optional) A `PruningThreshold` object that computes
+        the magnitude threshold of the weights. `TopKThreshold` by default,
+        `RadixSelectThreshold`, `HistogramThreshold` and `SampledThreshold`
+        are cheaper for very large weight tensors.
+      mask_update_mode: (optional) 'LAYER' (default) to let every layer update
+        its own masks. 'MODEL' to update the masks of all the layers sharing a
+        pruning schedule together, from the `UpdatePruningStep` callback. This
+        evaluates one condition per schedule instead of one per layer, and
+        ranks the weights of a schedule with a single radix select; the
+        update still runs as a separate function before every batch, and
+        writes the mask and threshold of every weight.
+        'GLOBAL' to additionally rank the weights across those layers, so that
+        the target sparsity applies to the layers as a whole.
+      global_normalization: (optional) With mask_update_mode='GLOBAL', how the
+        weight magnitudes of each layer are normalized before being ranked
+        across layers: None (raw magnitudes), 'L2' (divided by the L2 norm of
+        the layer's weight) or 'MAX' (divided by its largest magnitude).
+      step_source: (optional) 'LAYER' (default) to let every layer count its
+        own training steps. 'OPTIMIZER' to use the iterations of the optimizer
+        as the step of all the layers, set by the `UpdatePruningStep`
+        callback, which saves a variable update and a check per layer at
+        every training step. Combined with a `mask_update_mode` of 'MODEL',
+        the pruning schedule is evaluated once per step.
+      masking_mode: (optional) 'WEIGHT' (default) to multiply the weights by
+        their masks at every training step. 'FORWARD' to only mask the
+        weights in the forward pass of the layers, and multiply them by
+        their masks when the masks are updated, at the end of every epoch and
+        in `strip_pruning`. This saves a write of all the pruned weights at
+        every training step.
+      mask_storage: (optional) 'FLOAT' (default) to store every mask as a
+        variable with the shape and dtype of its weight. 'BOOL' to store the
+        masks as booleans, or 'PACKED' to pack 32 mask elements per int32
+        word, which reduces the memory and checkpoint size of the masks by up
+        to 32 times. See `convert_mask_storage` to load checkpoints saved
+        with another storage.
       **kwargs: Additional keyword arguments to be passed to the keras layer.
         Ignored when to_prune is not a keras layer.
 
@@ -185,6 +242,9 @@ def prune_low_magnitude(to_prune,
       return layer
     if pruning_policy and not pruning_policy.allow_pruning(layer):
       return layer
+    elif pruning_policy:
+      layer_params = dict(params, **pruning_policy.get_pruning_params(layer))
+      return pruning_wrapper.PruneLowMagnitude(layer, **layer_params)
     else:
       return pruning_wrapper.PruneLowMagnitude(layer, **params)
 
@@ -193,6 +253,12 @@ def prune_low_magnitude(to_prune,
       'block_size': block_size,
       'block_pooling_type': block_pooling_type,
       'sparsity_m_by_n': sparsity_m_by_n,
+      'threshold_engine': threshold_engine,
+      'mask_update_mode': mask_update_mode,
+      'global_normalization': global_normalization,
+      'step_source': step_source,
+      'masking_mode': masking_mode,
+      'mask_storage': mask_storage,
   }
 
   is_sequential_or_functional = isinstance(
@@ -221,7 +287,7 @@ def prune_low_magnitude(to_prune,
     )
 
 
-def strip_pruning(model):
+def strip_pruning(model, sparse_inference=False, min_sparsity=None):
   """Strip pruning wrappers from the model.
 
   Once a model has been pruned to required sparsity, this method can be used
@@ -229,8 +295,19 @@ def strip_pruning(model):
 
   Only sequential and functional models are supported for now.
 
+  With `sparse_inference`, the pruned `Dense` layers, and `Conv2D` layers with
+  1x1 kernels, are replaced by `SparseDense` layers computing with their
+  kernels in a compressed sparse format, using the block size they were pruned
+  with. A layer is only replaced when its kernel is sparse enough for the
+  sparse layer to be faster than the dense layer on CPU.
+
   Arguments:
       model: A `keras.Model` instance with pruned layers.
+      sparse_inference: Whether to replace the sparse enough `Dense` and 1x1
+        `Conv2D` layers by `SparseDense` layers.
+      min_sparsity: The minimum fraction of zero blocks of the kernels of the
+        layers replaced with `sparse_inference`. By default, it depends on the
+        size of the kernel and on the block size.
 
   Returns:
     A keras model with pruning wrappers removed.
@@ -254,6 +331,18 @@ def strip_pruning(model):
         'Expected model to be a `keras.Model` instance but got: ', model
     )
 
+  def _convert_to_sparse_layer(layer, min_sparsity):
+    kernel_mask = None
+    for weight, mask, _ in layer.pruning_vars:
+      if weight is getattr(layer.layer, 'kernel', None):
+        kernel_mask = pruning_utils.unpack_mask(mask, weight.shape,
+                                                weight.dtype)
+    return sparse_layers.convert_to_sparse_dense(
+        layer.layer,
+        kernel_mask=kernel_mask,
+        block_size=layer.block_size,
+        min_sparsity=min_sparsity)
+
   def _strip_pruning_wrapper(layer):
     if isinstance(layer, keras.Model):
       # A keras model with prunable layers
@@ -266,8 +355,107 @@ def strip_pruning(model):
       if not hasattr(layer.layer, '_batch_input_shape') and hasattr(
           layer, '_batch_input_shape'):
         layer.layer._batch_input_shape = layer._batch_input_shape
+      if sparse_inference:
+        sparse_layer = _convert_to_sparse_layer(layer, min_sparsity)
+        if sparse_layer is not None:
+          if hasattr(layer.layer, '_batch_input_shape'):
+            sparse_layer._batch_input_shape = layer.layer._batch_input_shape
+          return sparse_layer
+      if layer.masking_mode == 'FORWARD':
+        # The weights are only masked in the forward pass of the wrapper. The
+        # masked weights are set to a copy of the layer once it is built, so
+        # that the weights of the pruned model are left untouched.
+        stripped_layer = layer.layer.__class__.from_config(
+            layer.layer.get_config())
+        forward_masked_layers.append((stripped_layer, _masked_weights(layer)))
+        return stripped_layer
       return layer.layer
     return layer
 
-  return keras.models.clone_model(
+  def _masked_weights(layer):
+    masks = {
+        id(weight): pruning_utils.unpack_mask(mask, weight.shape, weight.dtype)
+        for weight, mask, _ in layer.pruning_vars
+    }
+    weights = layer.layer.weights
+    values = keras.backend.batch_get_value(weights)
+    return [
+        value * keras.backend.get_value(masks[id(weight)])
+        if id(weight) in masks else value
+        for weight, value in zip(weights, values)
+    ]
+
+  forward_masked_layers = []
+  stripped_model = keras.models.clone_model(
       model, input_tensors=None, clone_function=_strip_pruning_wrapper)
+  for stripped_layer, weights in forward_masked_layers:
+    stripped_layer.set_weights(weights)
+  return stripped_model
+
+
+def convert_mask_storage(model, mask_storage):
+  """Returns a copy of a pruned model with its masks stored differently.
+
+  The checkpoints of a pruned model can only be restored into a model storing
+  its masks the same way. To change the storage of a trained model, restore
+  its checkpoint into a model with the original `mask_storage` and convert it.
+
+  Only sequential and functional models are supported for now.
+
+  Arguments:
+      model: A built `keras.Model` instance with pruned layers.
+      mask_storage: 'FLOAT', 'BOOL' or 'PACKED', the storage of the masks of
+        all the pruned layers of the returned model.
+
+  Returns:
+    A keras model with the same weights and masks as `model`. Optimizer is
+    removed.
+
+  Raises:
+    ValueError: if the model is not a `keras.Model` instance.
+
+  Usage:
+
+  ```python
+  pruned_model = prune_low_magnitude(orig_model, mask_storage='FLOAT')
+  pruned_model.load_weights(float_masks_checkpoint)
+  packed_model = convert_mask_storage(pruned_model, 'PACKED')
+  packed_model.save_weights(packed_masks_checkpoint)
+  ```
+  """
+  if not isinstance(model, keras.Model):
+    raise ValueError(
+        'Expected model to be a `keras.Model` instance but got: ', model)
+
+  def _convert_pruning_wrapper(layer):
+    if isinstance(layer, keras.Model):
+      return keras.models.clone_model(
+          layer, input_tensors=None, clone_function=_convert_pruning_wrapper)
+    config = layer.get_config()
+    if isinstance(layer, pruning_wrapper.PruneLowMagnitude):
+      config['mask_storage'] = mask_storage
+    return layer.__class__.from_config(config)
+
+  converted_model = keras.models.clone_model(
+      model, input_tensors=None, clone_function=_convert_pruning_wrapper)
+
+  # Both models create their variables in the same order, only the masks
+  # differ.
+  weights_by_mask = {}
+  for layer in pruning_wrapper.collect_prunable_layers(model):
+    for weight, mask, _ in layer.pruning_vars:
+      weights_by_mask[mask.ref()] = weight
+  values = keras.backend.batch_get_value(model.weights)
+  converted_values = []
+  for variable, value, converted_variable in zip(model.weights, values,
+                                                  converted_model.weights):
+    if variable.ref() in weights_by_mask:
+      weight = weights_by_mask[variable.ref()]
+      value = keras.backend.get_value(
+          pruning_utils.pack_mask(
+              pruning_utils.unpack_mask(
+                  tf.constant(value), weight.shape, weight.dtype),
+              converted_variable.dtype))
+    converted_values.append((converted_variable, value))
+  keras.backend.batch_set_value(converted_values)
+  return converted_model
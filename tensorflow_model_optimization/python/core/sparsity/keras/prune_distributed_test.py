@@ -17,6 +17,7 @@
 import tempfile
 
 from absl.testing import parameterized
+import mock
 import numpy as np
 import tensorflow as tf
 
@@ -24,17 +25,33 @@ from tensorflow_model_optimization.python.core.keras import test_utils as keras_
 from tensorflow_model_optimization.python.core.keras.compat import keras
 from tensorflow_model_optimization.python.core.sparsity.keras import prune
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_callbacks
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_impl
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_schedule
 from tensorflow_model_optimization.python.core.sparsity.keras import test_utils
 
 
+def setUpModule():
+  # The logical devices must be configured before the strategies of the tests
+  # initialize the runtime, which is why the strategies are only created in
+  # the tests.
+  cpu = tf.config.list_physical_devices('CPU')[0]
+  try:
+    tf.config.set_logical_device_configuration(
+        cpu, [tf.config.LogicalDeviceConfiguration()] * 2)
+  except RuntimeError:
+    # The runtime was initialized by another test of the process, the tests
+    # needing several devices are skipped.
+    pass
+
+
 def _distribution_strategies():
   return [
-      tf.distribute.experimental.MultiWorkerMirroredStrategy(),
-      tf.distribute.MirroredStrategy(),
+      ('MultiWorkerMirrored',
+       tf.distribute.experimental.MultiWorkerMirroredStrategy),
+      ('Mirrored', tf.distribute.MirroredStrategy),
       # TODO(pulkitb): Add parameter_server
       # tf.distribute.experimental.ParameterServerStrategy once ready in TF2.
-      tf.distribute.OneDeviceStrategy('/cpu:0'),
+      ('OneDevice', lambda: tf.distribute.OneDeviceStrategy('/cpu:0')),
   ]
 
 
@@ -48,8 +65,9 @@ class PruneDistributedTest(tf.test.TestCase, parameterized.TestCase):
         'block_pooling_type': 'AVG',
     }
 
-  @parameterized.parameters(_distribution_strategies())
-  def testPrunesSimpleDenseModel(self, distribution):
+  @parameterized.named_parameters(_distribution_strategies())
+  def testPrunesSimpleDenseModel(self, create_distribution):
+    distribution = create_distribution()
     with distribution.scope():
       model = prune.prune_low_magnitude(
           keras_test_utils.build_simple_dense_model(), **self.params
@@ -80,6 +98,40 @@ class PruneDistributedTest(tf.test.TestCase, parameterized.TestCase):
 
     test_utils.assert_model_sparsity(self, 0.5, loaded_model)
 
+  def testMasksWeightsWithoutCrossReplicaReduction(self):
+    if len(tf.config.list_logical_devices('CPU')) < 2:
+      self.skipTest('Needs 2 logical CPUs.')
+    distribution = tf.distribute.MirroredStrategy(['/cpu:0', '/cpu:1'])
+    with distribution.scope():
+      weight = tf.Variable(np.random.randn(8, 6).astype(np.float32))
+      mask = tf.Variable(
+          (np.random.rand(8, 6) > 0.5).astype(np.float32),
+          aggregation=tf.VariableAggregation.MEAN)
+      threshold = tf.Variable(0., aggregation=tf.VariableAggregation.MEAN)
+    pruning_obj = pruning_impl.Pruning(
+        training_step_fn=lambda: tf.constant(0, dtype=tf.int64),
+        pruning_vars=[(weight, mask, threshold)],
+        pruning_schedule=pruning_schedule.ConstantSparsity(0.5, 0),
+        block_size=(1, 1),
+        block_pooling_type='AVG')
+    expected_weight = weight.numpy() * mask.numpy()
+
+    @tf.function
+    def mask_weights():
+      distribution.run(pruning_obj.weight_mask_op)
+
+    # The weights are masked on every replica, without any all-reduce.
+    with mock.patch.object(
+        distribution.extended,
+        'batch_reduce_to',
+        side_effect=AssertionError('Unexpected cross-replica reduction.')):
+      mask_weights()
+
+    replica_weights = distribution.experimental_local_results(weight)
+    self.assertLen(replica_weights, 2)
+    for replica_weight in replica_weights:
+      self.assertAllEqual(expected_weight, replica_weight)
+
 
 if __name__ == '__main__':
   tf.test.main()
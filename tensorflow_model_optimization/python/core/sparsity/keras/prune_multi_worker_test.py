@@ -0,0 +1,145 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Multi-worker pruning test."""
+
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.keras import test_utils as keras_test_utils
+from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.keras.testing import multi_worker_test_utils
+from tensorflow_model_optimization.python.core.sparsity.keras import prune
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_callbacks
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_schedule
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_threshold
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_utils
+
+
+# The functions run on the clusters are pickled, so they are defined at the
+# top level.
+
+
+def _training_data():
+  rng = np.random.RandomState(0)
+  x_train = rng.rand(40, 10).astype(np.float32)
+  y_train = keras.utils.to_categorical(rng.randint(5, size=(40, 1)), 5)
+  return x_train, y_train
+
+
+def _masks(model):
+  masks = []
+  for layer in model.layers:
+    for _, mask, _ in layer.pruning_vars:
+      masks.append(
+          pruning_utils.unpack_mask(
+              keras.backend.get_value(mask), mask.shape,
+              layer.layer.dtype).numpy())
+  return masks
+
+
+def _train_multi_worker_mirrored(strategy, mask_update_mode):
+  with strategy.scope():
+    model = prune.prune_low_magnitude(
+        keras_test_utils.build_simple_dense_model(),
+        pruning_schedule=pruning_schedule.ConstantSparsity(
+            0.5, begin_step=0, frequency=1),
+        mask_update_mode=mask_update_mode,
+        threshold_engine=pruning_threshold.SampledThreshold(num_samples=16))
+    model.compile(loss='categorical_crossentropy', optimizer='sgd')
+
+  x_train, y_train = _training_data()
+  model.fit(
+      x_train,
+      y_train,
+      batch_size=10,
+      epochs=2,
+      callbacks=[pruning_callbacks.UpdatePruningStep()])
+
+  weights = [
+      keras.backend.get_value(weight)
+      for layer in model.layers
+      for weight, _, _ in layer.pruning_vars
+  ]
+  return weights, _masks(model)
+
+
+def _train_parameter_server(strategy, masking_mode):
+  with strategy.scope():
+    model = prune.prune_low_magnitude(
+        keras_test_utils.build_simple_dense_model(),
+        pruning_schedule=pruning_schedule.ConstantSparsity(
+            0.5, begin_step=0, frequency=1),
+        masking_mode=masking_mode)
+    model.compile(loss='categorical_crossentropy', optimizer='sgd')
+
+  x_train, y_train = _training_data()
+  dataset = tf.data.Dataset.from_tensor_slices(
+      (x_train, y_train)).repeat().batch(10)
+  model.fit(
+      dataset,
+      epochs=2,
+      steps_per_epoch=4,
+      callbacks=[pruning_callbacks.UpdatePruningStep()])
+
+  stripped_model = prune.strip_pruning(model)
+  return _masks(model), [
+      layer.kernel.numpy() for layer in stripped_model.layers
+  ]
+
+
+def _build_weight_masking_parameter_server(strategy):
+  try:
+    with strategy.scope():
+      model = prune.prune_low_magnitude(
+          keras_test_utils.build_simple_dense_model(), masking_mode='WEIGHT')
+      model.build((None, 10))
+  except ValueError:
+    return True
+  return False
+
+
+class PruneMultiWorkerTest(tf.test.TestCase):
+
+  def testMultiWorkerMirroredComputesSameMasksOnEveryWorker(self):
+    for mask_update_mode in ['LAYER', 'MODEL']:
+      worker_results = multi_worker_test_utils.run_multi_worker_mirrored(
+          _train_multi_worker_mirrored, args=(mask_update_mode,))
+
+      weights, masks = worker_results[0]
+      for mask, weight in zip(masks, weights):
+        self.assertAllClose(0.5, 1. - np.mean(mask))
+        self.assertFalse(np.any(weight[mask == 0]))
+      for other_weights, other_masks in worker_results[1:]:
+        for weight, other_weight in zip(weights, other_weights):
+          self.assertAllEqual(weight, other_weight)
+        for mask, other_mask in zip(masks, other_masks):
+          self.assertAllEqual(mask, other_mask)
+
+  def testParameterServerWithForwardMasking(self):
+    masks, kernels = multi_worker_test_utils.run_parameter_server(
+        _train_parameter_server, args=('FORWARD',))
+
+    for mask, kernel in zip(masks, kernels):
+      self.assertAllClose(0.5, 1. - np.mean(mask))
+      self.assertFalse(np.any(kernel[mask == 0]))
+
+  def testParameterServerRaisesError_WeightMasking(self):
+    self.assertTrue(
+        multi_worker_test_utils.run_parameter_server(
+            _build_weight_masking_parameter_server))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -357,6 +357,58 @@ class PruneTest(test.TestCase):
     self.assertEqual(self._count_pruned_layers(stripped_model), 0)
     self.assertEqual(model.get_config(), stripped_model.get_config())
 
+  def testStripPruningForwardMaskingKeepsPrunedModelWeights(self):
+    pruned_model = prune.prune_low_magnitude(
+        keras_test_utils.build_simple_dense_model(), masking_mode='FORWARD')
+    for layer in pruned_model.layers:
+      for _, mask, _ in layer.pruning_vars:
+        mask.assign((np.random.rand(*mask.shape) > 0.5).astype(np.float32))
+    pruned_weights = pruned_model.get_weights()
+
+    stripped_model = prune.strip_pruning(pruned_model)
+
+    # The weights of the model, which may still be trained, aren't masked.
+    for weight, expected_weight in zip(pruned_model.get_weights(),
+                                       pruned_weights):
+      self.assertAllEqual(expected_weight, weight)
+    for stripped_layer, layer in zip(stripped_model.layers,
+                                     pruned_model.layers):
+      (kernel, mask, _), = layer.pruning_vars
+      self.assertAllEqual(kernel * mask, stripped_layer.kernel)
+      self.assertAllEqual(layer.layer.bias, stripped_layer.bias)
+    inputs = np.random.rand(4, 10)
+    self.assertAllClose(pruned_model(inputs), stripped_model(inputs))
+
+  def testConvertMaskStorageRestoresFloatMaskCheckpoint(self):
+    model = keras_test_utils.build_simple_dense_model()
+    pruned_model = prune.prune_low_magnitude(model)
+    for layer in pruned_model.layers:
+      for _, mask, _ in layer.pruning_vars:
+        mask.assign((np.random.rand(*mask.shape) > 0.5).astype(np.float32))
+    _, tf_weights = tempfile.mkstemp('.tf')
+    pruned_model.save_weights(tf_weights)
+
+    float_mask_model = prune.prune_low_magnitude(
+        keras_test_utils.build_simple_dense_model())
+    float_mask_model.load_weights(tf_weights)
+    packed_mask_model = prune.convert_mask_storage(float_mask_model, 'PACKED')
+
+    inputs = np.random.rand(4, 10)
+    self.assertAllClose(pruned_model(inputs), packed_mask_model(inputs))
+    _, packed_mask_layer = packed_mask_model.layers
+    _, mask, _ = packed_mask_layer.pruning_vars[0]
+    self.assertEqual(tf.int32, mask.dtype)
+    # 40 mask elements are packed into 2 words
+    self.assertEqual([2], mask.shape.as_list())
+
+    # Back to float masks
+    restored_model = prune.convert_mask_storage(packed_mask_model, 'FLOAT')
+    for layer, restored_layer in zip(pruned_model.layers,
+                                     restored_model.layers):
+      for (_, mask, _), (_, restored_mask, _) in zip(
+          layer.pruning_vars, restored_layer.pruning_vars):
+        self.assertAllEqual(mask, restored_mask)
+
   def testPruneScope_NeededForKerasModel(self):
     model = keras_test_utils.build_simple_dense_model()
     pruned_model = prune.prune_low_magnitude(model)
@@ -20,12 +20,13 @@ from __future__ import print_function
 
 # import g3
 
-import numpy as np
 import six
 import tensorflow as tf
 
 from tensorflow_model_optimization.python.core.keras import compat
 from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.sparsity.keras import model_pruning
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_utils
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_wrapper
 
 
@@ -39,6 +40,12 @@ class UpdatePruningStep(callbacks.Callback):
   This callback must be used when training a model which needs to be pruned. Not
   doing so will throw an error.
 
+  The callback also updates the masks of the layers pruned with a
+  `mask_update_mode` of 'MODEL' or 'GLOBAL', before every training batch. The
+  update is a separate function, run from the host at every batch, or every
+  `steps_per_execution` batches, in addition to the training step. See
+  `ModelPruning` for what it saves.
+
   Example:
 
   ```python
@@ -49,21 +56,65 @@ class UpdatePruningStep(callbacks.Callback):
 
   def __init__(self):
     super(UpdatePruningStep, self).__init__()
+    # The batch hooks don't read the logs. This also allows them with a
+    # ParameterServerStrategy, where they run on the coordinator and update
+    # the masks once for all the workers.
+    self._supports_tf_logs = True
     self.prunable_layers = []
+    self._model_pruning_layers = []
+    self._model_pruning_update = None
 
   def on_train_begin(self, logs=None):
     # Collect all the prunable layers in the model.
     self.prunable_layers = pruning_wrapper.collect_prunable_layers(self.model)
-    if not self.prunable_layers:
+    # Layers whose masks are updated by this callback rather than by the
+    # layers themselves.
+    self._model_pruning_layers = [
+        layer for layer in self.prunable_layers
+        if layer.mask_update_mode != 'LAYER'
+    ]
+    self._model_pruning_update = None
+    # Layers sharing the iterations of the optimizer as pruning step.
+    for layer in self.prunable_layers:
+      if layer.step_source == 'OPTIMIZER':
+        layer.set_shared_pruning_step(self.model.optimizer.iterations)
+
+    step_layers = [
+        layer for layer in self.prunable_layers if layer.step_source == 'LAYER'
+    ]
+    if not step_layers:
       return
     # If the model is newly created/initialized, set the 'pruning_step' to 0.
     # If the model is saved and then restored, do nothing.
-    if self.prunable_layers[0].pruning_step == -1:
+    if step_layers[0].pruning_step == -1:
       tuples = []
-      for layer in self.prunable_layers:
+      for layer in step_layers:
         tuples.append((layer.pruning_step, 0))
       K.batch_set_value(tuples)
 
+  def _build_model_pruning_update(self):
+    """Creates the fused mask update of the layers not updating their own."""
+    pruning_obj = model_pruning.ModelPruning(self._model_pruning_layers)
+    if tf.executing_eagerly():
+
+      @tf.function
+      def update_fn():
+        pruning_obj.conditional_mask_update()
+
+      return update_fn
+    update_op = pruning_obj.conditional_mask_update()
+    return lambda: K.batch_get_value([update_op])
+
+  def on_train_batch_begin(self, batch, logs=None):
+    if not self._model_pruning_layers:
+      return
+    if self._model_pruning_update is None:
+      # The variables of the layers only exist once the model is built.
+      if not all(layer.built for layer in self._model_pruning_layers):
+        return
+      self._model_pruning_update = self._build_model_pruning_update()
+    self._model_pruning_update()
+
   def on_epoch_end(self, batch, logs=None):
     # At the end of every epoch, remask the weights. This ensures that when
     # the model is saved after completion, the weights represent mask*weights.
@@ -83,20 +134,72 @@ class PruningSummaries(callbacks.TensorBoard):
   """A Keras callback for adding pruning summaries to tensorboard.
 
   Logs the sparsity(%) and threshold at a given iteration step.
+
+  The sparsity of every mask is reduced to a scalar in the graph, so that only
+  the scalar summaries are copied to the host. This makes it cheap enough to
+  also log them every few batches with `pruning_update_freq`.
+
+  Arguments:
+      log_dir: The path to the directory where the log files are saved.
+      update_freq: Same as the parameter of the base class.
+      pruning_update_freq: determines the frequency of the pruning summaries,
+        in addition to the ones logged at the beginning of every epoch. Either
+        `'epoch'` (no additional summaries), `'batch'` or an integer number of
+        batches.
+      **kwargs: Additional keyword arguments of the base class.
   """
 
-  def __init__(self, log_dir, update_freq='epoch', **kwargs):
+  def __init__(self,
+               log_dir,
+               update_freq='epoch',
+               pruning_update_freq='epoch',
+               **kwargs):
     if not isinstance(log_dir, six.string_types) or not log_dir:
       raise ValueError(
           '`log_dir` must be a non-empty string. You passed `log_dir`='
           '{input}.'.format(input=log_dir))
 
+    if pruning_update_freq not in ('batch', 'epoch') and (
+        not isinstance(pruning_update_freq, int) or
+        isinstance(pruning_update_freq, bool) or pruning_update_freq < 1):
+      raise ValueError(
+          '`pruning_update_freq` must be `batch`, `epoch` or a positive '
+          'integer. You passed `pruning_update_freq`={input}.'.format(
+              input=pruning_update_freq))
+
     super(PruningSummaries, self).__init__(
         log_dir=log_dir, update_freq=update_freq, **kwargs)
     if not compat.is_v1_apis():  # TF 2.X
       log_dir = self.log_dir + '/metrics'
       self._file_writer = tf.summary.create_file_writer(log_dir)
 
+    self.pruning_update_freq = (1 if pruning_update_freq == 'batch' else
+                                pruning_update_freq)
+    self._pruning_batch = 0
+    self._get_pruning_stats = None
+
+  def set_model(self, model):
+    super(PruningSummaries, self).set_model(model)
+    # The statistics are built for the pruned layers of the model.
+    self._get_pruning_stats = None
+
+  def _compute_pruning_stats(self):
+    """Returns the sparsity and threshold of every mask as scalars."""
+    stats = {}
+    prunable_layers = pruning_wrapper.collect_prunable_layers(self.model)
+    for layer in prunable_layers:
+      for weight, mask, threshold in layer.pruning_vars:
+        stats[mask.name + '/sparsity'] = 1. - tf.math.reduce_mean(
+            pruning_utils.unpack_mask(mask, weight.shape, weight.dtype))
+        stats[threshold.name + '/threshold'] = tf.identity(threshold)
+    return stats
+
+  def _build_pruning_stats(self):
+    if tf.executing_eagerly():
+      return tf.function(self._compute_pruning_stats)
+    stats = self._compute_pruning_stats()
+    return lambda: stats
+
   def _log_pruning_metrics(self, logs, prefix, step):
     if compat.is_v1_apis():
       # Safely depend on TF 1.X private API given
@@ -109,33 +212,29 @@ class PruningSummaries(callbacks.TensorBoard):
 
         self._file_writer.flush()
 
-  def on_epoch_begin(self, epoch, logs=None):
-    if logs is not None:
-      super(PruningSummaries, self).on_epoch_begin(epoch, logs)
+  def _log_pruning_summaries(self):
+    if self._get_pruning_stats is None:
+      self._get_pruning_stats = self._build_pruning_stats()
+    stats = self._get_pruning_stats()
 
-    pruning_logs = {}
-    params = []
-    prunable_layers = pruning_wrapper.collect_prunable_layers(self.model)
-    for layer in prunable_layers:
-      for _, mask, threshold in layer.pruning_vars:
-        params.append(mask)
-        params.append(threshold)
-
-    params.append(self.model.optimizer.iterations)
+    names = list(stats.keys())
+    values = K.batch_get_value(
+        [stats[name] for name in names] + [self.model.optimizer.iterations])
+    iteration = values.pop()
 
-    values = K.batch_get_value(params)
-    iteration = values[-1]
-    del values[-1]
-    del params[-1]
+    self._log_pruning_metrics(dict(zip(names, values)), '', iteration)
 
-    param_value_pairs = list(zip(params, values))
+  def on_epoch_begin(self, epoch, logs=None):
+    if logs is not None:
+      super(PruningSummaries, self).on_epoch_begin(epoch, logs)
 
-    for mask, mask_value in param_value_pairs[::2]:
-      pruning_logs.update({
-          mask.name + '/sparsity': 1 - np.mean(mask_value)
-      })
+    self._log_pruning_summaries()
 
-    for threshold, threshold_value in param_value_pairs[1::2]:
-      pruning_logs.update({threshold.name + '/threshold': threshold_value})
+  def on_train_batch_end(self, batch, logs=None):
+    super(PruningSummaries, self).on_train_batch_end(batch, logs)
 
-    self._log_pruning_metrics(pruning_logs, '', iteration)
+    if self.pruning_update_freq == 'epoch':
+      return
+    self._pruning_batch += 1
+    if self._pruning_batch % self.pruning_update_freq == 0:
+      self._log_pruning_summaries()
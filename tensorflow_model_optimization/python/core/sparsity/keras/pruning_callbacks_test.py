@@ -25,6 +25,7 @@ from tensorflow_model_optimization.python.core.keras import test_utils as keras_
 from tensorflow_model_optimization.python.core.keras.compat import keras
 from tensorflow_model_optimization.python.core.sparsity.keras import prune
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_callbacks
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_schedule
 
 
 errors_impl = tf.errors
@@ -37,9 +38,9 @@ class PruneCallbacksTest(tf.test.TestCase):
   def _assertLogsExist(self, log_dir):
     self.assertNotEmpty(os.listdir(log_dir))
 
-  def _pruned_model_setup(self, custom_training_loop=False):
+  def _pruned_model_setup(self, custom_training_loop=False, **params):
     pruned_model = prune.prune_low_magnitude(
-        keras_test_utils.build_simple_dense_model())
+        keras_test_utils.build_simple_dense_model(), **params)
 
     x_train = np.random.rand(self._BATCH_SIZE, 10)
     y_train = keras.utils.to_categorical(
@@ -149,6 +150,115 @@ class PruneCallbacksTest(tf.test.TestCase):
       with tf.GradientTape():
         pruned_model(inp, training=True)
 
+  def _assertMaskSparsity(self, pruned_model, sparsity):
+    for layer in pruned_model.layers:
+      for _, mask, _ in getattr(layer, 'pruning_vars', []):
+        self.assertAllClose(sparsity,
+                            1. - np.mean(keras.backend.get_value(mask)))
+
+  def testSharedPruningStepFromOptimizer(self):
+    for mask_update_mode in ['LAYER', 'MODEL']:
+      pruned_model, x_train, y_train = self._pruned_model_setup(
+          pruning_schedule=pruning_schedule.ConstantSparsity(
+              0.5, begin_step=0, frequency=1),
+          mask_update_mode=mask_update_mode,
+          step_source='OPTIMIZER')
+      pruned_model.fit(
+          x_train,
+          y_train,
+          batch_size=self._BATCH_SIZE,
+          epochs=3,
+          callbacks=[pruning_callbacks.UpdatePruningStep()])
+
+      # The layers don't count their own steps
+      self.assertFalse(hasattr(pruned_model.layers[0], 'pruning_step'))
+      self.assertEqual(
+          4, keras.backend.get_value(
+              pruned_model.layers[0].get_shared_pruning_step()))
+      self._assertMaskSparsity(pruned_model, 0.5)
+
+  def testSharedPruningStepRaisesError_PruningStepCallbackMissing(self):
+    pruned_model, x_train, y_train = self._pruned_model_setup(
+        step_source='OPTIMIZER')
+
+    # Throws an error since UpdatePruningStep is missing.
+    with self.assertRaises(ValueError):
+      pruned_model.fit(x_train, y_train)
+
+  def testForwardMaskingTrainsLikeWeightMasking(self):
+    initial_weights = keras_test_utils.build_simple_dense_model().get_weights()
+    x_train = np.random.rand(self._BATCH_SIZE, 10)
+    y_train = keras.utils.to_categorical(
+        np.random.randint(5, size=(self._BATCH_SIZE, 1)), 5)
+
+    stripped_models = []
+    for mask_update_mode in ['LAYER', 'MODEL']:
+      for masking_mode in ['WEIGHT', 'FORWARD']:
+        # The pruned models wrap the layers of the model, so every model is
+        # built anew, from the same weights.
+        model = keras_test_utils.build_simple_dense_model()
+        model.set_weights(initial_weights)
+        pruned_model = prune.prune_low_magnitude(
+            model,
+            pruning_schedule=pruning_schedule.ConstantSparsity(
+                0.5, begin_step=1, end_step=1, frequency=1),
+            mask_update_mode=mask_update_mode,
+            masking_mode=masking_mode)
+        pruned_model.compile(
+            loss=keras.losses.categorical_crossentropy,
+            optimizer=keras.optimizers.SGD())
+        pruned_model.fit(
+            x_train,
+            y_train,
+            batch_size=self._BATCH_SIZE // 2,
+            epochs=2,
+            shuffle=False,
+            callbacks=[pruning_callbacks.UpdatePruningStep()])
+        self._assertMaskSparsity(pruned_model, 0.5)
+        stripped_models.append(prune.strip_pruning(pruned_model))
+
+    for stripped_model in stripped_models[1:]:
+      for weight, expected_weight in zip(stripped_model.get_weights(),
+                                         stripped_models[0].get_weights()):
+        self.assertAllClose(expected_weight, weight)
+      self.assertAllClose(stripped_models[0].predict(x_train),
+                          stripped_model.predict(x_train))
+
+  def testPruningSummariesComputesSparsityInGraph(self):
+    pruned_model, _, _ = self._pruned_model_setup()
+    pruned_model.build((None, 10))
+    _, mask, threshold = pruned_model.layers[0].pruning_vars[0]
+    mask_value = np.ones(mask.shape, dtype=np.float32)
+    mask_value[:, :3] = 0.
+    keras.backend.batch_set_value([(mask, mask_value), (threshold, 0.25)])
+
+    log_callback = pruning_callbacks.PruningSummaries(
+        log_dir=tempfile.mkdtemp())
+    log_callback.set_model(pruned_model)
+    stats = log_callback._build_pruning_stats()()
+    stats = dict(zip(stats, keras.backend.batch_get_value(list(
+        stats.values()))))
+
+    self.assertAllClose(1. - np.mean(mask_value),
+                        stats[mask.name + '/sparsity'])
+    self.assertAllClose(0.25, stats[threshold.name + '/threshold'])
+
+  def testPruningSummariesLogsEveryNBatches(self):
+    log_dir = tempfile.mkdtemp()
+    pruned_model, x_train, y_train = self._pruned_model_setup()
+    pruned_model.fit(
+        x_train,
+        y_train,
+        batch_size=self._BATCH_SIZE // 4,
+        epochs=1,
+        callbacks=[
+            pruning_callbacks.UpdatePruningStep(),
+            pruning_callbacks.PruningSummaries(
+                log_dir=log_dir, pruning_update_freq=2)
+        ])
+
+    self._assertLogsExist(log_dir)
+
   def testPruningSummariesRaisesError_LogDirNotNonEmptyString(self):
     with self.assertRaises(ValueError):
       pruning_callbacks.PruningSummaries(log_dir='')
@@ -159,6 +269,13 @@ class PruneCallbacksTest(tf.test.TestCase):
     with self.assertRaises(ValueError):
       pruning_callbacks.PruningSummaries(log_dir=object())
 
+  def testPruningSummariesRaisesError_InvalidPruningUpdateFreq(self):
+    for pruning_update_freq in ['step', 0, -2, 1.5, True]:
+      with self.assertRaises(ValueError):
+        pruning_callbacks.PruningSummaries(
+            log_dir=tempfile.mkdtemp(),
+            pruning_update_freq=pruning_update_freq)
+
 
 if __name__ == '__main__':
   tf.test.main()
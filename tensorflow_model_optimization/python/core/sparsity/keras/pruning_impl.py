@@ -21,8 +21,15 @@ from __future__ import print_function
 import tensorflow as tf
 
 from tensorflow_model_optimization.python.core.keras import compat as tf_compat
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_threshold
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_utils
 
+# Strategies whose variables are mirrored: every replica holds an identical
+# copy of the weights and masks.
+_MIRRORED_STRATEGIES = (tf.distribute.MirroredStrategy,
+                        tf.distribute.MultiWorkerMirroredStrategy,
+                        tf.distribute.OneDeviceStrategy)
+
 
 class Pruning(object):
   """Implementation of magnitude-based weight pruning."""
@@ -33,27 +40,40 @@ class Pruning(object):
                pruning_schedule,
                block_size,
                block_pooling_type,
-               sparsity_m_by_n=None):
+               sparsity_m_by_n=None,
+               threshold_engine=None,
+               masked_forward=False):
     """The logic for magnitude-based pruning weight tensors.
 
     Args:
       training_step_fn: A callable that returns the training step.
-      pruning_vars: A list of (weight, mask, threshold) tuples
+      pruning_vars: A list of (weight, mask, threshold) tuples. The masks are
+        stored as returned by `pruning_utils.get_mask_storage`.
       pruning_schedule: A `PruningSchedule` object that controls pruning rate
         throughout training.
-      block_size: The dimensions (height, weight) for the block sparse pattern
-        in rank-2 weight tensors.
+      block_size: The dimensions for the block sparse pattern, applied to the
+        last dimensions of the weight tensors, e.g. (height, width) of rank-2
+        weight tensors or (input channels, output channels) of Conv2D kernels.
       block_pooling_type: (optional) The function to use to pool weights in the
         block. Must be 'AVG' or 'MAX'.
       sparsity_m_by_n: default None, otherwise a tuple of 2 integers, indicates
         pruning with m_by_n sparsity, e.g., (2, 4): 2 zeros out of 4 consecutive
         elements. It check whether we can do pruning with m_by_n sparsity.
+      threshold_engine: (optional) A `PruningThreshold` object used to compute
+        the magnitude threshold of each weight. Defaults to `TopKThreshold`.
+      masked_forward: (optional) Whether the weights are only masked in the
+        forward pass, rather than multiplied by their masks at every step. The
+        masks are then computed from the masked weights, and the weights are
+        multiplied by their new masks at every mask update.
     """
     self._pruning_vars = pruning_vars
     self._pruning_schedule = pruning_schedule
     self._block_size = list(block_size)
     self._block_pooling_type = block_pooling_type
     self._sparsity_m_by_n = sparsity_m_by_n
+    self._masked_forward = masked_forward
+    self._threshold_engine = (
+        threshold_engine or pruning_threshold.TopKThreshold())
     self._validate_block()
 
     # Training step
@@ -62,11 +82,21 @@ class Pruning(object):
     self._validate_block()
 
   def _validate_block(self):
-    if self._block_size != [1, 1]:
+    if self._block_size != [1] * len(self._block_size):
       for weight, _, _ in self._pruning_vars:
-        if weight.get_shape().ndims != 2:
-          raise ValueError('Block Sparsity can only be used for layers which '
-                           'have 2-dimensional weights.')
+        if weight.get_shape().ndims < len(self._block_size):
+          raise ValueError(
+              'Block Sparsity can only be used for layers which have weights '
+              'with at least {} dimensions.'.format(len(self._block_size)))
+
+  def _get_block_shape(self, weights):
+    """Returns the block size of every dimension of the weights.
+
+    The block size applies to the last dimensions of the weights, for example
+    to the input and output channels of the HWIO kernels of Conv2D layers.
+    """
+    rank = weights.get_shape().ndims
+    return [1] * (rank - len(self._block_size)) + self._block_size
 
   def _update_mask(self, weights):
     """Updates the mask for a given weight tensor.
@@ -98,25 +128,12 @@ class Pruning(object):
                   (1 - sparsity)),
               1),
           tf.int32)
-      values, indices = tf.math.top_k(
-          tf.reshape(abs_weights, [-1]), k=tf.size(abs_weights))
-
-      # Grab the (k-1)th value as a threshold to build pruning mask.
-      threshold_value = tf.gather(values, k - 1)
-      threshold_pos = tf.gather(indices, k - 1)
+      threshold_value = self._threshold_engine(abs_weights, k)
 
       # Build mask for the weight element higher magnitude than threshold value.
-      # A mask is added to make sure the threshold element be incorporated.
-      # TODO(b/208967539): Update the logic to index oriented logic.
-      new_mask = tf.math.logical_or(
-          tf.math.greater_equal(abs_weights, threshold_value),
-          tf.reshape(
-              tf.one_hot(
-                  threshold_pos,
-                  depth=tf.size(abs_weights),
-                  on_value=True,
-                  off_value=False,
-                  dtype=tf.bool), abs_weights.shape))
+      # The threshold is the magnitude of an element of the tensor (or a lower
+      # bound of it), so the mask always keeps at least k elements.
+      new_mask = tf.math.greater_equal(abs_weights, threshold_value)
 
     # Updated mask is casted back to weight's data type in case of the type
     # mismatching due to keras mixed precision policy.
@@ -152,9 +169,10 @@ class Pruning(object):
     If sparsity_m_by_n is selected, then we return the relevant pruning mask,
     that nullify two out of four elements in the block.
 
-    Block pruning occurs only if the block_height or block_width is > 1 and
-    if the weight tensor, when squeezed, has ndims = 2. Otherwise, elementwise
-    pruning occurs.
+    Block pruning occurs only if one of the block dimensions is > 1. The
+    blocks span the last dimensions of the weights, and the magnitudes of the
+    weights of every block are pooled. Otherwise, elementwise pruning occurs.
+
     Args:
       weights: The weight tensor that needs to be masked.
 
@@ -174,32 +192,21 @@ class Pruning(object):
       # We need to return some numbers for threshold.
       return 999.0, mask
 
-    if self._block_size == [1, 1]:
+    if self._block_size == [1] * len(self._block_size):
       return self._update_mask(weights)
 
-    # TODO(pulkitb): Check if squeeze operations should now be removed since
-    # we are only accepting 2-D weights.
-
-    squeezed_weights = tf.squeeze(weights)
-    abs_weights = tf.math.abs(squeezed_weights)
-    pooled_weights = pruning_utils.factorized_pool(
-        abs_weights,
-        window_shape=self._block_size,
-        pooling_type=self._block_pooling_type,
-        strides=self._block_size,
-        padding='SAME')
-
-    if pooled_weights.get_shape().ndims != 2:
-      pooled_weights = tf.squeeze(pooled_weights)
+    block_shape = self._get_block_shape(weights)
+    pooled_weights = pruning_utils.block_pool(
+        tf.math.abs(weights),
+        block_size=block_shape,
+        pooling_type=self._block_pooling_type)
 
     new_threshold, new_mask = self._update_mask(pooled_weights)
 
-    updated_mask = pruning_utils.expand_tensor(new_mask, self._block_size)
-    sliced_mask = tf.slice(
-        updated_mask, [0, 0],
-        [squeezed_weights.get_shape()[0],
-         squeezed_weights.get_shape()[1]])
-    return new_threshold, tf.reshape(sliced_mask, tf.shape(weights))
+    updated_mask = pruning_utils.expand_tensor(new_mask, block_shape)
+    sliced_mask = tf.slice(updated_mask, [0] * len(block_shape),
+                           weights.get_shape().as_list())
+    return new_threshold, sliced_mask
 
   def _weight_assign_objs(self):
     """Gather the assign objs for assigning weights<=weights*mask.
@@ -212,14 +219,18 @@ class Pruning(object):
     """
 
     def update_fn(distribution, values_and_vars):
-      # TODO(yunluli): Need this ReduceOp because the weight is created by the
-      # layer wrapped, so we don't have control of its aggregation policy. May
-      # be able to optimize this when distribution strategy supports easier
-      # update to mirrored variables in replica context.
-      reduced_values = distribution.extended.batch_reduce_to(
-          tf.distribute.ReduceOp.MEAN, values_and_vars)
-      var_list = [v for _, v in values_and_vars]
-      values_and_vars = zip(reduced_values, var_list)
+      if not isinstance(distribution, _MIRRORED_STRATEGIES):
+        # TODO(yunluli): Need this ReduceOp because the weight is created by
+        # the layer wrapped, so we don't have control of its aggregation
+        # policy. May be able to optimize this when distribution strategy
+        # supports easier update to mirrored variables in replica context.
+        reduced_values = distribution.extended.batch_reduce_to(
+            tf.distribute.ReduceOp.MEAN, values_and_vars)
+        var_list = [v for _, v in values_and_vars]
+        values_and_vars = zip(reduced_values, var_list)
+      # Otherwise the masked weights are identical on all the replicas. Each
+      # copy of a weight is assigned the masked weight of its own replica,
+      # without any communication between the replicas.
 
       def update_var(variable, reduced_value):
         return tf_compat.assign(variable, reduced_value)
@@ -237,7 +248,8 @@ class Pruning(object):
       values_and_vars = []
       for weight, mask, _ in self._pruning_vars:
         masked_weight = tf.dtypes.cast(
-            tf.math.multiply(weight, mask), dtype=weight.dtype)
+            tf.math.multiply(weight, self._unpack_mask(weight, mask)),
+            dtype=weight.dtype)
         values_and_vars.append((masked_weight, weight))
       if values_and_vars:
         assign_objs.append(tf.distribute.get_replica_context().merge_call(
@@ -245,11 +257,23 @@ class Pruning(object):
     else:
       for weight, mask, _ in self._pruning_vars:
         masked_weight = tf.dtypes.cast(
-            tf.math.multiply(weight, mask), dtype=weight.dtype)
+            tf.math.multiply(weight, self._unpack_mask(weight, mask)),
+            dtype=weight.dtype)
         assign_objs.append(tf_compat.assign(weight, masked_weight))
 
     return assign_objs
 
+  def _unpack_mask(self, weight, mask):
+    """Returns the mask of a weight, with the shape of the weight."""
+    return pruning_utils.unpack_mask(mask, weight.shape, weight.dtype)
+
+  def _get_ranked_weight(self, weight, mask):
+    """Returns the weight whose magnitudes are ranked to update its mask."""
+    if self._masked_forward:
+      # The pruned weights keep their values between the mask updates.
+      return weight * self._unpack_mask(weight, mask)
+    return weight
+
   def weight_mask_op(self):
     return tf.group(self._weight_assign_objs())
 
@@ -273,9 +297,15 @@ class Pruning(object):
         assign_objs = []
 
         for weight, mask, threshold in self._pruning_vars:
-          new_threshold, new_mask = self._maybe_update_block_mask(weight)
+          masked_weight = self._get_ranked_weight(weight, mask)
+          new_threshold, new_mask = self._maybe_update_block_mask(masked_weight)
           assign_objs.append(tf_compat.assign(threshold, new_threshold))
-          assign_objs.append(tf_compat.assign(mask, new_mask))
+          assign_objs.append(
+              tf_compat.assign(mask, pruning_utils.pack_mask(
+                  new_mask, mask.dtype)))
+          if self._masked_forward:
+            assign_objs.append(
+                tf_compat.assign(weight, masked_weight * new_mask))
 
         return tf.group(assign_objs)
 
@@ -296,11 +326,18 @@ class Pruning(object):
         assign_objs = []
 
         for weight, mask, threshold in self._pruning_vars:
-          new_threshold, new_mask = self._maybe_update_block_mask(weight)
+          masked_weight = self._get_ranked_weight(weight, mask)
+          new_threshold, new_mask = self._maybe_update_block_mask(masked_weight)
           assign_objs.append(
-              distribution.extended.update(mask, update, (new_mask,)))
+              distribution.extended.update(
+                  mask, update,
+                  (pruning_utils.pack_mask(new_mask, mask.dtype),)))
           assign_objs.append(
               distribution.extended.update(threshold, update, (new_threshold,)))
+          if self._masked_forward:
+            assign_objs.append(
+                distribution.extended.update(weight, update,
+                                             (masked_weight * new_mask,)))
 
         return tf.group(assign_objs)
 
@@ -319,6 +356,8 @@ class Pruning(object):
     if not tf.executing_eagerly():
       summary = tf.compat.v1.summary
     summary.scalar('sparsity', self._pruning_schedule(self._step_fn())[1])
-    for _, mask, threshold in self._pruning_vars:
-      summary.scalar(mask.name + '/sparsity', 1.0 - tf.math.reduce_mean(mask))
+    for weight, mask, threshold in self._pruning_vars:
+      summary.scalar(
+          mask.name + '/sparsity',
+          1.0 - tf.math.reduce_mean(self._unpack_mask(weight, mask)))
       summary.scalar(threshold.name + '/threshold', threshold)
@@ -29,6 +29,7 @@ from tensorflow_model_optimization.python.core.keras import compat
 from tensorflow_model_optimization.python.core.keras.compat import keras
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_impl
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_schedule
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_threshold
 
 
 K = keras.backend
@@ -130,6 +131,39 @@ class PruningTest(test.TestCase, parameterized.TestCase):
     mask_after_pruning = K.get_value(mask)
     self.assertAllEqual(np.count_nonzero(mask_after_pruning), 50)
 
+  @parameterized.named_parameters(
+      ("top_k", pruning_threshold.TopKThreshold()),
+      ("radix_select", pruning_threshold.RadixSelectThreshold()),
+      ("histogram", pruning_threshold.HistogramThreshold(num_bins=1000)),
+      ("sampled", pruning_threshold.SampledThreshold(num_samples=1000)),
+  )
+  def testUpdateSingleMaskWithThresholdEngine(self, threshold_engine):
+    weight = tf.Variable(np.linspace(1.0, 100.0, 100), name="weights")
+    weight_dtype = weight.dtype.base_dtype
+    mask = tf.Variable(
+        tf.ones(weight.get_shape(), dtype=weight_dtype),
+        name="mask",
+        dtype=weight_dtype)
+    threshold = tf.Variable(
+        tf.zeros([], dtype=weight_dtype), name="threshold", dtype=weight_dtype)
+    self.initialize()
+
+    p = pruning_impl.Pruning(
+        pruning_vars=[(weight, mask, threshold)],
+        training_step_fn=self.training_step_fn,
+        pruning_schedule=self.constant_sparsity,
+        block_size=self.block_size,
+        block_pooling_type=self.block_pooling_type,
+        threshold_engine=threshold_engine)
+
+    if tf.executing_eagerly():
+      p.conditional_mask_update()
+    else:
+      K.get_session().run(p.conditional_mask_update())
+
+    self.assertAllEqual(np.count_nonzero(K.get_value(mask)), 50)
+    self.assertAllEqual(K.get_value(threshold), 51.0)
+
   def testConstructsMaskAndThresholdCorrectly(self):
     self.initialize()
     p = pruning_impl.Pruning(
@@ -193,8 +227,7 @@ class PruningTest(test.TestCase, parameterized.TestCase):
 
     self._blockMasking(block_size, block_pooling_type, weight, expected_mask)
 
-  def testBlockMaskingWithHigherDimensionsRaisesError(self):
-    self.initialize()
+  def testBlockMaskingWithHigherDimensions(self):
     block_size = (2, 2)
     block_pooling_type = "AVG"
     # Weights as in testBlockMasking, but with one extra dimension.
@@ -203,7 +236,42 @@ class PruningTest(test.TestCase, parameterized.TestCase):
     expected_mask = [[[0.0, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 0.0],
                       [1., 1., 1., 1.], [1., 1., 1., 1.]]]
 
-    # Block masking should only be used with 2 Dimensional weights.
+    self._blockMasking(block_size, block_pooling_type, weight, expected_mask)
+
+  def testBlockMaskingConv2DChannels(self):
+    # Blocks along the input and output channels of a 2x1x4x4 HWIO kernel.
+    block_size = (1, 1, 2, 2)
+    block_pooling_type = "MAX"
+    channels = np.array([[0.1, 0.0, 0.2, 0.0], [0.0, -0.1, 0.0, -0.2],
+                         [0.3, 0.0, 0.4, 0.0], [0.0, -0.3, 0.0, -0.4]])
+    weight = tf.constant(
+        np.stack([channels, channels[::-1]])[:, np.newaxis], dtype=tf.float32)
+    channels_mask = np.array([[0.0, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 0.0],
+                              [1., 1., 1., 1.], [1., 1., 1., 1.]])
+    expected_mask = np.stack([channels_mask,
+                              channels_mask[::-1]])[:, np.newaxis]
+
+    self._blockMasking(block_size, block_pooling_type, weight, expected_mask)
+
+  def testBlockMaskingWithPartialBlocks(self):
+    block_size = (2, 2)
+    block_pooling_type = "AVG"
+    # The partial blocks are averaged over their weights only.
+    weight = tf.constant([[0.1, 0.1, 0.4], [0.1, 0.1, 0.4], [0.3, 0.3, 0.5]])
+    expected_mask = [[0.0, 0.0, 1.], [0.0, 0.0, 1.], [0.0, 0.0, 1.]]
+
+    self._blockMasking(block_size, block_pooling_type, weight, expected_mask)
+
+  def testBlockMaskingWithLowerDimensionsRaisesError(self):
+    self.initialize()
+    block_size = (2, 2, 2)
+    block_pooling_type = "AVG"
+    weight = tf.constant([[0.1, 0.1, 0.2, 0.2], [0.1, 0.1, 0.2, 0.2],
+                          [0.3, 0.3, 0.4, 0.4], [0.3, 0.3, 0.4, 0.4]])
+    expected_mask = [[0.0, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 0.0],
+                     [1., 1., 1., 1.], [1., 1., 1., 1.]]
+
+    # The weights must have a dimension for every block dimension.
     with self.assertRaises(ValueError):
       self._blockMasking(block_size, block_pooling_type, weight, expected_mask)
 
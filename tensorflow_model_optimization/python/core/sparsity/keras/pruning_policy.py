@@ -21,6 +21,8 @@ import tensorflow as tf
 
 from tensorflow_model_optimization.python.core.keras.compat import keras
 from tensorflow_model_optimization.python.core.quantization.keras import utils as quantize_utils
+from tensorflow_model_optimization.python.core.sparsity.keras import layer_latency
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_schedule as pruning_sched
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_wrapper
 
 
@@ -69,6 +71,19 @@ class PruningPolicy(abc.ABC):
     """
     raise NotImplementedError
 
+  def get_pruning_params(self, layer):
+    """Returns the pruning parameters specific to the current layer.
+
+    Args:
+      layer: Current layer in the model, allowed to be pruned.
+
+    Returns:
+      A dict of `prune_low_magnitude` parameters, like `pruning_schedule` or
+      `block_size`, overriding the ones given for the whole model.
+    """
+    del layer  # Unused.
+    return {}
+
   @abc.abstractmethod
   def ensure_model_supports_pruning(self, model):
     """Checks that the model contains only supported layers.
@@ -300,3 +315,146 @@ class PruneForLatencyOnXNNPack(PruningPolicy):
         visit_fn,
         self._get_consumers,
     )
+
+
+class PruneForTargetLatency(PruningPolicy):
+  """Specifies to prune the layers which make the model meet a target latency.
+
+  PruneForTargetLatency measures the TFLite latency of every Dense and Conv2D
+  layer of the model on the local CPU, dense and pruned with every candidate
+  sparsity and block size. It then selects the layers to prune, and their
+  sparsity and block size, so that the estimated latency of the model meets
+  the target latency while pruning as few weights as possible.
+
+  The measurements are cached on disk by the `LayerLatencyProfiler`, so that
+  the same layers are only measured once.
+
+  ```python
+  model = prune_low_magnitude(
+      model,
+      pruning_policy=PruneForTargetLatency(target_latency=2.5))
+  ```
+
+  The API is experimental and is subject to change.
+  """
+
+  def __init__(self,
+               target_latency,
+               sparsities=(0.5, 0.75, 0.9),
+               block_sizes=((1, 1),),
+               pruning_schedule_fn=None,
+               profiler=None):
+    """Creates a PruneForTargetLatency policy.
+
+    Args:
+      target_latency: The target TFLite latency of the model in milliseconds,
+        for a batch of size 1.
+      sparsities: The candidate sparsities of the layers.
+      block_sizes: The candidate block sizes of the layers.
+      pruning_schedule_fn: A function from the sparsity selected for a layer
+        to the `PruningSchedule` of the layer. By default, the layer is pruned
+        with `ConstantSparsity(sparsity, begin_step=0)`.
+      profiler: The `LayerLatencyProfiler` measuring the latencies. By
+        default, the latencies are cached in the home directory.
+    """
+    self._target_latency = target_latency
+    self._sparsities = sparsities
+    self._block_sizes = [tuple(block_size) for block_size in block_sizes]
+    self._pruning_schedule_fn = pruning_schedule_fn or (
+        lambda sparsity: pruning_sched.ConstantSparsity(sparsity, 0))
+    self._profiler = profiler or layer_latency.LayerLatencyProfiler()
+    self._layer_settings = {}
+
+  def _get_candidate_layers(self, model):
+    candidate_layers = []
+    for layer in model.layers:
+      if isinstance(layer, keras.Model):
+        candidate_layers.extend(self._get_candidate_layers(layer))
+      elif (isinstance(layer, (layers.Dense, layers.Conv2D)) and
+            len(layer._inbound_nodes) == 1):
+        candidate_layers.append(layer)
+    return candidate_layers
+
+  def _get_layer_options(self, layer):
+    """Returns the (pruned weights, latency saving, settings) of the layer.
+
+    The options are sorted by number of pruned weights, starting with the
+    dense layer, and only the options saving latency are returned.
+    """
+    dense_latency = self._profiler.measure_layer(layer)
+    options = [(0., 0., None)]
+    for block_size in self._block_sizes:
+      for sparsity in self._sparsities:
+        latency = self._profiler.measure_layer(layer, sparsity, block_size)
+        if latency < dense_latency:
+          options.append((sparsity * layer.kernel.shape.num_elements(),
+                          dense_latency - latency, (sparsity, block_size)))
+    return sorted(options, key=lambda option: option[:2])
+
+  def _select_layer_settings(self, model):
+    """Greedily selects the layer options saving the most latency per weight.
+
+    Args:
+      model: A `keras.Model` instance which is going to be pruned.
+
+    Returns:
+      A dict from the layers to prune to their (sparsity, block size).
+
+    Raises:
+      ValueError: if the target latency cannot be met.
+    """
+    candidate_layers = self._get_candidate_layers(model)
+    layer_options = [
+        self._get_layer_options(layer) for layer in candidate_layers
+    ]
+    selected_options = [options[0] for options in layer_options]
+    latency = self._profiler.measure_model(model)
+
+    while latency > self._target_latency:
+      best_ratio, best_choice = None, None
+      for index, options in enumerate(layer_options):
+        pruned_weights, saving, _ = selected_options[index]
+        for option in options:
+          if option[1] <= saving:
+            continue
+          ratio = (option[1] - saving) / max(option[0] - pruned_weights, 1.)
+          if best_ratio is None or ratio > best_ratio:
+            best_ratio, best_choice = ratio, (index, option)
+      if best_choice is None:
+        raise ValueError(
+            'The target latency of {:.3f}ms cannot be met: the estimated '
+            'latency of the pruned model is {:.3f}ms.'.format(
+                self._target_latency, latency))
+      index, option = best_choice
+      latency -= option[1] - selected_options[index][1]
+      selected_options[index] = option
+
+    return {
+        layer: option[2]
+        for layer, option in zip(candidate_layers, selected_options)
+        if option[2] is not None
+    }
+
+  def allow_pruning(self, layer):
+    """Allows to prune the layers selected to meet the target latency."""
+    return layer in self._layer_settings
+
+  def get_pruning_params(self, layer):
+    """Returns the schedule and block size selected for the layer."""
+    sparsity, block_size = self._layer_settings[layer]
+    return {
+        'pruning_schedule': self._pruning_schedule_fn(sparsity),
+        'block_size': block_size,
+    }
+
+  def ensure_model_supports_pruning(self, model):
+    """Measures the layers of the model and selects the layers to prune."""
+    if not model._is_graph_network and not isinstance(
+        model, keras.models.Sequential
+    ):
+      raise ValueError('Subclassed models are not supported currently.')
+
+    if not model.built:
+      raise ValueError('Unbuilt models are not supported currently.')
+
+    self._layer_settings = self._select_layer_settings(model)
@@ -19,6 +19,7 @@ import distutils.version as version
 import tensorflow as tf
 
 from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.sparsity.keras import layer_latency
 from tensorflow_model_optimization.python.core.sparsity.keras import prune
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_policy
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_schedule
@@ -51,6 +52,21 @@ class CompatGlobalAveragePooling2D(layers.GlobalAveragePooling2D):
       return keras.backend.mean(inputs, axis=[2, 3], keepdims=self.keepdims)
 
 
+class FakeLayerLatencyProfiler(layer_latency.LayerLatencyProfiler):
+  """Returns the latencies of a table instead of measuring them."""
+
+  def __init__(self, model_latency, layer_latencies):
+    super(FakeLayerLatencyProfiler, self).__init__(cache_path=None)
+    self._model_latency = model_latency
+    self._layer_latencies = layer_latencies
+
+  def measure_layer(self, layer, sparsity=0., block_size=(1, 1)):
+    return self._layer_latencies[layer.name][sparsity]
+
+  def measure_model(self, model):
+    return self._model_latency
+
+
 class PruningPolicyTest(tf.test.TestCase):
   INVALID_TO_PRUNE_START_LAYER_ERROR = (
       'Could not find `Conv2D 3x3` layer with stride 2x2, `input filters == 3`'
@@ -378,6 +394,52 @@ class PruningPolicyTest(tf.test.TestCase):
     )
     self.assertEqual(self._count_pruned_layers(double_pruned_model), 1)
 
+  def _get_target_latency_policy(self, target_latency):
+    profiler = FakeLayerLatencyProfiler(
+        model_latency=10.,
+        layer_latencies={
+            'dense_a': {0.: 2., 0.5: 1.5, 0.9: 1.},
+            'dense_b': {0.: 4., 0.5: 2., 0.9: 1.},
+            # Pruning this layer never pays off
+            'dense_c': {0.: 1., 0.5: 1.2, 0.9: 1.1},
+        })
+    return pruning_policy.PruneForTargetLatency(
+        target_latency, sparsities=(0.5, 0.9), profiler=profiler)
+
+  def _get_dense_model(self):
+    return keras.Sequential([
+        layers.Dense(64, input_shape=(16,), name='dense_a'),
+        layers.Dense(64, name='dense_b'),
+        layers.Dense(4, name='dense_c'),
+    ])
+
+  def testPruneForTargetLatencySelectsLayersAndSparsities(self):
+    pruned_model = prune.prune_low_magnitude(
+        self._get_dense_model(),
+        pruning_policy=self._get_target_latency_policy(target_latency=8.))
+
+    # Pruning dense_a to 90% saves the most latency per pruned weight, then
+    # pruning dense_b to 50% meets the target latency.
+    sparsities = {
+        layer.layer.name: layer.pruning_schedule.target_sparsity
+        for layer in pruned_model.layers
+        if isinstance(layer, pruning_wrapper.PruneLowMagnitude)
+    }
+    self.assertEqual({'dense_a': 0.9, 'dense_b': 0.5}, sparsities)
+
+  def testPruneForTargetLatencyDoesNotPruneFastEnoughModel(self):
+    pruned_model = prune.prune_low_magnitude(
+        self._get_dense_model(),
+        pruning_policy=self._get_target_latency_policy(target_latency=10.))
+
+    self.assertEqual(self._count_pruned_layers(pruned_model), 0)
+
+  def testPruneForTargetLatencyUnreachableTargetRaisesError(self):
+    with self.assertRaises(ValueError):
+      prune.prune_low_magnitude(
+          self._get_dense_model(),
+          pruning_policy=self._get_target_latency_policy(target_latency=5.))
+
 
 if __name__ == '__main__':
   tf.test.main()
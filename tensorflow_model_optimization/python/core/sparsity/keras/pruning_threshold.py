@@ -0,0 +1,388 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Threshold engines used to find the magnitude cut-off for pruning masks."""
+
+import abc
+import six
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+
+
+# Signed integer types with the same width as the supported float types. Since
+# the magnitudes are non-negative, the sign bit is always zero and the integer
+# view of a magnitude is monotonic in its float value.
+_BITCAST_DTYPES = {
+    tf.float16: tf.int16,
+    tf.bfloat16: tf.int16,
+    tf.float32: tf.int32,
+    tf.float64: tf.int64,
+}
+
+# Number of bits resolved by every pass of the radix select.
+_RADIX_BITS = 8
+_RADIX = 1 << _RADIX_BITS
+
+
+def _count_at_or_above(counts):
+  """Returns `result[..., i] = sum(counts[..., i:])` along the last axis."""
+  return tf.math.cumsum(counts, axis=-1, reverse=True)
+
+
+def _last_index_at_least(values, target):
+  """Index of the last element of non-increasing `values` that is >= target.
+
+  Args:
+    values: A tensor, non-increasing along its last axis.
+    target: A tensor broadcastable to `values` without its last axis.
+
+  Returns:
+    An int32 tensor with the shape of `values` without its last axis.
+  """
+  target = tf.expand_dims(target, -1)
+  return tf.math.reduce_sum(
+      tf.dtypes.cast(tf.math.greater_equal(values, target), tf.int32),
+      axis=-1) - 1
+
+
+def radix_select(abs_values, ks, segment_ids=None, num_segments=1):
+  """Finds the k-th largest value of every segment of rank-1 tensors.
+
+  The magnitudes are reinterpreted as integers and the bits of the k-th largest
+  value of each segment are resolved 8 at a time, from the most significant
+  byte down, using a 256-bucket histogram per segment. Each pass keeps only the
+  candidates that share the selected byte, so the cost is a single full pass
+  over `abs_values` followed by passes over small subsets.
+
+  `abs_values` can also be a list of tensors, for instance the weights of
+  several layers. Their histograms are merged at every pass, so the k-th
+  largest value over all of them is found without concatenating the tensors.
+  The list can also hold functions returning the tensors. They are called in
+  the first pass, once for the histogram and once to keep the candidates, one
+  after the other, so that only one of their results is alive at a time.
+
+  Args:
+    abs_values: A rank-1 tensor of non-negative floats, or a list of them with
+      the same dtype, or of functions returning them.
+    ks: A rank-1 int32 tensor with `num_segments` elements. `ks[i]` is in range
+      [1, number of elements of segment i].
+    segment_ids: (optional) A rank-1 int32 tensor with the segment of every
+      element of `abs_values`, or a list of them if `abs_values` is a list. All
+      elements belong to segment 0 by default.
+    num_segments: Number of segments.
+
+  Returns:
+    A rank-1 tensor with `num_segments` elements of the dtype of `abs_values`.
+
+  Raises:
+    ValueError: if `abs_values` is not of a supported float type.
+  """
+  if not isinstance(abs_values, (list, tuple)):
+    abs_values = [abs_values]
+    segment_ids = [segment_ids]
+  elif segment_ids is None:
+    segment_ids = [None] * len(abs_values)
+  segment_ids = list(segment_ids)
+  abs_values = list(abs_values)
+
+  with tf.name_scope('radix_select'):
+    if callable(abs_values[0]):
+      first_values = abs_values[0]()
+    else:
+      first_values = abs_values[0]
+    dtype = first_values.dtype.base_dtype
+    if dtype not in _BITCAST_DTYPES:
+      raise ValueError(
+          'Radix select does not support values of type {}.'.format(dtype))
+    int_dtype = _BITCAST_DTYPES[dtype]
+    num_bits = int_dtype.size * 8
+
+    def get_bits(i):
+      """Returns the bits of the values i, calling their function if any."""
+      if i == 0 and first_values is not None:
+        return tf.bitcast(first_values, int_dtype)
+      return tf.bitcast(abs_values[i](), int_dtype)
+
+    # The bits of the values given by functions are only computed when needed.
+    bits = [
+        None if callable(values) else tf.bitcast(values, int_dtype)
+        for values in abs_values
+    ]
+    digit_mask = tf.constant(_RADIX - 1, dtype=int_dtype)
+    prefix = tf.zeros([num_segments], dtype=int_dtype)
+    remaining = ks
+
+    def get_digits(candidates, shift):
+      candidate_digits = tf.bitwise.right_shift(candidates,
+                                                tf.constant(shift, int_dtype))
+      # The sign bit is zero, so the most significant digit needs no masking.
+      if shift != num_bits - _RADIX_BITS:
+        candidate_digits = tf.bitwise.bitwise_and(candidate_digits, digit_mask)
+      return tf.dtypes.cast(candidate_digits, tf.int32)
+
+    for shift in range(num_bits - _RADIX_BITS, -1, -_RADIX_BITS):
+      digits = []
+      counts = 0
+      dependencies = []
+      for i, candidates in enumerate(bits):
+        with tf.control_dependencies(dependencies):
+          if candidates is None:
+            candidate_digits = get_digits(get_bits(i), shift)
+          else:
+            candidate_digits = get_digits(candidates, shift)
+
+          buckets = candidate_digits
+          if segment_ids[i] is not None:
+            buckets += segment_ids[i] * _RADIX
+          counts += tf.math.bincount(
+              buckets,
+              minlength=num_segments * _RADIX,
+              maxlength=num_segments * _RADIX,
+              dtype=tf.int32)
+        if candidates is None:
+          # The next values are computed once these are counted, and their
+          # digits are computed again to keep the candidates.
+          dependencies = [counts]
+          candidate_digits = None
+        digits.append(candidate_digits)
+      first_values = None
+      counts = tf.reshape(counts, [num_segments, _RADIX])
+      at_or_above = _count_at_or_above(counts)
+
+      # The k-th largest value has the largest digit which still leaves at
+      # least `remaining` candidates at or above it.
+      digit = _last_index_at_least(at_or_above, remaining)
+      remaining -= (
+          tf.gather(at_or_above, digit, batch_dims=1) -
+          tf.gather(counts, digit, batch_dims=1))
+      prefix = tf.bitwise.bitwise_or(
+          prefix,
+          tf.bitwise.left_shift(
+              tf.dtypes.cast(digit, int_dtype), tf.constant(shift, int_dtype)))
+      if not shift:
+        break
+
+      dependencies = []
+      for i, candidate_digits in enumerate(digits):
+        is_lazy = bits[i] is None
+        with tf.control_dependencies(dependencies):
+          if is_lazy:
+            candidates = get_bits(i)
+            candidate_digits = get_digits(candidates, shift)
+          else:
+            candidates = bits[i]
+          if segment_ids[i] is None:
+            keep = tf.math.equal(candidate_digits, digit)
+          else:
+            keep = tf.math.equal(candidate_digits,
+                                 tf.gather(digit, segment_ids[i]))
+            segment_ids[i] = tf.boolean_mask(segment_ids[i], keep)
+          bits[i] = tf.boolean_mask(candidates, keep)
+        if is_lazy:
+          # The next values are computed once these are filtered.
+          dependencies = [bits[i]]
+
+    return tf.bitcast(prefix, dtype)
+
+
+@six.add_metaclass(abc.ABCMeta)
+class PruningThreshold(object):
+  """Computes the pruning threshold of a weight tensor.
+
+  Given the absolute values of a weight tensor and the number `k` of elements
+  to keep, a `PruningThreshold` returns the magnitude of the k-th largest
+  element (or an estimate of it). Every element whose magnitude is greater
+  than or equal to the threshold is kept by the pruning mask.
+
+  ```python
+    threshold = pruning_threshold(abs_weights, k)
+  ```
+
+  You can inherit this class to write your own threshold engine.
+  """
+
+  @abc.abstractmethod
+  def __call__(self, abs_weights, k):
+    """Returns the magnitude threshold for `abs_weights`.
+
+    Args:
+      abs_weights: A float tensor holding the absolute values of the weights.
+      k: A scalar int32 tensor, the number of elements to keep. `k` is in
+        range [1, size(abs_weights)].
+
+    Returns:
+      A scalar tensor with the same dtype as `abs_weights`.
+    """
+    raise NotImplementedError(
+        'PruningThreshold implementation must override __call__')
+
+  def get_config(self):
+    return {
+        'class_name': keras.utils.get_registered_name(self.__class__),
+        'config': {}
+    }
+
+  @classmethod
+  def from_config(cls, config):
+    """Instantiates a `PruningThreshold` from its config.
+
+    Args:
+        config: Output of `get_config()`.
+
+    Returns:
+        A `PruningThreshold` instance.
+    """
+    return cls(**config)
+
+
+class TopKThreshold(PruningThreshold):
+  """Exact threshold computed by fully sorting the weight magnitudes.
+
+  This is the original implementation. It runs `tf.math.top_k` over every
+  element of the tensor, which is O(n log n) time and allocates the sorted
+  values and indices.
+  """
+
+  def __call__(self, abs_weights, k):
+    values, _ = tf.math.top_k(
+        tf.reshape(abs_weights, [-1]), k=tf.size(abs_weights))
+    return tf.gather(values, k - 1)
+
+
+class RadixSelectThreshold(PruningThreshold):
+  """Exact threshold computed with a radix select, without sorting.
+
+  The magnitudes are reinterpreted as integers and the bits of the k-th
+  largest value are resolved 8 at a time, from the most significant byte down,
+  using a 256-bucket histogram of the remaining candidates. Each pass keeps only
+  the candidates that share the selected byte, so the cost is a single full
+  pass over the tensor followed by passes over small subsets. This gives the
+  same threshold as `TopKThreshold`.
+  """
+
+  def __call__(self, abs_weights, k):
+    return radix_select(
+        tf.reshape(abs_weights, [-1]), tf.reshape(k, [1]))[0]
+
+
+class HistogramThreshold(PruningThreshold):
+  """Approximate threshold computed from a fixed-width histogram.
+
+  The magnitudes are bucketed into `num_bins` equal-width bins over
+  [0, max(abs_weights)] in a single pass, and the threshold is the lower edge of
+  the bin holding the k-th largest value. The returned threshold is never
+  larger than the exact one and differs from it by less than
+  `max(abs_weights) / num_bins`, so at least `k` elements are kept.
+  """
+
+  def __init__(self, num_bins=4096):
+    """Initializes a histogram based threshold engine.
+
+    Args:
+      num_bins: Number of histogram bins. The error of the threshold is bounded
+        by the largest magnitude divided by `num_bins`.
+    """
+    if num_bins < 1:
+      raise ValueError('num_bins should be >= 1')
+    self.num_bins = num_bins
+
+  def __call__(self, abs_weights, k):
+    with tf.name_scope('histogram_threshold'):
+      values = tf.dtypes.cast(tf.reshape(abs_weights, [-1]), tf.float32)
+      max_value = tf.math.reduce_max(values)
+      # Avoid an empty value range for all-zero weights.
+      upper = tf.where(max_value > 0.0, max_value, tf.ones_like(max_value))
+      counts = tf.histogram_fixed_width(
+          values, tf.stack([0.0, upper]), nbins=self.num_bins)
+      at_or_above = _count_at_or_above(counts)
+
+      bin_index = _last_index_at_least(at_or_above, k)
+      threshold = upper * (
+          tf.dtypes.cast(bin_index, tf.float32) / float(self.num_bins))
+      return tf.dtypes.cast(threshold, abs_weights.dtype)
+
+  def get_config(self):
+    return {
+        'class_name': keras.utils.get_registered_name(self.__class__),
+        'config': {
+            'num_bins': self.num_bins,
+        }
+    }
+
+
+class SampledThreshold(PruningThreshold):
+  """Approximate threshold computed from a uniform sample of the weights.
+
+  `num_samples` magnitudes are drawn uniformly at random (with replacement)
+  and the threshold is the matching quantile of the sample. The relative rank
+  error of the threshold is of the order of `1 / sqrt(num_samples)`.
+  Tensors with at most `num_samples` elements use the exact
+  `RadixSelectThreshold` instead.
+
+  The sample is a deterministic function of the seed and of the magnitudes,
+  so that the replicas and workers of a distributed training, which hold the
+  same weights, compute the same thresholds without communicating.
+  """
+
+  def __init__(self, num_samples=65536, seed=None):
+    """Initializes a sampling based threshold engine.
+
+    Args:
+      num_samples: Number of magnitudes sampled on every mask update.
+      seed: (optional) Integer seed for the sampling op, combined with the
+        magnitudes of the weights.
+    """
+    if num_samples < 1:
+      raise ValueError('num_samples should be >= 1')
+    self.num_samples = num_samples
+    self.seed = seed
+
+  def __call__(self, abs_weights, k):
+    num_elements = abs_weights.shape.num_elements()
+    if num_elements is not None and num_elements <= self.num_samples:
+      return RadixSelectThreshold()(abs_weights, k)
+
+    with tf.name_scope('sampled_threshold'):
+      values = tf.reshape(abs_weights, [-1])
+      size = tf.size(values)
+      # The largest magnitude changes with the weights, but doesn't depend on
+      # the order of the reduction, unlike their sum.
+      weights_seed = tf.bitcast(
+          tf.dtypes.cast(tf.math.reduce_max(values), tf.float32), tf.int32)
+      indices = tf.random.stateless_uniform(
+          [self.num_samples],
+          seed=tf.stack([tf.constant(self.seed or 0, tf.int32), weights_seed]),
+          minval=0,
+          maxval=size,
+          dtype=tf.int32)
+      samples = tf.gather(values, indices)
+
+      # Rank of the k-th largest element, rescaled to the sample.
+      sample_k = tf.dtypes.cast(
+          tf.math.ceil(
+              tf.dtypes.cast(k, tf.float64) * self.num_samples /
+              tf.dtypes.cast(size, tf.float64)), tf.int32)
+      sample_k = tf.clip_by_value(sample_k, 1, self.num_samples)
+      return RadixSelectThreshold()(samples, sample_k)
+
+  def get_config(self):
+    return {
+        'class_name': keras.utils.get_registered_name(self.__class__),
+        'config': {
+            'num_samples': self.num_samples,
+            'seed': self.seed,
+        }
+    }
+
@@ -0,0 +1,161 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the pruning threshold engines."""
+
+from absl.testing import parameterized
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_threshold
+
+
+def _kth_largest(values, k):
+  return np.sort(np.abs(values).ravel())[::-1][k - 1]
+
+
+class PruningThresholdTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.named_parameters(
+      ('float16', np.float16),
+      ('float32', np.float32),
+      ('float64', np.float64),
+  )
+  def testRadixSelectMatchesSort(self, dtype):
+    np.random.seed(0)
+    weights = np.random.standard_normal([37, 29]).astype(dtype)
+    engine = pruning_threshold.RadixSelectThreshold()
+
+    for k in [1, 2, 100, 537, weights.size - 1, weights.size]:
+      threshold = engine(tf.abs(tf.constant(weights)), tf.constant(k))
+      self.assertEqual(_kth_largest(weights, k), self.evaluate(threshold))
+
+  def testRadixSelectWithTies(self):
+    weights = np.array([0.0, 0.5, 0.5, 0.5, 1.0, 0.0, -2.0, 0.5],
+                       dtype=np.float32)
+    engine = pruning_threshold.RadixSelectThreshold()
+
+    for k in range(1, weights.size + 1):
+      threshold = engine(tf.abs(tf.constant(weights)), tf.constant(k))
+      self.assertEqual(_kth_largest(weights, k), self.evaluate(threshold))
+
+  def testRadixSelectMatchesTopK(self):
+    np.random.seed(1)
+    weights = tf.abs(tf.constant(np.random.standard_normal([1000])))
+    k = tf.constant(123)
+
+    self.assertEqual(
+        self.evaluate(pruning_threshold.TopKThreshold()(weights, k)),
+        self.evaluate(pruning_threshold.RadixSelectThreshold()(weights, k)))
+
+  def testRadixSelectOverListOfTensors(self):
+    np.random.seed(2)
+    weights = [
+        np.random.standard_normal([size]).astype(np.float32)
+        for size in [50, 7, 300]
+    ]
+    abs_weights = [tf.abs(tf.constant(weight)) for weight in weights]
+
+    for k in [1, 10, 200, 357]:
+      threshold = pruning_threshold.radix_select(abs_weights,
+                                                 tf.constant([k]))[0]
+      self.assertEqual(
+          _kth_largest(np.concatenate(weights), k), self.evaluate(threshold))
+
+  def testRadixSelectOverListOfFunctions(self):
+    np.random.seed(2)
+    weights = [
+        np.random.standard_normal([size]).astype(np.float32)
+        for size in [50, 7, 300]
+    ]
+    # A tensor and functions computing the magnitudes when they are needed.
+    abs_values = [
+        lambda weight=weight: tf.abs(tf.constant(weight))
+        for weight in weights[:2]
+    ] + [tf.abs(tf.constant(weights[2]))]
+
+    for k in [1, 10, 200, 357]:
+      threshold = pruning_threshold.radix_select(abs_values,
+                                                 tf.constant([k]))[0]
+      self.assertEqual(
+          _kth_largest(np.concatenate(weights), k), self.evaluate(threshold))
+
+  def testHistogramThresholdIsWithinOneBin(self):
+    np.random.seed(2)
+    weights = np.random.standard_normal([5000]).astype(np.float32)
+    num_bins = 128
+    engine = pruning_threshold.HistogramThreshold(num_bins=num_bins)
+    bin_width = np.max(np.abs(weights)) / num_bins
+
+    for k in [1, 10, 2500, 4999, 5000]:
+      threshold = self.evaluate(engine(tf.abs(tf.constant(weights)), k))
+      exact = _kth_largest(weights, k)
+      self.assertLessEqual(threshold, exact)
+      self.assertLess(exact - threshold, bin_width * (1 + 1e-5))
+      self.assertGreaterEqual(np.count_nonzero(np.abs(weights) >= threshold), k)
+
+  def testHistogramThresholdAllZeros(self):
+    engine = pruning_threshold.HistogramThreshold(num_bins=16)
+    threshold = engine(tf.zeros([10]), tf.constant(5))
+    self.assertEqual(0.0, self.evaluate(threshold))
+
+  def testSampledThresholdIsClose(self):
+    np.random.seed(3)
+    weights = np.random.uniform(size=[200000]).astype(np.float32)
+    engine = pruning_threshold.SampledThreshold(num_samples=20000, seed=1)
+
+    threshold = self.evaluate(engine(tf.constant(weights), tf.constant(50000)))
+    # For uniform weights the exact threshold is close to 0.75.
+    self.assertNear(_kth_largest(weights, 50000), threshold, 0.02)
+
+  def testSampledThresholdIsDeterministic(self):
+    np.random.seed(5)
+    weights = tf.constant(np.random.uniform(size=[10000]).astype(np.float32))
+    engine = pruning_threshold.SampledThreshold(num_samples=100)
+
+    # Distributed replicas holding the same weights agree on the threshold.
+    self.assertEqual(
+        self.evaluate(engine(weights, tf.constant(5000))),
+        self.evaluate(engine(weights, tf.constant(5000))))
+
+  def testSampledThresholdIsExactForSmallTensors(self):
+    np.random.seed(4)
+    weights = np.random.standard_normal([100]).astype(np.float32)
+    engine = pruning_threshold.SampledThreshold(num_samples=1000)
+
+    threshold = engine(tf.abs(tf.constant(weights)), tf.constant(30))
+    self.assertEqual(_kth_largest(weights, 30), self.evaluate(threshold))
+
+  @parameterized.named_parameters(
+      ('top_k', pruning_threshold.TopKThreshold()),
+      ('radix_select', pruning_threshold.RadixSelectThreshold()),
+      ('histogram', pruning_threshold.HistogramThreshold(num_bins=10)),
+      ('sampled', pruning_threshold.SampledThreshold(num_samples=10, seed=3)),
+  )
+  def testSerializeDeserialize(self, engine):
+    config = engine.get_config()
+    self.assertEqual(engine.__class__.__name__, config['class_name'])
+
+    engine_deserialized = engine.__class__.from_config(config['config'])
+    self.assertEqual(engine.__dict__, engine_deserialized.__dict__)
+
+  def testInvalidParameters(self):
+    with self.assertRaises(ValueError):
+      pruning_threshold.HistogramThreshold(num_bins=0)
+    with self.assertRaises(ValueError):
+      pruning_threshold.SampledThreshold(num_samples=0)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -44,10 +44,11 @@ def kronecker_product(mat1, mat2):
 
 
 def expand_tensor(tensor, block_size):
-  """Expands a 2D tensor by replicating the tensor values.
+  """Expands a tensor by replicating the tensor values.
 
-  This is equivalent to the kronecker product of the tensor and a matrix of
-  ones of size block_size.
+  This is equivalent to the kronecker product of the tensor and a tensor of
+  ones of size block_size. Every value is broadcast to its block, so that no
+  product or gather is computed.
 
   Example:
 
@@ -61,53 +62,88 @@ def expand_tensor(tensor, block_size):
             [3 3 4 4]]
 
   Args:
-    tensor: A 2D tensor that needs to be expanded.
-    block_size: List of integers specifying the expansion factor.
+    tensor: A tensor that needs to be expanded.
+    block_size: List of integers specifying the expansion factor of every
+      dimension of the tensor.
 
   Returns:
     The expanded tensor
 
   Raises:
-    ValueError: if tensor is not rank-2 or block_size is does not have 2
-    elements.
+    ValueError: if block_size does not have one element per dimension of the
+    tensor.
   """
-  if tensor.get_shape().ndims != 2:
-    raise ValueError("Input tensor must be rank 2")
+  tensor_shape = tensor.get_shape().as_list()
+  if len(block_size) != len(tensor_shape):
+    raise ValueError("block_size must have one element per dimension of the "
+                     "input tensor")
 
-  if len(block_size) != 2:
-    raise ValueError("block_size must have 2 elements")
+  # Interleaves the dimensions of the tensor with the dimensions of the blocks
+  blocks_shape = []
+  expanded_blocks_shape = []
+  for dim, block_dim in zip(tensor_shape, block_size):
+    blocks_shape.extend([dim, 1])
+    expanded_blocks_shape.extend([dim, block_dim])
 
-  block_height, block_width = block_size
+  expanded_tensor = tf.broadcast_to(
+      tf.reshape(tensor, blocks_shape), expanded_blocks_shape)
+  return tf.reshape(
+      expanded_tensor,
+      [dim * block_dim for dim, block_dim in zip(tensor_shape, block_size)])
 
-  def _tile_rows(tensor, multiple):
-    """Create a new tensor by tiling the tensor along rows."""
-    return tf.tile(tensor, [multiple, 1])
 
-  def _generate_indices(num_rows, block_dim):
-    indices = np.zeros(shape=[num_rows * block_dim, 1], dtype=np.int32)
-    for k in range(block_dim):
-      for r in range(num_rows):
-        indices[k * num_rows + r] = r * block_dim + k
-    return indices
+def block_pool(input_tensor, block_size, pooling_type, name=None):
+  """Pools every non-overlapping block of a tensor of any rank.
 
-  def _replicate_rows(tensor, multiple):
-    tensor_shape = tensor.shape.as_list()
-    expanded_shape = [tensor_shape[0] * multiple, tensor_shape[1]]
-    indices = tf.constant(_generate_indices(tensor_shape[0], multiple))
-    return tf.scatter_nd(indices, _tile_rows(tensor, multiple), expanded_shape)
+  This is equivalent to pooling with window_shape and strides block_size and
+  'SAME' padding: the blocks at the end of a dimension hold the remaining
+  values, and average pooling only averages these values.
 
-  expanded_tensor = tensor
+  Args:
+    input_tensor: Input tensor.
+    block_size: List of integers specifying the block size of every dimension
+      of the tensor.
+    pooling_type: Either 'MAX' or 'AVG'
+    name: Name of the op
 
-  # Expand rows by factor block_height.
-  if block_height > 1:
-    expanded_tensor = _replicate_rows(tensor, block_height)
+  Returns:
+    A tensor of the same rank containing the pooled output
 
-  # Transpose and expand by factor block_width. Transpose the result.
-  if block_width > 1:
-    expanded_tensor = tf.transpose(
-        _replicate_rows(tf.transpose(expanded_tensor), block_width))
+  Raises:
+    ValueError: if block_size does not have one element per dimension of the
+    tensor, or if the pooling type is not 'MAX' or 'AVG'.
+  """
+  tensor_shape = input_tensor.get_shape().as_list()
+  if len(block_size) != len(tensor_shape):
+    raise ValueError("block_size must have one element per dimension of the "
+                     "input tensor")
+  if pooling_type not in ["MAX", "AVG"]:
+    raise ValueError("Unsupported pooling type: {}".format(pooling_type))
+
+  paddings = []
+  blocks_shape = []
+  for dim, block_dim in zip(tensor_shape, block_size):
+    num_blocks = -(-dim // block_dim)
+    paddings.append([0, num_blocks * block_dim - dim])
+    blocks_shape.extend([num_blocks, block_dim])
+  block_axes = list(range(1, len(blocks_shape), 2))
+
+  if name is None:
+    name = "block_pool"
+  with tf.name_scope(name):
+    if pooling_type == "MAX":
+      padded_tensor = tf.pad(
+          input_tensor, paddings, constant_values=input_tensor.dtype.min)
+      return tf.math.reduce_max(
+          tf.reshape(padded_tensor, blocks_shape), axis=block_axes)
 
-  return expanded_tensor
+    block_sums = tf.math.reduce_sum(
+        tf.reshape(tf.pad(input_tensor, paddings), blocks_shape),
+        axis=block_axes)
+    block_counts = tf.math.reduce_sum(
+        tf.reshape(tf.pad(tf.ones_like(input_tensor), paddings), blocks_shape),
+        axis=block_axes)
+    return block_sums / block_counts
 
 
 def factorized_pool(input_tensor,
@@ -190,6 +226,81 @@ def convert_to_tuple_of_two_int(value, name):
   return value_tuple
 
 
+# Number of mask elements stored in every word of a packed mask.
+_MASK_BITS_PER_WORD = 32
+
+
+def get_mask_storage(shape, dtype, mask_storage):
+  """Returns the shape and dtype of the variable storing a mask.
+
+  Args:
+    shape: The shape of the weight tensor.
+    dtype: The dtype of the weight tensor.
+    mask_storage: 'FLOAT' to store the mask with the dtype of the weight,
+      'BOOL' to store it as booleans, or 'PACKED' to store 32 mask elements
+      per int32 word.
+
+  Returns:
+    A (shape, dtype) tuple.
+  """
+  if mask_storage == "BOOL":
+    return shape, tf.bool
+  if mask_storage == "PACKED":
+    num_elements = tf.TensorShape(shape).num_elements()
+    return [-(-num_elements // _MASK_BITS_PER_WORD)], tf.int32
+  return shape, dtype
+
+
+def pack_mask(mask, storage_dtype):
+  """Converts a mask of zeros and ones to its storage dtype.
+
+  Args:
+    mask: A tensor of zeros and ones, of any shape.
+    storage_dtype: The dtype of the variable storing the mask. An int32 dtype
+      packs the mask, flattened, into 32 bits per word.
+
+  Returns:
+    A tensor to assign to the variable storing the mask.
+  """
+  storage_dtype = tf.dtypes.as_dtype(storage_dtype)
+  if storage_dtype != tf.int32:
+    return tf.dtypes.cast(mask, storage_dtype)
+
+  bits = tf.reshape(
+      tf.dtypes.cast(tf.dtypes.cast(mask, tf.bool), tf.int32), [-1])
+  num_padding = -bits.shape.num_elements() % _MASK_BITS_PER_WORD
+  bits = tf.reshape(
+      tf.pad(bits, [[0, num_padding]]), [-1, _MASK_BITS_PER_WORD])
+  # The bits of a word are disjoint, so their sum is their bitwise or.
+  return tf.math.reduce_sum(
+      tf.bitwise.left_shift(bits, tf.range(_MASK_BITS_PER_WORD)), axis=1)
+
+
+def unpack_mask(stored_mask, shape, dtype):
+  """Converts a stored mask to a mask of zeros and ones.
+
+  Args:
+    stored_mask: The variable storing the mask.
+    shape: The shape of the weight tensor.
+    dtype: The dtype of the weight tensor.
+
+  Returns:
+    The mask, with the shape of the weight. Masks stored with a floating
+    dtype are returned as they are.
+  """
+  if stored_mask.dtype.is_floating:
+    return stored_mask
+  if stored_mask.dtype == tf.bool:
+    return tf.dtypes.cast(stored_mask, dtype)
+
+  bits = tf.bitwise.bitwise_and(
+      tf.bitwise.right_shift(
+          tf.expand_dims(stored_mask, 1), tf.range(_MASK_BITS_PER_WORD)), 1)
+  num_elements = tf.TensorShape(shape).num_elements()
+  return tf.reshape(
+      tf.dtypes.cast(tf.reshape(bits, [-1])[:num_elements], dtype), shape)
+
+
 def weights_rearrange(weights):
   """Rearrange weights tensor so that m by n sparsity structure applied in last channel.
 
@@ -354,24 +465,76 @@ def is_pruned_m_by_n(weights, m_by_n=(2, 4), last_channel: str = "C_OUT"):
       if m is larger than n.
 
   """
-  num_zeros, num_elem = m_by_n
-  if num_zeros > num_elem:
-    raise ValueError(f"number of zeros can't be more than number elements. "
-                     f"received: {num_zeros} zeros in {num_elem} elements.")
-  num_non_zeros = num_elem - num_zeros
+  return m_by_n_sparsity_stats(weights, m_by_n,
+                               last_channel)["num_violating_blocks"] == 0
 
+
+def _m_by_n_block_nonzeros(weights, num_elem, last_channel):
+  """Returns the number of non-zero values of every block of n values."""
   if last_channel.endswith("C_IN"):
-    prepared_weights = tf.reshape(weights,
-                                  [tf.reduce_prod(weights.shape[:-1]), -1])
+    prepared_weights = np.asarray(weights)
+    prepared_weights = prepared_weights.reshape(
+        [-1, prepared_weights.shape[-1]])
   elif last_channel.endswith("C_OUT"):
-    prepared_weights = weights_rearrange(weights)
+    prepared_weights = np.asarray(
+        weights_rearrange(tf.convert_to_tensor(weights)))
   else:
     raise ValueError("last_channel must be `C_IN` or `C_OUT`")
 
-  prepared_weights_np = prepared_weights.numpy()
-  for row in range(0, prepared_weights_np.shape[0]):
-    for col in range(0, prepared_weights_np.shape[1], num_elem):
-      if (np.count_nonzero(prepared_weights_np[row, col:col + num_elem]) >
-          num_non_zeros):
-        return False
-  return True
+  # The last block of a row is padded with zeros when the row length isn't a
+  # multiple of n, it is then checked on its actual values only.
+  num_rows, num_cols = prepared_weights.shape
+  num_blocks = -(-num_cols // num_elem)
+  non_zeros = np.zeros([num_rows, num_blocks * num_elem], dtype=bool)
+  non_zeros[:, :num_cols] = prepared_weights != 0
+  return np.count_nonzero(
+      non_zeros.reshape([num_rows, num_blocks, num_elem]), axis=-1)
+
+
+def m_by_n_sparsity_stats(weights, m_by_n=(2, 4), last_channel="C_OUT"):
+  """Returns statistics of the m by n sparsity pattern of a weight tensor.
+
+  This is a m_by_n sparsity helper function. The check is vectorized over all
+  the blocks of n consecutive values of the last channel, so that it scales to
+  the weights of large models.
+
+  Args:
+    weights: A tensor or NumPy array of layer weights.
+    m_by_n: a tuple of 2 integers (m, n), indicates m zeros in every n
+      consecutive values, m must be smaller than n. Default to (2, 4).
+    last_channel: A string, 'C_OUT'(default) and 'C_IN' are supported.  Last
+      channel of weights tensor.
+        Conv2D weights in TF: [H, W, C_IN, C_OUT], TFLite: [C_OUT, H, W, C_IN]
+        DENSE weights in TF: [C_IN, C_OUT], TFLite: [C_OUT, C_IN]
+
+  Returns:
+    A dictionary with:
+      "num_blocks": the number of blocks of n consecutive values.
+      "num_violating_blocks": the number of blocks with more than n - m
+        non-zero values.
+      "non_zeros_histogram": a list of n + 1 integers, the number of blocks
+        with 0, 1, ..., n non-zero values.
+      "sparsity": the fraction of zeros of the weights.
+
+  Raises:
+    ValueError:
+      if unsupported last_channel.
+      if m is larger than n.
+  """
+  num_zeros, num_elem = m_by_n
+  if num_zeros > num_elem:
+    raise ValueError(f"number of zeros can't be more than number elements. "
+                     f"received: {num_zeros} zeros in {num_elem} elements.")
+  num_non_zeros = num_elem - num_zeros
+
+  block_non_zeros = _m_by_n_block_nonzeros(weights, num_elem, last_channel)
+  histogram = np.bincount(block_non_zeros.ravel(), minlength=num_elem + 1)
+
+  num_weights = int(np.prod(tuple(weights.shape)))
+  return {
+      "num_blocks": int(block_non_zeros.size),
+      "num_violating_blocks": int(np.sum(histogram[num_non_zeros + 1:])),
+      "non_zeros_histogram": histogram.tolist(),
+      "sparsity": (1.0 - float(np.sum(block_non_zeros)) / num_weights
+                   if num_weights else 1.0),
+  }
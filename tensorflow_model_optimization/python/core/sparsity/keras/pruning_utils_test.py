@@ -21,6 +21,7 @@ from __future__ import print_function
 # import g3
 
 from absl.testing import parameterized
+import numpy as np
 import tensorflow as tf
 
 from tensorflow_model_optimization.python.core.keras import compat
@@ -89,6 +90,69 @@ class PruningUtilsParameterizedTest(tf.test.TestCase, parameterized.TestCase):
     self._compare_expand_tensor_with_kronecker_product(weights, block_dim)
 
 
+class BlockPoolTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters(("AVG", np.mean), ("MAX", np.max))
+  def testBlockPoolPoolsBlocksFromTheStart(self, pooling_type, pool_fn):
+    weights = np.random.standard_normal([5, 3, 7, 9]).astype(np.float32)
+    # The blocks at the end of a dimension hold the remaining values.
+    expected_pooled_weights = np.zeros([5, 2, 3, 3], dtype=np.float32)
+    for index in np.ndindex(*expected_pooled_weights.shape):
+      block = weights[tuple(
+          slice(i * size, (i + 1) * size)
+          for i, size in zip(index, [1, 2, 3, 4]))]
+      expected_pooled_weights[index] = pool_fn(block)
+
+    pooled_weights = pruning_utils.block_pool(
+        tf.constant(weights), [1, 2, 3, 4], pooling_type)
+    self.assertEqual([5, 2, 3, 3], pooled_weights.get_shape().as_list())
+    self.assertAllClose(expected_pooled_weights, self.evaluate(pooled_weights))
+
+  def testExpandTensorOfHigherRank(self):
+    tensor = tf.reshape(tf.range(6), [1, 2, 3])
+    expanded_tensor = pruning_utils.expand_tensor(tensor, [2, 1, 2])
+    self.assertAllEqual(
+        np.repeat(np.repeat(np.arange(6).reshape([1, 2, 3]), 2, axis=0), 2,
+                  axis=2), self.evaluate(expanded_tensor))
+
+
+class MaskStorageTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters(
+      ("FLOAT", [5, 7], tf.float32),
+      ("BOOL", [5, 7], tf.bool),
+      ("PACKED", [2], tf.int32))
+  def testMaskStorageRoundTrip(self, mask_storage, expected_shape,
+                               expected_dtype):
+    mask = (np.random.rand(5, 7) > 0.5).astype(np.float32)
+
+    shape, dtype = pruning_utils.get_mask_storage([5, 7], tf.float32,
+                                                  mask_storage)
+    stored_mask = pruning_utils.pack_mask(mask, dtype)
+
+    self.assertEqual(expected_shape, list(shape))
+    self.assertEqual(expected_dtype, dtype)
+    self.assertEqual(expected_shape, stored_mask.shape.as_list())
+    self.assertAllEqual(
+        mask,
+        self.evaluate(
+            pruning_utils.unpack_mask(stored_mask, [5, 7], tf.float32)))
+
+  def testPackedMaskUsesAllBitsOfWords(self):
+    mask = np.zeros([64], dtype=np.float32)
+    mask[31] = 1.
+    mask[32:] = 1.
+
+    stored_mask = self.evaluate(pruning_utils.pack_mask(mask, tf.int32))
+
+    self.assertAllEqual([np.iinfo(np.int32).min, -1], stored_mask)
+    self.assertAllEqual(
+        mask,
+        self.evaluate(
+            pruning_utils.unpack_mask(
+                tf.constant(stored_mask), [64], tf.float32)))
+
+
 class GenerateMbyNMaskTest(tf.test.TestCase, parameterized.TestCase):
 
   @parameterized.named_parameters(
@@ -164,6 +228,28 @@ class IsPrunedMbyNTest(tf.test.TestCase, parameterized.TestCase):
     answer = pruning_utils.is_pruned_m_by_n(weight, m_by_n, last_channel)
     self.assertEqual(answer, expected)
 
+  def testMbyNSparsityStats(self):
+    weight = np.array([[1, 2, 0, 0, 5, 6, 7],
+                       [0, 0, 0, 1, 0, 0, 0],
+                       [1, 2, 3, 0, 1, 0, 0]], dtype=np.float32)
+    stats = pruning_utils.m_by_n_sparsity_stats(weight, (2, 4), "C_IN")
+
+    self.assertEqual(6, stats["num_blocks"])
+    self.assertEqual(2, stats["num_violating_blocks"])
+    self.assertEqual([1, 2, 1, 2, 0], stats["non_zeros_histogram"])
+    self.assertAllClose(11 / 21, stats["sparsity"])
+
+  def testMbyNSparsityStatsMatchesTensorInput(self):
+    np.random.seed(0)
+    weight = np.random.standard_normal([3, 3, 8, 16]).astype(np.float32)
+    weight[np.random.rand(*weight.shape) < 0.5] = 0.0
+
+    self.assertEqual(
+        pruning_utils.m_by_n_sparsity_stats(
+            np.transpose(weight, [3, 0, 1, 2]), (2, 4), "C_IN"),
+        pruning_utils.m_by_n_sparsity_stats(
+            tf.constant(weight), (2, 4), "C_OUT"))
+
 
 class WeightsRearrangeTest(tf.test.TestCase, parameterized.TestCase):
 
@@ -19,6 +19,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import contextlib
 import inspect
 import re
 
@@ -35,6 +36,8 @@ from tensorflow_model_optimization.python.core.sparsity.keras import prunable_la
 from tensorflow_model_optimization.python.core.sparsity.keras import prune_registry
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_impl
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_schedule as pruning_sched
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_threshold
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_utils
 from tensorflow_model_optimization.python.core.sparsity.keras.pruning_utils import convert_to_tuple_of_two_int
 from tensorflow_model_optimization.python.core.keras.compat import keras
 
@@ -89,6 +92,42 @@ class PruneLowMagnitude(Wrapper):
   while computing the distribution of the weight values and
   the threshold for pruning.
 
+  Threshold engines:
+  By default the threshold is found by sorting all the weight magnitudes
+  (`TopKThreshold`). For very large weight tensors, the threshold_engine
+  parameter selects a cheaper engine: `RadixSelectThreshold` finds the exact
+  threshold without sorting, while `HistogramThreshold` and `SampledThreshold`
+  estimate it within a bounded error.
+
+  Model-level mask updates:
+  By default every wrapper updates its own masks (mask_update_mode='LAYER').
+  With mask_update_mode='MODEL', the masks are instead updated by the
+  `UpdatePruningStep` callback, which updates the masks of all the layers
+  sharing a pruning schedule together, under a single condition and with a
+  single threshold computation. The masks and thresholds are still written
+  one by one, in a function run before every training batch. With
+  mask_update_mode='GLOBAL', those layers are additionally ranked together:
+  a single threshold is used across all of them so that the target sparsity is
+  reached over the layers as a whole. The global_normalization parameter
+  optionally divides the magnitudes of each layer by their L2 norm ('L2') or
+  their maximum ('MAX') before they are ranked.
+
+  Masking modes:
+  By default the weights are multiplied by their masks and written back at
+  every call (masking_mode='WEIGHT'). With masking_mode='FORWARD', the wrapped
+  layer is instead called with the masked weights as temporary tensors, and
+  the weights are only multiplied by their masks when the masks are updated,
+  at the end of every epoch and by `strip_pruning`. This saves a write of all
+  the prunable weights at every step.
+
+  Mask storage:
+  By default every mask is a variable with the shape and dtype of its weight
+  (mask_storage='FLOAT'). With mask_storage='BOOL' or 'PACKED', the masks are
+  stored as booleans or as 32 mask elements per int32 word, which divides
+  their memory and checkpoint size by up to 32, and are unpacked when they are
+  used. `convert_mask_storage` converts a pruned model, and so its
+  checkpoints, from one storage to another.
+
   Custom keras layers:
   The pruning wrapper can also be applied to a user-defined keras layer.
   Such a layer may contain one or more weight tensors that may be pruned.
@@ -127,6 +166,12 @@ class PruneLowMagnitude(Wrapper):
                block_size=(1, 1),
                block_pooling_type='AVG',
                sparsity_m_by_n=None,
+               threshold_engine=None,
+               mask_update_mode='LAYER',
+               global_normalization=None,
+               step_source='LAYER',
+               masking_mode='WEIGHT',
+               mask_storage='FLOAT',
                **kwargs):
     """Create a pruning wrapper for a keras layer.
 
@@ -136,19 +181,62 @@ class PruneLowMagnitude(Wrapper):
       layer: The keras layer to be pruned.
       pruning_schedule: A `PruningSchedule` object that controls pruning rate
         throughout training.
-      block_size: (optional) The dimensions (height, weight) for the block
-        sparse pattern in rank-2 weight tensors.
+      block_size: (optional) The dimensions for the block sparse pattern,
+        applied to the last dimensions of the weight tensors, e.g. (height,
+        width) of rank-2 weight tensors or (input channels, output channels)
+        of Conv2D kernels.
       block_pooling_type: (optional) The function to use to pool weights in the
         block. Must be 'AVG' or 'MAX'.
       sparsity_m_by_n: default None, otherwise a tuple of 2 integers, indicates
         pruning with m_by_n sparsity, e.g., (2, 4): 2 zeros out of 4 consecutive
         elements. It check whether we can do pruning with m_by_n sparsity.
+      threshold_engine: (optional) A `PruningThreshold` object that computes
+        the magnitude threshold of the weights at every mask update. Defaults
+        to a new `TopKThreshold`.
+      mask_update_mode: (optional) Where the masks are updated. Must be
+        'LAYER' (by this wrapper), 'MODEL' (by the `UpdatePruningStep`
+        callback, together with the other layers of the model) or 'GLOBAL'
+        (as 'MODEL', ranking the weights across layers).
+      global_normalization: (optional) None, 'L2' or 'MAX'. How the weight
+        magnitudes of the layer are normalized before they are ranked against
+        the other layers, when mask_update_mode is 'GLOBAL'.
+      step_source: (optional) The step of the pruning schedule. 'LAYER' for a
+        `pruning_step` variable of this wrapper, incremented at every training
+        call, or 'OPTIMIZER' for the iterations of the optimizer, shared by
+        all the wrappers of the model and set by the `UpdatePruningStep`
+        callback. 'OPTIMIZER' saves a variable update and a check per layer
+        at every training step.
+      masking_mode: (optional) How the masks are applied. 'WEIGHT' to multiply
+        the weights by their masks at every call, or 'FORWARD' to only mask
+        the weights in the forward pass. As the gradients of the masked
+        weights are then zero, the weights are only multiplied by their masks
+        at the mask updates. Training with a `ParameterServerStrategy`
+        requires 'FORWARD'. The masked values temporarily replace the
+        attributes of the layer referencing the prunable weights, e.g.
+        `kernel`, during the calls of the wrapper. This supports the built-in
+        layers of `prune_registry` and custom layers whose `call` reads the
+        prunable weights from these attributes only. Weights which aren't
+        such attributes, or are read through properties, are rejected when
+        the wrapper is built; weights read in another way, like from
+        `self.weights` or a cached copy, aren't detected and stay unmasked.
+        The same layer must not be called concurrently from several threads.
+      mask_storage: (optional) How the masks are stored. 'FLOAT' for
+        variables with the dtype of the weights, 'BOOL' for boolean variables
+        or 'PACKED' for int32 variables packing 32 mask elements per word.
 
       **kwargs: Additional keyword arguments to be passed to the keras layer.
     """
     self.pruning_schedule = pruning_schedule
     self.block_size = block_size
     self.block_pooling_type = block_pooling_type
+    if threshold_engine is None:
+      threshold_engine = pruning_threshold.TopKThreshold()
+    self.threshold_engine = threshold_engine
+    self.mask_update_mode = mask_update_mode
+    self.global_normalization = global_normalization
+    self.step_source = step_source
+    self.masking_mode = masking_mode
+    self.mask_storage = mask_storage
     self.sparsity_m_by_n = None
 
     if sparsity_m_by_n:
@@ -162,11 +250,49 @@ class PruneLowMagnitude(Wrapper):
     # A list of all (weight,mask,threshold) tuples for this layer
     self.pruning_vars = []
 
+    # With the 'OPTIMIZER' step source, returns the shared step.
+    self._shared_step_fn = None
+
+    # With the 'FORWARD' masking mode, the (object, attribute name) pairs
+    # referencing the prunable weights in the wrapped layer.
+    self._weight_attributes = []
+
     if block_pooling_type not in ['AVG', 'MAX']:
       raise ValueError(
           'Unsupported pooling type \'{}\'. Should be \'AVG\' or \'MAX\'.'
           .format(block_pooling_type))
 
+    if mask_update_mode not in ['LAYER', 'MODEL', 'GLOBAL']:
+      raise ValueError(
+          'Unsupported mask update mode \'{}\'. Should be \'LAYER\', '
+          '\'MODEL\' or \'GLOBAL\'.'.format(mask_update_mode))
+
+    if step_source not in ['LAYER', 'OPTIMIZER']:
+      raise ValueError(
+          'Unsupported step source \'{}\'. Should be \'LAYER\' or '
+          '\'OPTIMIZER\'.'.format(step_source))
+
+    if masking_mode not in ['WEIGHT', 'FORWARD']:
+      raise ValueError(
+          'Unsupported masking mode \'{}\'. Should be \'WEIGHT\' or '
+          '\'FORWARD\'.'.format(masking_mode))
+
+    if mask_storage not in ['FLOAT', 'BOOL', 'PACKED']:
+      raise ValueError(
+          'Unsupported mask storage \'{}\'. Should be \'FLOAT\', \'BOOL\' '
+          'or \'PACKED\'.'.format(mask_storage))
+
+    if mask_update_mode == 'GLOBAL' and (
+        any(dim != 1 for dim in block_size) or self.sparsity_m_by_n):
+      raise ValueError(
+          'Global pruning cannot be used with block sparsity or m_by_n '
+          'sparsity.')
+
+    if global_normalization not in [None, 'L2', 'MAX']:
+      raise ValueError(
+          'Unsupported global normalization \'{}\'. Should be None, \'L2\' '
+          'or \'MAX\'.'.format(global_normalization))
+
     if not isinstance(layer, keras.layers.Layer):
       raise ValueError(
           'Please initialize `Prune` layer with a '
@@ -225,6 +351,14 @@ class PruneLowMagnitude(Wrapper):
         layer.__class__.__name__)
 
   def build(self, input_shape):
+    if self.masking_mode == 'WEIGHT' and isinstance(
+        tf.distribute.get_strategy(),
+        tf.distribute.experimental.ParameterServerStrategy):
+      # The asynchronous workers would overwrite each other's weight updates
+      # when writing the masked weights back at every step.
+      raise ValueError(
+          'Pruning with a ParameterServerStrategy requires the masking mode '
+          '\'FORWARD\'.')
     super(PruneLowMagnitude, self).build(input_shape)
 
     weight_vars, mask_vars, threshold_vars = [], [], []
@@ -239,13 +373,24 @@ class PruneLowMagnitude(Wrapper):
         dtype = weight.true_dtype
       else:
         dtype = weight.dtype
+      mask_shape, mask_dtype = pruning_utils.get_mask_storage(
+          weight.shape, dtype, self.mask_storage)
+      if self.mask_storage == 'PACKED':
+        # All the bits of the words are set.
+        mask_initializer = keras.initializers.Constant(-1)
+      else:
+        mask_initializer = keras.initializers.get('ones')
       mask = self.add_weight(
           'mask',
-          shape=weight.shape,
-          initializer=keras.initializers.get('ones'),
-          dtype=dtype,
+          shape=mask_shape,
+          initializer=mask_initializer,
+          dtype=mask_dtype,
           trainable=False,
-          aggregation=tf.VariableAggregation.MEAN,
+          # The masks are the same on all the replicas, only the float ones
+          # can be averaged.
+          aggregation=(tf.VariableAggregation.MEAN
+                       if self.mask_storage == 'FLOAT' else
+                       tf.VariableAggregation.ONLY_FIRST_REPLICA),
       )
       threshold = self.add_weight(
           'threshold',
@@ -261,17 +406,25 @@ class PruneLowMagnitude(Wrapper):
       threshold_vars.append(threshold)
     self.pruning_vars = list(zip(weight_vars, mask_vars, threshold_vars))
 
-    # Add a scalar tracking the number of updates to the wrapped layer.
-    self.pruning_step = self.add_weight(
-        'pruning_step',
-        shape=[],
-        initializer=keras.initializers.Constant(-1),
-        dtype=tf.int64,
-        trainable=False,
-    )
+    if self.masking_mode == 'FORWARD':
+      self._weight_attributes = [
+          self._find_weight_attribute(weight) for weight in weight_vars
+      ]
+
+    if self.step_source == 'LAYER':
+      # Add a scalar tracking the number of updates to the wrapped layer.
+      self.pruning_step = self.add_weight(
+          'pruning_step',
+          shape=[],
+          initializer=keras.initializers.Constant(-1),
+          dtype=tf.int64,
+          trainable=False,
+      )
 
     def training_step_fn():
-      return self.pruning_step
+      if self.step_source == 'LAYER':
+        return self.pruning_step
+      return self.get_shared_pruning_step()
 
     # Create a pruning object
     self.pruning_obj = pruning_impl.Pruning(
@@ -280,15 +433,99 @@ class PruneLowMagnitude(Wrapper):
         pruning_schedule=self.pruning_schedule,
         block_size=self.block_size,
         sparsity_m_by_n=self.sparsity_m_by_n,
-        block_pooling_type=self.block_pooling_type)
+        block_pooling_type=self.block_pooling_type,
+        threshold_engine=self.threshold_engine,
+        masked_forward=self.masking_mode == 'FORWARD')
+
+  def _find_weight_attribute(self, weight):
+    """Returns the (object, attribute name) referencing a prunable weight.
+
+    The attribute must be an entry of the instance dictionary of the layer or
+    of one of its sublayers, tracked by that layer as one of its own weights
+    and not shadowed by a property of its class. These are cheap, structural
+    checks: reading the weight in another way in `call`, e.g. from
+    `self.weights`, isn't detected and leaves the weight unmasked.
+
+    Args:
+      weight: A prunable weight of the layer.
+
+    Returns:
+      The (object, attribute name) pair referencing the weight.
+
+    Raises:
+      ValueError: If no such attribute references the weight.
+    """
+    for obj in [self.layer] + list(self.layer._flatten_layers()):
+      own_weights = obj._trainable_weights + obj._non_trainable_weights
+      if not any(own_weight is weight for own_weight in own_weights):
+        continue
+      for name, value in vars(obj).items():
+        if value is weight and not isinstance(
+            inspect.getattr_static(type(obj), name, None), property):
+          return obj, name
+    raise ValueError(
+        'The masking mode \'FORWARD\' requires the prunable weight {} to be '
+        'a tracked attribute of the layer {} or of one of its sublayers, '
+        'which isn\'t a property.'.format(weight.name, self.layer.name))
+
+  @contextlib.contextmanager
+  def _replaced_weights(self, values):
+    """Replaces the prunable weights of the layer by other values."""
+    for (obj, name), value in zip(self._weight_attributes, values):
+      # Only the instance dictionary is written: `Layer.__setattr__` would
+      # untrack the weight and track it again, reordering the weights of the
+      # layer. As the attributes aren't properties, reading them returns
+      # the replaced values.
+      object.__setattr__(obj, name, value)
+    try:
+      yield
+    finally:
+      for (obj, name), (weight, _, _) in zip(self._weight_attributes,
+                                             self.pruning_vars):
+        object.__setattr__(obj, name, weight)
+
+  def _masked_weights(self):
+    """Replaces the prunable weights of the layer by their masked values."""
+    masked_weights = []
+    for weight, mask, _ in self.pruning_vars:
+      mask = pruning_utils.unpack_mask(mask, weight.shape, weight.dtype)
+      masked_weights.append(weight * tf.cast(mask, weight.dtype))
+    return self._replaced_weights(masked_weights)
+
+  def set_shared_pruning_step(self, step):
+    """Sets the step shared by the wrappers with the 'OPTIMIZER' step source.
+
+    Args:
+      step: A scalar integer variable incremented at the end of every
+        training step, like the iterations of the optimizer.
+    """
+    self._shared_step_fn = lambda: step
+
+  def get_shared_pruning_step(self):
+    """Returns the pruning step with the 'OPTIMIZER' step source."""
+    if self._shared_step_fn is None:
+      # Not training yet, the schedules don't prune at negative steps.
+      return tf.constant(-1, dtype=tf.int64)
+    # The shared step is incremented at the end of the training step, while
+    # `pruning_step` is incremented at its beginning.
+    return tf.cast(self._shared_step_fn(), tf.int64) + 1
 
   def call(self, inputs, training=None, **kwargs):
     if training is None:
       training = K.learning_phase()
 
     def increment_step():
+      # An atomic increment, as the workers of a parameter server training
+      # share the step.
+      with tf.control_dependencies([self.pruning_step.assign_add(1)]):
+        return tf.no_op('update')
+
+    def update_mask():
+      if self.mask_update_mode != 'LAYER':
+        # The masks are updated by the UpdatePruningStep callback.
+        return tf.no_op('update')
       with tf.control_dependencies(
-          [tf_compat.assign(self.pruning_step, self.pruning_step + 1)]):
+          [self.pruning_obj.conditional_mask_update()]):
         return tf.no_op('update')
 
     def add_update():
@@ -298,27 +535,40 @@ class PruneLowMagnitude(Wrapper):
               np.int64(1),
               message=self._PRUNE_CALLBACK_ERROR_MSG)
       ]):
-        with tf.control_dependencies(
-            [self.pruning_obj.conditional_mask_update()]):
-          return tf.no_op('update')
+        return update_mask()
 
     def no_op():
       return tf.no_op('no_update')
 
-    # Increment the 'pruning_step' after each step.
-    update_pruning_step = utils.smart_cond(training, increment_step, no_op)
-    self.add_update(update_pruning_step)
-
-    # Update mask tensor after each 'pruning_frequency' steps.
-    update_mask = utils.smart_cond(training, add_update, no_op)
-    self.add_update(update_mask)
-
-    # Always execute the op that performs weights = weights * mask
-    # Relies on UpdatePruningStep callback to ensure the weights
-    # are sparse after the final backpropagation.
-    #
-    # self.add_update does nothing during eager execution.
-    self.add_update(self.pruning_obj.weight_mask_op())
+    if self.step_source == 'LAYER':
+      # Increment the 'pruning_step' after each step.
+      update_pruning_step = utils.smart_cond(training, increment_step, no_op)
+      self.add_update(update_pruning_step)
+
+      # Update mask tensor after each 'pruning_frequency' steps.
+      update_mask_op = utils.smart_cond(training, add_update, no_op)
+      self.add_update(update_mask_op)
+    elif self.mask_update_mode == 'LAYER':
+      # The shared step is set once by the callback, and incremented by the
+      # optimizer.
+      if self._shared_step_fn is None and tf.get_static_value(training):
+        raise ValueError(self._PRUNE_CALLBACK_ERROR_MSG)
+      update_mask_op = utils.smart_cond(training, update_mask, no_op)
+      self.add_update(update_mask_op)
+
+    if self.masking_mode == 'WEIGHT':
+      # Always execute the op that performs weights = weights * mask
+      # Relies on UpdatePruningStep callback to ensure the weights
+      # are sparse after the final backpropagation.
+      #
+      # self.add_update does nothing during eager execution.
+      self.add_update(self.pruning_obj.weight_mask_op())
+      return self._call_layer(inputs, training, **kwargs)
+
+    with self._masked_weights():
+      return self._call_layer(inputs, training, **kwargs)
+
+  def _call_layer(self, inputs, training, **kwargs):
     # TODO(evcu) remove this check after dropping py2 support. In py3 getargspec
     # is deprecated.
     if hasattr(inspect, 'getfullargspec'):
@@ -340,7 +590,13 @@ class PruneLowMagnitude(Wrapper):
     config = {
         'pruning_schedule': self.pruning_schedule.get_config(),
         'block_size': self.block_size,
-        'block_pooling_type': self.block_pooling_type
+        'block_pooling_type': self.block_pooling_type,
+        'threshold_engine': self.threshold_engine.get_config(),
+        'mask_update_mode': self.mask_update_mode,
+        'global_normalization': self.global_normalization,
+        'step_source': self.step_source,
+        'masking_mode': self.masking_mode,
+        'mask_storage': self.mask_storage,
     }
     return dict(list(base_config.items()) + list(config.items()))
 
@@ -361,6 +617,13 @@ class PruneLowMagnitude(Wrapper):
         module_objects=globals(),
         custom_objects=custom_objects)
 
+    if 'threshold_engine' in config:
+      # User-defined engines are found by their registered names, or in the
+      # custom object scope.
+      config['threshold_engine'] = deserialize_keras_object(
+          config['threshold_engine'],
+          module_objects=vars(pruning_threshold))
+
     layer = keras.layers.deserialize(config.pop('layer'))
     config['layer'] = layer
 
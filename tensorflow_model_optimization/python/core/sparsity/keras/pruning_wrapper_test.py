@@ -22,6 +22,7 @@ import tensorflow as tf
 
 from tensorflow_model_optimization.python.core.keras.compat import keras
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_schedule
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_threshold
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_wrapper
 
 
@@ -29,6 +30,15 @@ layers = keras.layers
 Prune = pruning_wrapper.PruneLowMagnitude
 
 
+class CustomThreshold(pruning_threshold.TopKThreshold):
+  """A user-defined threshold engine."""
+
+
+@keras.utils.register_keras_serializable(package='PruningWrapperTest')
+class RegisteredThreshold(pruning_threshold.TopKThreshold):
+  """A user-defined threshold engine registered with Keras."""
+
+
 class CustomLayer(keras.layers.Layer):
   """A custom layer which is not prunable."""
 
@@ -58,6 +68,25 @@ class CustomLayerPrunable(CustomLayer):
     return [self.weight, self.bias]
 
 
+class CustomLayerWeightsInList(keras.layers.Layer):
+  """A prunable custom layer keeping its weights in a list."""
+
+  def __init__(self, input_dim=16, output_dim=32):
+    super(CustomLayerWeightsInList, self).__init__()
+    self.weight_list = [
+        self.add_weight(
+            shape=(input_dim, output_dim),
+            initializer='random_normal',
+            trainable=True)
+    ]
+
+  def call(self, inputs):
+    return tf.matmul(inputs, self.weight_list[0])
+
+  def get_prunable_weights(self):
+    return self.weight_list
+
+
 class PruningWrapperTest(tf.test.TestCase):
 
   def setUp(self):
@@ -76,6 +105,105 @@ class PruningWrapperTest(tf.test.TestCase):
     pruning_wrapper.PruneLowMagnitude(layer, block_pooling_type='AVG')
     pruning_wrapper.PruneLowMagnitude(layer, block_pooling_type='MAX')
 
+  def testPruneWrapperAllowsOnlyValidStepSource(self):
+    layer = layers.Dense(10)
+    with self.assertRaises(ValueError):
+      pruning_wrapper.PruneLowMagnitude(layer, step_source='GLOBAL_STEP')
+
+    pruned_layer = pruning_wrapper.PruneLowMagnitude(
+        layer, step_source='OPTIMIZER')
+    self.assertEqual(
+        'OPTIMIZER',
+        Prune.from_config(pruned_layer.get_config()).step_source)
+
+  def testPruneWrapperAllowsOnlyValidMaskingMode(self):
+    layer = layers.Dense(10)
+    with self.assertRaises(ValueError):
+      pruning_wrapper.PruneLowMagnitude(layer, masking_mode='GRADIENT')
+
+    pruned_layer = pruning_wrapper.PruneLowMagnitude(
+        layer, masking_mode='FORWARD')
+    self.assertEqual(
+        'FORWARD',
+        Prune.from_config(pruned_layer.get_config()).masking_mode)
+
+  def testForwardMaskingDoesNotWriteWeights(self):
+    pruned_layer = Prune(
+        layers.Dense(4, use_bias=False), masking_mode='FORWARD')
+    pruned_layer.build((None, 6))
+    kernel, mask, _ = pruned_layer.pruning_vars[0]
+    kernel_value = keras.backend.get_value(kernel)
+    mask_value = tf.cast(tf.random.uniform([6, 4]) > 0.5, tf.float32)
+    mask.assign(mask_value)
+    inputs = tf.random.uniform([3, 6])
+
+    outputs = pruned_layer(inputs, training=False)
+
+    self.assertAllClose(tf.matmul(inputs, kernel_value * mask_value), outputs)
+    self.assertAllEqual(kernel_value, keras.backend.get_value(kernel))
+    self.assertIs(kernel, pruned_layer.layer.kernel)
+
+  def testForwardMaskingCustomLayerPrunable(self):
+    pruned_layer = Prune(CustomLayerPrunable(6, 4), masking_mode='FORWARD')
+    pruned_layer.build((None, 6))
+    for _, mask, _ in pruned_layer.pruning_vars:
+      mask.assign(tf.zeros_like(mask))
+
+    self.assertAllEqual(
+        tf.zeros([3, 4]), pruned_layer(tf.ones([3, 6]), training=False))
+
+  def testForwardMaskingRaisesError_WeightsNotAttributes(self):
+    pruned_layer = Prune(
+        CustomLayerWeightsInList(6, 4), masking_mode='FORWARD')
+    with self.assertRaises(ValueError):
+      pruned_layer.build((None, 6))
+
+    # The weights are masked at every call with the masking mode 'WEIGHT'.
+    Prune(CustomLayerWeightsInList(6, 4)).build((None, 6))
+
+  def testForwardMaskingKeepsTrackedWeights(self):
+    pruned_layer = Prune(CustomLayerPrunable(6, 4), masking_mode='FORWARD')
+    pruned_layer.build((None, 6))
+    weights = pruned_layer.layer.trainable_weights
+
+    pruned_layer(tf.ones([3, 6]), training=False)
+
+    self.assertEqual(len(weights), len(pruned_layer.layer.trainable_weights))
+    for weight, tracked_weight in zip(weights,
+                                      pruned_layer.layer.trainable_weights):
+      self.assertIs(weight, tracked_weight)
+
+  def testPruneWrapperAllowsOnlyValidMaskStorage(self):
+    layer = layers.Dense(10)
+    with self.assertRaises(ValueError):
+      pruning_wrapper.PruneLowMagnitude(layer, mask_storage='UINT8')
+
+    pruned_layer = pruning_wrapper.PruneLowMagnitude(
+        layer, mask_storage='PACKED')
+    self.assertEqual(
+        'PACKED',
+        Prune.from_config(pruned_layer.get_config()).mask_storage)
+
+  def testPackedMaskStorage(self):
+    for masking_mode in ['WEIGHT', 'FORWARD']:
+      pruned_layer = Prune(
+          layers.Dense(4, use_bias=False),
+          masking_mode=masking_mode,
+          mask_storage='PACKED')
+      pruned_layer.build((None, 6))
+      kernel, mask, _ = pruned_layer.pruning_vars[0]
+      kernel_value = keras.backend.get_value(kernel)
+      self.assertEqual(tf.int32, mask.dtype)
+      self.assertEqual([1], mask.shape.as_list())
+      # Only the first row of the kernel is kept
+      mask.assign([0b1111])
+      inputs = tf.random.uniform([3, 6])
+
+      outputs = pruned_layer(inputs, training=False)
+
+      self.assertAllClose(
+          tf.matmul(inputs[:, :1], kernel_value[:1]), outputs)
+
   def _check_mask_count(self, expected_mask_count=0):
     mask_count = 0
     for l in self.model.layers:
@@ -134,6 +262,44 @@ class PruningWrapperTest(tf.test.TestCase):
       layer.pop('build_config', None)
     self.assertEqual(model_config, pruned_model_config)
 
+  def testThresholdEngineSerialization(self):
+    layer = Prune(
+        layers.Dense(10),
+        threshold_engine=pruning_threshold.HistogramThreshold(num_bins=64))
+
+    config = layer.get_config()
+    layer_deserialized = Prune.from_config(config)
+
+    self.assertIsInstance(layer_deserialized.threshold_engine,
+                          pruning_threshold.HistogramThreshold)
+    self.assertEqual(64, layer_deserialized.threshold_engine.num_bins)
+    self.assertEqual(config, layer_deserialized.get_config())
+
+  def testDefaultThresholdEngineIsNotShared(self):
+    layer = Prune(layers.Dense(10))
+    other_layer = Prune(layers.Dense(10))
+
+    self.assertIsInstance(layer.threshold_engine,
+                          pruning_threshold.TopKThreshold)
+    self.assertIsNot(layer.threshold_engine, other_layer.threshold_engine)
+
+  def testRegisteredThresholdEngineSerialization(self):
+    layer = Prune(layers.Dense(10), threshold_engine=RegisteredThreshold())
+
+    layer_deserialized = Prune.from_config(layer.get_config())
+
+    self.assertIsInstance(layer_deserialized.threshold_engine,
+                          RegisteredThreshold)
+
+  def testCustomThresholdEngineSerialization(self):
+    layer = Prune(layers.Dense(10), threshold_engine=CustomThreshold())
+
+    with keras.utils.custom_object_scope({'CustomThreshold': CustomThreshold}):
+      layer_deserialized = Prune.from_config(layer.get_config())
+
+    self.assertIsInstance(layer_deserialized.threshold_engine,
+                          CustomThreshold)
+
   def testCustomLayerNonPrunable(self):
     layer = CustomLayer(input_dim=16, output_dim=32)
     inputs = keras.layers.Input(shape=(16))
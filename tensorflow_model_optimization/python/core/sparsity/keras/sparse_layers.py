@@ -0,0 +1,381 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Inference layers computing with sparse kernels.
+
+A pruned kernel of shape (input dim, output dim) is split in blocks of
+`block_size`, and only its nonzero blocks are kept, in a compressed sparse
+format: the nonzero blocks of every output block are stored consecutively,
+with the index of their input block, and the offset of the first nonzero
+block of every output block.
+
+Kernels with blocks of size (1, 1) are instead stored with the (output,
+input) index pair of every nonzero value, the COO format of the transposed
+kernel, and multiplied with `tf.sparse.sparse_dense_matmul` without
+converting their indices at every call. Block sparse kernels are multiplied
+by gathering the input blocks of the nonzero blocks, multiplying them by the
+blocks and summing the products of every output block.
+"""
+
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+
+# Default crossover from which the sparse layers are expected to be faster
+# than the dense layers on CPU, derived from the median speedups of SparseDense
+# over Dense with a batch size of 1 in `tools/benchmark_sparse_layers_results.csv`
+# (written by `tools/benchmark_sparse_layers.py`). Unstructured kernels were
+# faster from a sparsity of 0.98 and a size of 512x512. Block sparse kernels
+# were only faster from 1024x1024 with blocks of 8x8, and blocks of 2x2 were
+# slower at all the sparsities. The crossover can be tuned for a given CPU by
+# running the benchmark.
+_MIN_SPARSITY = 0.98
+_MIN_UNSTRUCTURED_KERNEL_SIZE = 512 * 512
+_MIN_BLOCK_KERNEL_SIZE = 1024 * 1024
+_MIN_BLOCK_SIZE = 64
+
+
+def _get_num_blocks(dim, block_dim):
+  return -(-dim // block_dim)
+
+
+def _to_block_sparse(kernel, block_size):
+  """Converts a kernel to the compressed block sparse format.
+
+  Args:
+    kernel: array of shape (input dim, output dim).
+    block_size: pair of the input and output dimensions of the blocks.
+
+  Returns:
+    A tuple with the (num nonzero blocks, block height, block width) nonzero
+    blocks, ordered by output block, the offset of the first nonzero block of
+    every output block followed by the number of nonzero blocks, and the input
+    block index of every nonzero block.
+  """
+  kernel = np.asarray(kernel)
+  block_height, block_width = block_size
+  num_input_blocks = _get_num_blocks(kernel.shape[0], block_height)
+  num_output_blocks = _get_num_blocks(kernel.shape[1], block_width)
+
+  padded_kernel = np.zeros(
+      [num_input_blocks * block_height, num_output_blocks * block_width],
+      dtype=kernel.dtype)
+  padded_kernel[:kernel.shape[0], :kernel.shape[1]] = kernel
+  # blocks[o, i] is the block of the output block o and the input block i
+  blocks = padded_kernel.reshape(
+      [num_input_blocks, block_height, num_output_blocks,
+       block_width]).transpose([2, 0, 1, 3])
+
+  is_nonzero = np.any(blocks != 0, axis=(2, 3))
+  output_block_indices, input_block_indices = np.nonzero(is_nonzero)
+  block_offsets = np.concatenate(
+      [[0], np.cumsum(np.sum(is_nonzero, axis=1))]).astype(np.int32)
+  return (blocks[output_block_indices, input_block_indices], block_offsets,
+          input_block_indices.astype(np.int32))
+
+
+def get_block_sparsity(kernel, block_size=(1, 1)):
+  """Returns the fraction of the blocks of the kernel which are zero."""
+  nonzero_blocks, block_offsets, _ = _to_block_sparse(kernel, block_size)
+  num_blocks = (
+      _get_num_blocks(kernel.shape[0], block_size[0]) * (len(block_offsets) - 1))
+  return 1. - float(nonzero_blocks.shape[0]) / num_blocks
+
+
+def is_sparse_inference_faster(kernel_shape, sparsity, block_size=(1, 1)):
+  """Returns whether `SparseDense` is expected to be faster than `Dense`.
+
+  Unstructured kernels, with blocks of (1, 1), are converted from a sparsity
+  of 0.98 when they hold at least 512x512 values. Block sparse kernels are
+  converted from the same sparsity when they hold at least 1024x1024 values
+  in blocks of at least 64 values.
+
+  Args:
+    kernel_shape: the (input dim, output dim) shape of the kernel.
+    sparsity: the fraction of the blocks of the kernel which are zero.
+    block_size: the block size of the sparse kernel.
+
+  Returns:
+    Whether the sparse layer is expected to be faster on CPU.
+  """
+  kernel_size = kernel_shape[0] * kernel_shape[1]
+  if tuple(block_size) == (1, 1):
+    if kernel_size < _MIN_UNSTRUCTURED_KERNEL_SIZE:
+      return False
+  elif (kernel_size < _MIN_BLOCK_KERNEL_SIZE or
+        block_size[0] * block_size[1] < _MIN_BLOCK_SIZE):
+    return False
+  return sparsity >= _MIN_SPARSITY
+
+
+def _to_sparse_indices(block_offsets, input_indices):
+  """Returns the (output, input) indices of a kernel in the CSR format."""
+  output_indices = np.repeat(
+      np.arange(len(block_offsets) - 1), np.diff(block_offsets))
+  return np.stack([output_indices, input_indices], axis=1).astype(np.int64)
+
+
+def _sparse_matmul(inputs, values, indices, units):
+  """Multiplies the inputs by a kernel stored in the COO format."""
+  transposed_kernel = tf.SparseTensor(
+      indices=indices,
+      values=tf.reshape(values, [-1]),
+      dense_shape=[units, inputs.shape[-1]])
+  return tf.transpose(
+      tf.sparse.sparse_dense_matmul(transposed_kernel, inputs, adjoint_b=True))
+
+
+def _block_sparse_matmul(inputs, values, block_offsets, input_block_indices,
+                         block_size, units):
+  """Multiplies the inputs by a kernel stored in the block sparse format."""
+  block_height, block_width = block_size
+  input_dim = inputs.shape[-1]
+  num_input_blocks = _get_num_blocks(input_dim, block_height)
+  num_output_blocks = block_offsets.shape[0] - 1
+
+  inputs = tf.pad(inputs,
+                  [[0, 0], [0, num_input_blocks * block_height - input_dim]])
+  input_blocks = tf.gather(
+      tf.reshape(inputs, [-1, num_input_blocks, block_height]),
+      input_block_indices,
+      axis=1)
+  # Shape (num nonzero blocks, batch, block width)
+  products = tf.einsum('bnh,nhw->nbw', input_blocks, values)
+  output_blocks = tf.math.unsorted_segment_sum(
+      products, tf.ragged.row_splits_to_segment_ids(block_offsets),
+      num_output_blocks)
+  outputs = tf.reshape(
+      tf.transpose(output_blocks, [1, 0, 2]),
+      [-1, num_output_blocks * block_width])
+  return outputs[:, :units]
+
+
+class SparseDense(keras.layers.Layer):
+  """Dense layer computing with a compressed sparse kernel."""
+
+  def __init__(self,
+               units,
+               num_nonzero_blocks,
+               block_size=(1, 1),
+               activation=None,
+               use_bias=True,
+               **kwargs):
+    """Creates a SparseDense layer.
+
+    Args:
+      units: Dimensionality of the output space.
+      num_nonzero_blocks: Number of nonzero blocks of the kernel.
+      block_size: The (input, output) dimensions of the blocks of the kernel.
+      activation: Activation function to use.
+      use_bias: Whether the layer uses a bias vector.
+      **kwargs: Additional keyword arguments to be passed to the keras layer.
+    """
+    super(SparseDense, self).__init__(**kwargs)
+    self.units = units
+    self.num_nonzero_blocks = num_nonzero_blocks
+    self.block_size = tuple(block_size)
+    self.activation = keras.activations.get(activation)
+    self.use_bias = use_bias
+
+  def build(self, input_shape):
+    input_dim = tf.TensorShape(input_shape)[-1]
+    self.kernel_shape = (input_dim, self.units)
+    num_output_blocks = _get_num_blocks(self.units, self.block_size[1])
+
+    self.values = self.add_weight(
+        'values',
+        shape=(self.num_nonzero_blocks,) + self.block_size,
+        initializer='zeros',
+        trainable=False,
+    )
+    if self.block_size == (1, 1):
+      self.indices = self.add_weight(
+          'indices',
+          shape=(self.num_nonzero_blocks, 2),
+          initializer='zeros',
+          dtype=tf.int64,
+          trainable=False,
+      )
+    else:
+      self.block_offsets = self.add_weight(
+          'block_offsets',
+          shape=(num_output_blocks + 1,),
+          initializer='zeros',
+          dtype=tf.int32,
+          trainable=False,
+      )
+      self.block_indices = self.add_weight(
+          'block_indices',
+          shape=(self.num_nonzero_blocks,),
+          initializer='zeros',
+          dtype=tf.int32,
+          trainable=False,
+      )
+    if self.use_bias:
+      self.bias = self.add_weight(
+          'bias',
+          shape=(self.units,),
+          initializer='zeros',
+          trainable=False,
+      )
+    else:
+      self.bias = None
+
+    super(SparseDense, self).build(input_shape)
+
+  def set_sparse_kernel(self, kernel, bias=None):
+    """Sets the weights of the layer from a dense kernel and the bias."""
+    values, block_offsets, block_indices = _to_block_sparse(
+        kernel, self.block_size)
+    if values.shape[0] != self.num_nonzero_blocks:
+      raise ValueError(
+          'Expected a kernel with {} nonzero blocks. Given: {}'.format(
+              self.num_nonzero_blocks, values.shape[0]))
+    self.values.assign(values)
+    if self.block_size == (1, 1):
+      self.indices.assign(_to_sparse_indices(block_offsets, block_indices))
+    else:
+      self.block_offsets.assign(block_offsets)
+      self.block_indices.assign(block_indices)
+    if self.use_bias:
+      self.bias.assign(bias)
+
+  def get_kernel(self):
+    """Returns the dense kernel."""
+    if self.block_size == (1, 1):
+      return tf.transpose(
+          tf.scatter_nd(self.indices, tf.reshape(self.values, [-1]),
+                        [self.units, self.kernel_shape[0]]))
+    block_height, block_width = self.block_size
+    num_input_blocks = _get_num_blocks(self.kernel_shape[0], block_height)
+    num_output_blocks = self.block_offsets.shape[0] - 1
+    blocks = tf.scatter_nd(
+        tf.stack([
+            tf.ragged.row_splits_to_segment_ids(self.block_offsets),
+            self.block_indices
+        ], axis=1), self.values,
+        [num_output_blocks, num_input_blocks, block_height, block_width])
+    kernel = tf.reshape(
+        tf.transpose(blocks, [1, 2, 0, 3]),
+        [num_input_blocks * block_height, num_output_blocks * block_width])
+    return kernel[:self.kernel_shape[0], :self.units]
+
+  def call(self, inputs):
+    flat_inputs = tf.reshape(inputs, [-1, self.kernel_shape[0]])
+    if self.block_size == (1, 1):
+      outputs = _sparse_matmul(flat_inputs, self.values, self.indices,
+                               self.units)
+    else:
+      outputs = _block_sparse_matmul(flat_inputs, self.values,
+                                     self.block_offsets, self.block_indices,
+                                     self.block_size, self.units)
+    outputs = tf.reshape(
+        outputs, tf.concat([tf.shape(inputs)[:-1], [self.units]], axis=0))
+    if self.use_bias:
+      outputs = tf.nn.bias_add(outputs, self.bias)
+    if self.activation is not None:
+      outputs = self.activation(outputs)
+    return outputs
+
+  def compute_output_shape(self, input_shape):
+    return tf.TensorShape(input_shape)[:-1].concatenate([self.units])
+
+  def get_config(self):
+    base_config = super(SparseDense, self).get_config()
+    config = {
+        'units': self.units,
+        'num_nonzero_blocks': self.num_nonzero_blocks,
+        'block_size': self.block_size,
+        'activation': keras.activations.serialize(self.activation),
+        'use_bias': self.use_bias,
+    }
+    return dict(list(base_config.items()) + list(config.items()))
+
+  @classmethod
+  def from_kernel(cls, kernel, bias=None, block_size=(1, 1), **kwargs):
+    """Creates a built SparseDense layer from a dense kernel.
+
+    Args:
+      kernel: The (input dim, output dim) kernel.
+      bias: The bias, or None if the layer has no bias.
+      block_size: See `__init__`.
+      **kwargs: Additional keyword arguments to be passed to `__init__`.
+
+    Returns:
+      A built SparseDense layer computing with the kernel.
+    """
+    kernel = np.asarray(kernel)
+    values, _, _ = _to_block_sparse(kernel, block_size)
+    sparse_layer = cls(
+        units=kernel.shape[1],
+        num_nonzero_blocks=values.shape[0],
+        block_size=block_size,
+        use_bias=bias is not None,
+        **kwargs)
+    sparse_layer.build((None, kernel.shape[0]))
+    sparse_layer.set_sparse_kernel(kernel, bias)
+    return sparse_layer
+
+
+def _get_dense_kernel(layer):
+  """Returns the kernel of a layer computing as a Dense layer, or None."""
+  if type(layer) is keras.layers.Dense:  # pylint: disable=unidiomatic-typecheck
+    return layer.kernel
+  if (type(layer) is keras.layers.Conv2D and  # pylint: disable=unidiomatic-typecheck
+      layer.kernel_size == (1, 1) and layer.strides == (1, 1) and
+      layer.groups == 1 and layer.data_format == 'channels_last'):
+    return tf.reshape(layer.kernel, layer.kernel.shape[-2:])
+  return None
+
+
+def convert_to_sparse_dense(layer, kernel_mask=None, block_size=(1, 1),
+                            min_sparsity=None):
+  """Converts a Dense or 1x1 Conv2D layer to a `SparseDense` layer.
+
+  Args:
+    layer: A `keras.layers.Dense`, or a `keras.layers.Conv2D` with a 1x1
+      kernel, unit strides and channels last.
+    kernel_mask: Optional mask of the kernel, multiplied with the kernel.
+    block_size: The block size of the sparse kernel. Only the last 2
+      dimensions are used.
+    min_sparsity: The minimum fraction of zero blocks of the kernel to
+      convert the layer. By default, the layer is converted when
+      `is_sparse_inference_faster`.
+
+  Returns:
+    A built SparseDense layer with the name and weights of the layer, or None
+    if the layer is not supported or not sparse enough.
+  """
+  kernel = _get_dense_kernel(layer)
+  if kernel is None:
+    return None
+  if kernel_mask is not None:
+    kernel = kernel * tf.reshape(kernel_mask, kernel.shape)
+  kernel = kernel.numpy()
+
+  block_size = tuple(block_size)[-2:]
+  sparsity = get_block_sparsity(kernel, block_size)
+  if min_sparsity is None:
+    if not is_sparse_inference_faster(kernel.shape, sparsity, block_size):
+      return None
+  elif sparsity < min_sparsity:
+    return None
+
+  return SparseDense.from_kernel(
+      kernel,
+      layer.bias.numpy() if layer.use_bias else None,
+      block_size=block_size,
+      activation=layer.activation,
+      name=layer.name)
@@ -0,0 +1,151 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the sparse inference layers."""
+
+from absl.testing import parameterized
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.sparsity.keras import prune
+from tensorflow_model_optimization.python.core.sparsity.keras import sparse_layers
+
+
+layers = keras.layers
+
+
+def _get_sparse_kernel(shape, sparsity, block_size=(1, 1)):
+  """Returns a random kernel with the given fraction of zero blocks."""
+  num_blocks = [
+      -(-dim // block_dim) for dim, block_dim in zip(shape, block_size)
+  ]
+  block_mask = (np.random.rand(*num_blocks) >= sparsity).astype(np.float32)
+  mask = np.kron(block_mask, np.ones(block_size))[:shape[0], :shape[1]]
+  return (np.random.randn(*shape) * mask).astype(np.float32)
+
+
+class SparseLayersTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters(((1, 1),), ((2, 2),), ((4, 1),), ((3, 5),))
+  def testBlockSparseFormatRoundTrip(self, block_size):
+    kernel = _get_sparse_kernel([10, 12], 0.6, block_size)
+
+    sparse_layer = sparse_layers.SparseDense.from_kernel(
+        kernel, bias=None, block_size=block_size)
+
+    self.assertAllEqual(kernel, sparse_layer.get_kernel())
+
+  @parameterized.parameters(((1, 1),), ((2, 2),), ((1, 4),), ((3, 5),))
+  def testComputesSameOutputsAsDense(self, block_size):
+    kernel = _get_sparse_kernel([10, 12], 0.7, block_size)
+    bias = np.random.randn(12).astype(np.float32)
+    dense_layer = layers.Dense(12, activation='relu')
+    dense_layer.build((None, 10))
+    dense_layer.set_weights([kernel, bias])
+
+    sparse_layer = sparse_layers.SparseDense.from_kernel(
+        kernel, bias, block_size=block_size, activation='relu')
+
+    inputs = np.random.rand(2, 3, 10).astype(np.float32)
+    self.assertAllClose(dense_layer(inputs), sparse_layer(inputs), atol=1e-5)
+
+  def testAllZeroKernel(self):
+    sparse_layer = sparse_layers.SparseDense.from_kernel(
+        np.zeros([4, 6], dtype=np.float32), bias=None, block_size=(2, 2))
+
+    self.assertEqual(0, sparse_layer.num_nonzero_blocks)
+    self.assertAllEqual(
+        np.zeros([3, 6]), sparse_layer(np.ones([3, 4], dtype=np.float32)))
+
+  def testSerialization(self):
+    kernel = _get_sparse_kernel([8, 6], 0.5, (2, 2))
+    sparse_layer = sparse_layers.SparseDense.from_kernel(
+        kernel, np.ones(6, dtype=np.float32), block_size=(2, 2))
+    model = keras.Sequential([layers.InputLayer((8,)), sparse_layer])
+
+    loaded_model = keras.Sequential.from_config(
+        model.get_config(),
+        custom_objects={'SparseDense': sparse_layers.SparseDense})
+    loaded_model.set_weights(model.get_weights())
+
+    inputs = np.random.rand(3, 8).astype(np.float32)
+    self.assertAllEqual(model(inputs), loaded_model(inputs))
+
+  def testConvertsPointwiseConv2D(self):
+    conv_layer = layers.Conv2D(8, 1)
+    conv_layer.build((None, 5, 5, 4))
+    conv_layer.set_weights([
+        _get_sparse_kernel([4, 8], 0.8).reshape([1, 1, 4, 8]),
+        np.random.randn(8).astype(np.float32)
+    ])
+
+    sparse_layer = sparse_layers.convert_to_sparse_dense(
+        conv_layer, min_sparsity=0.)
+
+    self.assertIsInstance(sparse_layer, sparse_layers.SparseDense)
+    self.assertEqual(conv_layer.name, sparse_layer.name)
+    inputs = np.random.rand(2, 5, 5, 4).astype(np.float32)
+    self.assertAllClose(conv_layer(inputs), sparse_layer(inputs), atol=1e-5)
+
+  def testDoesNotConvertUnsupportedLayers(self):
+    conv_layer = layers.Conv2D(8, 3)
+    conv_layer.build((None, 5, 5, 4))
+
+    self.assertIsNone(
+        sparse_layers.convert_to_sparse_dense(conv_layer, min_sparsity=0.))
+
+  @parameterized.parameters(
+      ((256, 256), 0.99, (1, 1), False),
+      ((512, 512), 0.95, (1, 1), False),
+      ((512, 512), 0.98, (1, 1), True),
+      ((1024, 4096), 0.99, (1, 1), True),
+      ((512, 512), 0.99, (8, 8), False),
+      ((1024, 1024), 0.99, (2, 2), False),
+      ((1024, 4096), 0.99, (4, 4), False),
+      ((1024, 1024), 0.95, (8, 8), False),
+      ((1024, 1024), 0.98, (8, 8), True),
+  )
+  def testDefaultCrossover(self, kernel_shape, sparsity, block_size,
+                           is_faster):
+    self.assertEqual(
+        is_faster,
+        sparse_layers.is_sparse_inference_faster(kernel_shape, sparsity,
+                                                 block_size))
+
+  @parameterized.parameters((0.5, True), (0.6, False))
+  def testStripPruningWithSparseInference(self, min_sparsity, is_converted):
+    model = keras.Sequential([
+        layers.Dense(16, activation='relu', input_shape=(8,)),
+        layers.Dense(4),
+    ])
+    pruned_model = prune.prune_low_magnitude(model, block_size=(2, 2))
+    # Half of the 2x2 blocks of the kernel are masked
+    mask = pruned_model.layers[0].pruning_vars[0][1]
+    mask.assign(np.tile([[1.], [1.], [0.], [0.]], [2, 16]))
+    inputs = np.random.rand(3, 8).astype(np.float32)
+    expected_outputs = pruned_model(inputs)
+
+    stripped_model = prune.strip_pruning(
+        pruned_model, sparse_inference=True, min_sparsity=min_sparsity)
+
+    self.assertEqual(
+        is_converted,
+        isinstance(stripped_model.layers[0], sparse_layers.SparseDense))
+    self.assertIsInstance(stripped_model.layers[1], layers.Dense)
+    self.assertAllClose(expected_outputs, stripped_model(inputs), atol=1e-5)
+
+
+if __name__ == '__main__':
+  tf.test.main()
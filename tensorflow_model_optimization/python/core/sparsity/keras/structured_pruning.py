@@ -0,0 +1,373 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Structured pruning removing whole channels from the layers of a model.
+
+Unlike magnitude-based pruning, which zeroes single weights of layers of
+unchanged shapes, structured pruning removes the least important output
+channels (filters) of the Dense and Conv2D layers, as well as the matching
+channels of the layers using them. The resulting model is smaller and faster
+with any dense runtime.
+"""
+
+import numpy as np
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+
+layers = keras.layers
+
+# Layers which compute every channel independently of the other channels.
+_CHANNEL_WISE_LAYERS = (
+    layers.Activation,
+    layers.AveragePooling1D,
+    layers.AveragePooling2D,
+    layers.Dropout,
+    layers.ELU,
+    layers.GlobalAveragePooling1D,
+    layers.GlobalAveragePooling2D,
+    layers.GlobalMaxPooling1D,
+    layers.GlobalMaxPooling2D,
+    layers.LeakyReLU,
+    layers.MaxPooling1D,
+    layers.MaxPooling2D,
+    layers.ReLU,
+    layers.SpatialDropout2D,
+    layers.UpSampling2D,
+    layers.ZeroPadding2D,
+)
+
+# Layers combining the same channels of all their inputs.
+_ELEMENTWISE_MERGE_LAYERS = (
+    layers.Add,
+    layers.Average,
+    layers.Maximum,
+    layers.Minimum,
+    layers.Multiply,
+    layers.Subtract,
+)
+
+_CRITERIA = ('L1', 'L2', 'BN_GAMMA')
+
+
+class _ChannelSpace(object):
+  """Channels which are pruned together in several layers.
+
+  The channel spaces joined by elementwise operations are merged, and the
+  merged spaces are represented by their root space.
+  """
+
+  def __init__(self, size):
+    self.size = size
+    self.pinned = False
+    self.kernel_scores = np.zeros(size)
+    self.gamma_scores = None
+    self.kept_indices = None
+    self._parent = None
+
+  def root(self):
+    space = self
+    while space._parent is not None:  # pylint: disable=protected-access
+      space = space._parent  # pylint: disable=protected-access
+    return space
+
+  def merge(self, other):
+    root, other_root = self.root(), other.root()
+    if root is other_root:
+      return
+    other_root._parent = root  # pylint: disable=protected-access
+    root.pinned = root.pinned or other_root.pinned
+    root.kernel_scores = root.kernel_scores + other_root.kernel_scores
+    root.add_gamma_scores(other_root.gamma_scores)
+
+  def add_gamma_scores(self, gamma_scores):
+    if gamma_scores is None:
+      return
+    self.gamma_scores = (
+        gamma_scores
+        if self.gamma_scores is None else self.gamma_scores + gamma_scores)
+
+
+def _is_channels_last(layer):
+  return getattr(layer, 'data_format', 'channels_last') == 'channels_last'
+
+
+def _is_pruned_layer(layer):
+  """Returns whether the output channels of the layer can be removed."""
+  if isinstance(layer, layers.Dense):
+    return True
+  return (isinstance(layer, layers.Conv2D) and
+          not isinstance(layer,
+                         (layers.Conv2DTranspose, layers.DepthwiseConv2D)) and
+          _is_channels_last(layer) and layer.groups == 1)
+
+
+def _is_channel_wise(layer):
+  """Returns whether the layer and its weights are channel-wise."""
+  if isinstance(layer, _CHANNEL_WISE_LAYERS):
+    return _is_channels_last(layer)
+  if isinstance(layer, layers.BatchNormalization):
+    return list(layer.axis) in ([-1], [len(layer.input_shape) - 1])
+  if isinstance(layer, layers.DepthwiseConv2D):
+    return _is_channels_last(layer) and layer.depth_multiplier == 1
+  return False
+
+
+def _is_channel_concatenation(layer):
+  return (isinstance(layer, layers.Concatenate) and
+          layer.axis in (-1, len(layer.input_shape[0]) - 1))
+
+
+def _get_producers(layer):
+  producers = []
+  for node in layer._inbound_nodes:  # pylint: disable=protected-access
+    if isinstance(node.inbound_layers, list):
+      producers.extend(node.inbound_layers)
+    else:
+      producers.append(node.inbound_layers)
+  return producers
+
+
+def _get_channel_norms(kernel, criterion):
+  """Returns the norm of the weights of every output channel of the kernel."""
+  kernel = np.reshape(kernel, [-1, kernel.shape[-1]])
+  if criterion == 'L2':
+    return np.sqrt(np.sum(np.square(kernel), axis=0))
+  return np.sum(np.abs(kernel), axis=0)
+
+
+def _get_kept_indices(layout):
+  """Returns the indices of the kept channels of a tensor.
+
+  Args:
+    layout: list of the channel spaces of the consecutive channels of the
+      tensor, or None if the channels of the tensor are not tracked.
+
+  Returns:
+    The array of the indices of the kept channels, or None to keep them all.
+  """
+  if layout is None:
+    return None
+  kept_indices = []
+  offset = 0
+  for space in layout:
+    kept_indices.append(space.root().kept_indices + offset)
+    offset += space.size
+  return np.concatenate(kept_indices)
+
+
+def _pin(layouts):
+  for layout in layouts:
+    for space in layout or []:
+      space.root().pinned = True
+
+
+class _ChannelAnalysis(object):
+  """Finds the channel spaces of the tensors of a model."""
+
+  def __init__(self, model, criterion):
+    self._criterion = criterion
+    self.spaces = []
+    # Map of layer -> layout of its output, see `_get_kept_indices`.
+    self.layouts = {}
+    # Map of pruned layer -> layout of its input.
+    self.input_layouts = {}
+
+    for layer in model.layers:
+      self._analyse_layer(layer)
+
+    # The outputs of the model keep all their channels
+    # pylint: disable=protected-access
+    for layer in model.layers:
+      if not layer._outbound_nodes or layer in model._output_layers:
+        _pin([self.layouts.get(layer)])
+
+  def _analyse_layer(self, layer):
+    """Sets the layout of the output of the layer."""
+    # pylint: disable=protected-access
+    if len(layer._inbound_nodes) != 1:
+      # Shared layers are left unchanged
+      _pin([self.layouts.get(producer) for producer in _get_producers(layer)])
+      return
+
+    input_layouts = [
+        self.layouts.get(producer) for producer in _get_producers(layer)
+    ]
+    if _is_pruned_layer(layer):
+      self.input_layouts[layer] = input_layouts[0]
+      space = _ChannelSpace(layer.kernel.shape[-1])
+      space.kernel_scores = _get_channel_norms(layer.get_weights()[0],
+                                               self._criterion)
+      self.spaces.append(space)
+      self.layouts[layer] = [space]
+    elif _is_channel_wise(layer):
+      layout = input_layouts[0]
+      self.layouts[layer] = layout
+      if isinstance(layer, layers.BatchNormalization) and layout is not None:
+        self._add_gamma_scores(layer, layout)
+    elif isinstance(layer, _ELEMENTWISE_MERGE_LAYERS):
+      first_layout = input_layouts[0]
+      if any(
+          layout is None or
+          [space.size for space in layout] !=
+          [space.size for space in first_layout] for layout in input_layouts):
+        _pin(input_layouts)
+        return
+      for layout in input_layouts[1:]:
+        for first_space, space in zip(first_layout, layout):
+          first_space.merge(space)
+      self.layouts[layer] = first_layout
+    elif _is_channel_concatenation(layer):
+      if any(layout is None for layout in input_layouts):
+        _pin(input_layouts)
+        return
+      self.layouts[layer] = [
+          space for layout in input_layouts for space in layout
+      ]
+    else:
+      _pin(input_layouts)
+
+  def _add_gamma_scores(self, layer, layout):
+    if not layer.scale:
+      return
+    gamma = np.abs(layer.gamma.numpy())
+    offset = 0
+    for space in layout:
+      space.root().add_gamma_scores(gamma[offset:offset + space.size])
+      offset += space.size
+
+  def select_channels(self, sparsity):
+    """Selects the channels kept in every channel space."""
+    for space in self.spaces:
+      root = space.root()
+      if root.kept_indices is not None:
+        continue
+      if root.pinned:
+        root.kept_indices = np.arange(root.size)
+        continue
+
+      if self._criterion == 'BN_GAMMA' and root.gamma_scores is not None:
+        scores = root.gamma_scores
+      else:
+        scores = root.kernel_scores
+      num_kept = max(1, int(round(root.size * (1 - sparsity))))
+      root.kept_indices = np.sort(
+          np.argsort(-scores, kind='stable')[:num_kept])
+
+
+def _prune_weights(layer, analysis):
+  """Returns the weights of the layer without the removed channels."""
+  weights = layer.get_weights()
+  if layer in analysis.input_layouts:
+    kernel = weights[0]
+    input_indices = _get_kept_indices(analysis.input_layouts[layer])
+    if input_indices is not None:
+      kernel = np.take(kernel, input_indices, axis=-2)
+    output_indices = _get_kept_indices(analysis.layouts[layer])
+    return [kernel[..., output_indices]] + [
+        weight[output_indices] for weight in weights[1:]
+    ]
+
+  indices = _get_kept_indices(analysis.layouts.get(layer))
+  if indices is None:
+    return weights
+  if isinstance(layer, layers.DepthwiseConv2D):
+    # The kernel has shape (height, width, channels, 1)
+    return [weights[0][:, :, indices, :]] + [
+        weight[indices] for weight in weights[1:]
+    ]
+  if isinstance(layer, layers.BatchNormalization):
+    return [weight[indices] for weight in weights]
+  return weights
+
+
+def prune_channels(model, sparsity, criterion='L1', custom_objects=None):
+  """Removes the least important channels of the layers of a model.
+
+  The output channels (filters) of the Dense and Conv2D layers are scored by
+  the norm of their weights, or by the absolute value of the gamma of the
+  following BatchNormalization layer. The lowest scored fraction `sparsity`
+  of the channels of every layer is removed, from the layer itself and from
+  the layers using them:
+
+  * The channel-wise layers like BatchNormalization, activations, pooling or
+    DepthwiseConv2D remove the same channels.
+  * The Dense and Conv2D layers using the channels as inputs remove the
+    matching input channels of their kernels.
+  * The layers combining their inputs elementwise, like Add, make all their
+    inputs keep the same channels, scored together.
+  * Concatenate layers on the channels keep the channels of their inputs.
+
+  The channels consumed by other layers, like Flatten or Reshape, and the
+  outputs of the model are kept. The returned model has the same inputs and
+  outputs, with smaller layers, and is usually fine-tuned to recover its
+  accuracy.
+
+  Usage:
+
+  ```python
+  pruned_model = prune_channels(model, sparsity=0.5, criterion='BN_GAMMA')
+  pruned_model.compile(...)
+  pruned_model.fit(...)
+  ```
+
+  Args:
+    model: a built functional or `keras.Sequential` model, which is not
+      wrapped for pruning.
+    sparsity: the fraction of the output channels of every layer to remove,
+      in [0, 1).
+    criterion: how the channels are scored. 'L1' or 'L2' use the norm of the
+      weights of the channel, 'BN_GAMMA' uses the absolute value of the gamma
+      of the BatchNormalization layers of the channel if there are any, and
+      the 'L1' norm otherwise.
+    custom_objects: optional dict of the custom objects needed to rebuild the
+      model from its config.
+
+  Returns:
+    A new `keras.Model` without the removed channels.
+
+  Raises:
+    ValueError: if the sparsity or the criterion is not supported, or if the
+    model is subclassed.
+  """
+  if not 0 <= sparsity < 1:
+    raise ValueError(
+        'sparsity must be in [0, 1): {} given.'.format(sparsity))
+  if criterion not in _CRITERIA:
+    raise ValueError('Unsupported criterion \'{}\'. Should be one of {}.'.format(
+        criterion, _CRITERIA))
+  # pylint: disable=protected-access
+  if not model._is_graph_network and not isinstance(model, keras.Sequential):
+    raise ValueError('Subclassed models are not supported currently.')
+
+  analysis = _ChannelAnalysis(model, criterion)
+  analysis.select_channels(sparsity)
+
+  config = model.get_config()
+  layers_by_name = {layer.name: layer for layer in model.layers}
+  for layer_config in config['layers']:
+    layer = layers_by_name.get(layer_config['config']['name'])
+    if layer in analysis.input_layouts:
+      size_key = 'units' if isinstance(layer, layers.Dense) else 'filters'
+      layer_config['config'][size_key] = len(
+          _get_kept_indices(analysis.layouts[layer]))
+
+  if isinstance(model, keras.Sequential):
+    pruned_model = keras.Sequential.from_config(config, custom_objects)
+  else:
+    pruned_model = keras.Model.from_config(config, custom_objects)
+
+  for layer in model.layers:
+    pruned_model.get_layer(layer.name).set_weights(
+        _prune_weights(layer, analysis))
+  return pruned_model
@@ -0,0 +1,160 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the structured pruning of channels."""
+
+from absl.testing import parameterized
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.sparsity.keras import structured_pruning
+
+
+layers = keras.layers
+
+
+class StructuredPruningTest(tf.test.TestCase, parameterized.TestCase):
+
+  def _get_kernel_shapes(self, model):
+    return {
+        layer.name: tuple(layer.kernel.shape)
+        for layer in model.layers
+        if hasattr(layer, 'kernel')
+    }
+
+  def _zero_output_channels(self, layer, channels):
+    weights = layer.get_weights()
+    for weight in weights:
+      weight[..., channels] = 0.
+    layer.set_weights(weights)
+
+  @parameterized.parameters(-0.1, 1.)
+  def testInvalidSparsityIsNotSupported(self, sparsity):
+    model = keras.Sequential([layers.Dense(4, input_shape=(3,))])
+    with self.assertRaises(ValueError):
+      structured_pruning.prune_channels(model, sparsity)
+
+  def testUnknownCriterionIsNotSupported(self):
+    model = keras.Sequential([layers.Dense(4, input_shape=(3,))])
+    with self.assertRaises(ValueError):
+      structured_pruning.prune_channels(model, 0.5, criterion='DEADBEEF')
+
+  def testPrunesDenseChain(self):
+    model = keras.Sequential([
+        layers.Dense(8, activation='relu', input_shape=(4,), name='dense_1'),
+        layers.Dense(6, activation='relu', name='dense_2'),
+        layers.Dense(2, name='dense_3'),
+    ])
+    # The zeroed channels are removed without changing the outputs.
+    self._zero_output_channels(model.layers[0], [1, 3, 5, 7])
+    self._zero_output_channels(model.layers[1], [0, 2, 4])
+
+    pruned_model = structured_pruning.prune_channels(model, 0.5)
+
+    self.assertEqual(
+        {
+            'dense_1': (4, 4),
+            'dense_2': (4, 3),
+            'dense_3': (3, 2)
+        }, self._get_kernel_shapes(pruned_model))
+    inputs = np.random.rand(5, 4).astype(np.float32)
+    self.assertAllClose(model(inputs), pruned_model(inputs), atol=1e-5)
+
+  def testPrunesByBatchNormalizationGamma(self):
+    inputs = keras.Input(shape=(6, 6, 3))
+    x = layers.Conv2D(8, 3, name='conv_1')(inputs)
+    x = layers.BatchNormalization(name='bn')(x)
+    x = layers.ReLU()(x)
+    x = layers.DepthwiseConv2D(3, name='depthwise')(x)
+    outputs = layers.Conv2D(4, 1, name='conv_2')(x)
+    model = keras.Model(inputs, outputs)
+    batch_normalization = model.get_layer('bn')
+    bn_weights = batch_normalization.get_weights()
+    bn_weights[0] = np.array([1., -5., 2., 6., -0.1, 3., 0.2, 4.])
+    batch_normalization.set_weights(bn_weights)
+
+    pruned_model = structured_pruning.prune_channels(
+        model, 0.5, criterion='BN_GAMMA')
+
+    kept_channels = [1, 3, 5, 7]
+    self.assertAllEqual(
+        [weight[kept_channels] for weight in bn_weights],
+        pruned_model.get_layer('bn').get_weights())
+    self.assertAllEqual(
+        model.get_layer('depthwise').depthwise_kernel.numpy()[:, :,
+                                                              kept_channels],
+        pruned_model.get_layer('depthwise').depthwise_kernel)
+    self.assertEqual((3, 3, 3, 4),
+                     tuple(pruned_model.get_layer('conv_1').kernel.shape))
+    self.assertEqual((1, 1, 4, 4),
+                     tuple(pruned_model.get_layer('conv_2').kernel.shape))
+
+  def testAddedChannelsArePrunedTogether(self):
+    inputs = keras.Input(shape=(6, 6, 3))
+    x = layers.Conv2D(8, 1, name='conv_1')(inputs)
+    y = layers.Conv2D(8, 1, name='conv_2')(x)
+    x = layers.Add()([x, y])
+    outputs = layers.Conv2D(4, 1, name='conv_3')(x)
+    model = keras.Model(inputs, outputs)
+    self._zero_output_channels(model.get_layer('conv_1'), [0, 1, 2, 3])
+    self._zero_output_channels(model.get_layer('conv_2'), [0, 1, 2, 3])
+
+    pruned_model = structured_pruning.prune_channels(model, 0.5)
+
+    self.assertEqual(
+        {
+            'conv_1': (1, 1, 3, 4),
+            'conv_2': (1, 1, 4, 4),
+            'conv_3': (1, 1, 4, 4)
+        }, self._get_kernel_shapes(pruned_model))
+    data = np.random.rand(2, 6, 6, 3).astype(np.float32)
+    self.assertAllClose(model(data), pruned_model(data), atol=1e-5)
+
+  def testConcatenatedChannelsArePrunedSeparately(self):
+    inputs = keras.Input(shape=(6, 6, 3))
+    x = layers.Conv2D(4, 1, name='conv_1')(inputs)
+    y = layers.Conv2D(6, 1, name='conv_2')(inputs)
+    x = layers.Concatenate()([x, y])
+    outputs = layers.Conv2D(2, 1, name='conv_3')(x)
+    model = keras.Model(inputs, outputs)
+    self._zero_output_channels(model.get_layer('conv_1'), [0, 2])
+    self._zero_output_channels(model.get_layer('conv_2'), [3, 4, 5])
+
+    pruned_model = structured_pruning.prune_channels(model, 0.5)
+
+    self.assertEqual(
+        {
+            'conv_1': (1, 1, 3, 2),
+            'conv_2': (1, 1, 3, 3),
+            'conv_3': (1, 1, 5, 2)
+        }, self._get_kernel_shapes(pruned_model))
+    data = np.random.rand(2, 6, 6, 3).astype(np.float32)
+    self.assertAllClose(model(data), pruned_model(data), atol=1e-5)
+
+  def testFlattenedChannelsAreKept(self):
+    model = keras.Sequential([
+        layers.Conv2D(8, 3, input_shape=(5, 5, 2), name='conv'),
+        layers.Flatten(),
+        layers.Dense(2, name='dense'),
+    ])
+
+    pruned_model = structured_pruning.prune_channels(model, 0.5)
+
+    self.assertEqual(
+        self._get_kernel_shapes(model), self._get_kernel_shapes(pruned_model))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,106 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark for per-layer versus model-level pruning mask updates.
+
+Trains a deep stack of small pruned Dense layers with every `mask_update_mode`
+and reports the time of the first training step, which is dominated by graph
+construction, and the mean time of the following steps.
+
+Example:
+
+  python benchmark_model_pruning.py --num_layers=300
+"""
+
+from __future__ import print_function
+
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.sparsity.keras import prune
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_callbacks
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_schedule
+
+_NUM_LAYERS = flags.DEFINE_integer(
+    'num_layers', 300, 'Number of pruned Dense layers of the model.')
+_UNITS = flags.DEFINE_integer('units', 64, 'Units of every Dense layer.')
+_STEPS = flags.DEFINE_integer('steps', 50, 'Number of timed training steps.')
+_FREQUENCY = flags.DEFINE_integer(
+    'frequency', 1, 'Number of steps between two mask updates.')
+
+MASK_UPDATE_MODES = ['LAYER', 'MODEL', 'GLOBAL']
+
+
+class _StepTimer(keras.callbacks.Callback):
+
+  def __init__(self):
+    super(_StepTimer, self).__init__()
+    self.step_times = []
+    self._start = None
+
+  def on_train_batch_begin(self, batch, logs=None):
+    self._start = time.time()
+
+  def on_train_batch_end(self, batch, logs=None):
+    self.step_times.append(time.time() - self._start)
+
+
+def _benchmark(mask_update_mode, num_layers, units, steps, frequency):
+  """Returns (first step time, mean step time) in milliseconds."""
+  model = keras.Sequential(
+      [keras.layers.Dense(units, input_shape=(units,))] +
+      [keras.layers.Dense(units) for _ in range(num_layers - 1)])
+  pruned_model = prune.prune_low_magnitude(
+      model,
+      pruning_schedule=pruning_schedule.ConstantSparsity(
+          0.5, begin_step=0, frequency=frequency),
+      mask_update_mode=mask_update_mode)
+  pruned_model.compile(loss='mse', optimizer='sgd')
+
+  # The timer comes before UpdatePruningStep, so that it includes the mask
+  # updates the callback runs before every batch.
+  timer = _StepTimer()
+  pruned_model.fit(
+      np.random.rand(steps + 1, units),
+      np.random.rand(steps + 1, units),
+      batch_size=1,
+      epochs=1,
+      verbose=0,
+      callbacks=[timer, pruning_callbacks.UpdatePruningStep()])
+  return timer.step_times[0] * 1000., np.mean(timer.step_times[1:]) * 1000.
+
+
+def run(num_layers, units, steps, frequency):
+  print('{:>8} {:>20} {:>20}'.format('mode', 'first step (ms)',
+                                     'mean step (ms)'))
+  for mask_update_mode in MASK_UPDATE_MODES:
+    first_step, mean_step = _benchmark(mask_update_mode, num_layers, units,
+                                       steps, frequency)
+    print('{:>8} {:>20.1f} {:>20.2f}'.format(mask_update_mode, first_step,
+                                             mean_step))
+
+
+def main(argv):
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  run(_NUM_LAYERS.value, _UNITS.value, _STEPS.value, _FREQUENCY.value)
+
+
+if __name__ == '__main__':
+  app.run(main)
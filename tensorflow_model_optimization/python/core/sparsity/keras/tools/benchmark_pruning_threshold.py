@@ -0,0 +1,120 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark for the pruning threshold engines.
+
+Measures the time of a pruning mask update and the peak host memory it
+allocates for every `PruningThreshold` engine, over weight tensors of
+increasing size. Each measurement runs in a fresh process so that the peak
+resident memory of one engine does not hide the one of the next.
+
+Example:
+
+  python benchmark_pruning_threshold.py --sizes=1000000,100000000
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import resource
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_impl
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_schedule
+from tensorflow_model_optimization.python.core.sparsity.keras import pruning_threshold
+
+_SIZES = flags.DEFINE_list(
+    'sizes', ['1000000', '10000000', '100000000'],
+    'Comma-separated number of elements of the benchmarked weight tensors.')
+_SPARSITY = flags.DEFINE_float(
+    'sparsity', 0.8, 'Target sparsity of the mask update.')
+_ITERATIONS = flags.DEFINE_integer(
+    'iterations', 5, 'Number of timed mask updates per engine.')
+
+ENGINES = {
+    'top_k': pruning_threshold.TopKThreshold,
+    'radix_select': pruning_threshold.RadixSelectThreshold,
+    'histogram': pruning_threshold.HistogramThreshold,
+    'sampled': pruning_threshold.SampledThreshold,
+}
+
+
+def _peak_rss_mib():
+  # ru_maxrss is reported in KiB on Linux.
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def _benchmark_engine(engine_name, size, sparsity, iterations):
+  """Returns (mean step time in ms, peak memory increase in MiB)."""
+  weight = tf.Variable(
+      np.random.standard_normal([size]).astype(np.float32), name='weight')
+  mask = tf.Variable(tf.ones_like(weight), name='mask')
+  threshold = tf.Variable(0.0, name='threshold')
+  step = tf.Variable(0, dtype=tf.int64, name='step')
+
+  pruning_obj = pruning_impl.Pruning(
+      training_step_fn=lambda: step,
+      pruning_vars=[(weight, mask, threshold)],
+      pruning_schedule=pruning_schedule.ConstantSparsity(
+          sparsity, begin_step=0, frequency=1),
+      block_size=(1, 1),
+      block_pooling_type='AVG',
+      threshold_engine=ENGINES[engine_name]())
+  update_fn = tf.function(pruning_obj.conditional_mask_update)
+  update_fn.get_concrete_function()
+
+  rss_before = _peak_rss_mib()
+  update_fn()
+  peak_memory = _peak_rss_mib() - rss_before
+
+  start = time.time()
+  for _ in range(iterations):
+    update_fn()
+  # Reading the mask back makes sure all the updates have been executed.
+  mask.numpy()
+  step_time = (time.time() - start) / iterations * 1000.
+  return step_time, peak_memory
+
+
+def run(sizes, sparsity, iterations):
+  """Prints a table comparing the engines for every tensor size."""
+  ctx = multiprocessing.get_context('spawn')
+
+  print('{:>12} {:>14} {:>14} {:>16}'.format('size', 'engine',
+                                             'step time (ms)',
+                                             'peak memory (MiB)'))
+  for size in sizes:
+    for engine_name in ENGINES:
+      with ctx.Pool(1) as pool:
+        step_time, peak_memory = pool.apply(
+            _benchmark_engine, (engine_name, size, sparsity, iterations))
+      print('{:>12} {:>14} {:>14.2f} {:>16.1f}'.format(size, engine_name,
+                                                       step_time, peak_memory))
+
+
+def main(argv):
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  run([int(size) for size in _SIZES.value], _SPARSITY.value,
+      _ITERATIONS.value)
+
+
+if __name__ == '__main__':
+  app.run(main)
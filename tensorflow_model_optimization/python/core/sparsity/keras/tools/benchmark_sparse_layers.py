@@ -0,0 +1,159 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark of the sparse inference layers against the dense layers.
+
+Measures the inference time of a `Dense` layer and of the `SparseDense` layer
+computing with the same pruned kernel, for every kernel shape, block size and
+sparsity level. Every time is the median over `repeats` runs of the mean time
+of `iterations` calls. The sparsity from which the speedup is above 1 is the
+crossover used to decide whether `strip_pruning(sparse_inference=True)`
+replaces a layer.
+
+The default crossover of `sparse_layers.is_sparse_inference_faster` is
+derived from `benchmark_sparse_layers_results.csv`, written by:
+
+  python benchmark_sparse_layers.py \
+      --output=benchmark_sparse_layers_results.csv
+
+Example:
+
+  python benchmark_sparse_layers.py --shapes=512x512,1024x4096 \
+      --block_sizes=1x1,4x4 --sparsities=0.5,0.8,0.9,0.95
+"""
+
+from __future__ import print_function
+
+import csv
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.sparsity.keras import sparse_layers
+
+_SHAPES = flags.DEFINE_list(
+    'shapes', ['256x256', '512x512', '1024x1024', '1024x4096'],
+    'Comma-separated (input dim)x(output dim) shapes of the kernels.')
+_BLOCK_SIZES = flags.DEFINE_list(
+    'block_sizes', ['1x1', '2x2', '4x4', '8x8'],
+    'Comma-separated block sizes of the sparse kernels.')
+_SPARSITIES = flags.DEFINE_list(
+    'sparsities', ['0.5', '0.7', '0.8', '0.9', '0.95', '0.98', '0.99'],
+    'Comma-separated fractions of zero blocks of the kernels.')
+_BATCH_SIZE = flags.DEFINE_integer('batch_size', 1,
+                                   'Batch size of the inputs.')
+_ITERATIONS = flags.DEFINE_integer('iterations', 100,
+                                   'Number of timed calls per run.')
+_REPEATS = flags.DEFINE_integer('repeats', 7,
+                                'Number of timed runs per layer.')
+_OUTPUT = flags.DEFINE_string(
+    'output', None, 'Optional path of a CSV file to write the results to.')
+
+
+def _parse_pair(value):
+  return tuple(int(dim) for dim in value.split('x'))
+
+
+def _get_block_sparse_kernel(shape, block_size, sparsity):
+  num_blocks = [
+      -(-dim // block_dim) for dim, block_dim in zip(shape, block_size)
+  ]
+  block_mask = (np.random.rand(*num_blocks) >= sparsity).astype(np.float32)
+  mask = np.kron(block_mask, np.ones(block_size))[:shape[0], :shape[1]]
+  return (np.random.standard_normal(shape) * mask).astype(np.float32)
+
+
+def _benchmark_layer(layer, inputs, iterations, repeats):
+  """Returns the median over the runs of the mean call time in ms."""
+  call_fn = tf.function(layer)
+  call_fn(inputs).numpy()
+
+  times = []
+  for _ in range(repeats):
+    start = time.perf_counter()
+    for _ in range(iterations):
+      outputs = call_fn(inputs)
+    # Reading the outputs back makes sure all the calls have been executed.
+    outputs.numpy()
+    times.append((time.perf_counter() - start) / iterations * 1000.)
+  return float(np.median(times))
+
+
+def run(shapes,
+        block_sizes,
+        sparsities,
+        batch_size,
+        iterations,
+        repeats,
+        output=None):
+  """Prints a table comparing the dense and sparse layers.
+
+  Args:
+    shapes: list of the (input dim, output dim) shapes of the kernels.
+    block_sizes: list of the block sizes of the sparse kernels.
+    sparsities: list of the fractions of zero blocks of the kernels.
+    batch_size: batch size of the inputs.
+    iterations: number of timed calls per run.
+    repeats: number of timed runs per layer.
+    output: optional path of a CSV file to write the results to.
+  """
+  fields = ['shape', 'block', 'sparsity', 'dense_ms', 'sparse_ms', 'speedup']
+  rows = []
+  print('{:>12} {:>8} {:>9} {:>11} {:>12} {:>8}'.format(
+      'shape', 'block', 'sparsity', 'dense (ms)', 'sparse (ms)', 'speedup'))
+  for shape in shapes:
+    inputs = tf.constant(
+        np.random.standard_normal([batch_size, shape[0]]).astype(np.float32))
+    for block_size in block_sizes:
+      for sparsity in sparsities:
+        kernel = _get_block_sparse_kernel(shape, block_size, sparsity)
+        dense_layer = keras.layers.Dense(shape[1], use_bias=False)
+        dense_layer.build((None, shape[0]))
+        dense_layer.set_weights([kernel])
+        sparse_layer = sparse_layers.SparseDense.from_kernel(
+            kernel, bias=None, block_size=block_size)
+
+        dense_time = _benchmark_layer(dense_layer, inputs, iterations,
+                                      repeats)
+        sparse_time = _benchmark_layer(sparse_layer, inputs, iterations,
+                                       repeats)
+        row = ['{}x{}'.format(*shape), '{}x{}'.format(*block_size), sparsity,
+               dense_time, sparse_time, dense_time / sparse_time]
+        print('{:>12} {:>8} {:>9.2f} {:>11.3f} {:>12.3f} {:>8.2f}'.format(*row))
+        rows.append(row)
+
+  if output:
+    with open(output, 'w') as f:
+      writer = csv.writer(f)
+      writer.writerow(fields)
+      for row in rows:
+        writer.writerow(row[:3] + ['{:.4f}'.format(value) for value in row[3:]])
+
+
+def main(argv):
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  run([_parse_pair(shape) for shape in _SHAPES.value],
+      [_parse_pair(block_size) for block_size in _BLOCK_SIZES.value],
+      [float(sparsity) for sparsity in _SPARSITIES.value], _BATCH_SIZE.value,
+      _ITERATIONS.value, _REPEATS.value, _OUTPUT.value)
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -17,27 +17,51 @@
 This tool is used to display sparsity for each layer of the model and
 type of sparsity that has been used to prune them: unstructured or
 sparsity m_by_n.
+
+The weights are read straight from the memory-mapped TFLite flatbuffer, so the
+model is neither loaded into an interpreter nor has its tensors allocated. The
+result can also be written as a JSON report, e.g. for a CI check:
+
+  python check_sparsity_m_by_n.py --model_tflite=model.tflite \
+      --m_by_n=2,4 --output_json=report.json
 """
 
 from __future__ import print_function
 
+import json
+import mmap
+
 from absl import app
 from absl import flags
 import numpy as np
-import tensorflow as tf
 
+from tensorflow.lite.python import schema_py_generated as schema_fb
 from tensorflow_model_optimization.python.core.sparsity.keras import pruning_utils
 
 _FILE_PATH = flags.DEFINE_string("model_tflite", None,
                                  "Path to TFLite model file")
 _M_BY_N = flags.DEFINE_list("m_by_n", "2, 4",
                             "A list of 2 integers, 'm, n': m by n sparsity.")
+_OUTPUT_JSON = flags.DEFINE_string(
+    "output_json", None, "Optional path of a JSON report of the sparsity of "
+    "every tensor.")
 
 # Dont check layer if its name has one of word from this list.
 IGNORE_LIST = [
     "relu", "pooling", "reshape", "identity", "input", "add", "flatten"
 ]
 
+# NumPy types of the TFLite tensor types that can hold weights.
+_TFLITE_TO_NUMPY_TYPES = {
+    schema_fb.TensorType.FLOAT32: np.float32,
+    schema_fb.TensorType.FLOAT16: np.float16,
+    schema_fb.TensorType.FLOAT64: np.float64,
+    schema_fb.TensorType.INT8: np.int8,
+    schema_fb.TensorType.UINT8: np.uint8,
+    schema_fb.TensorType.INT16: np.int16,
+    schema_fb.TensorType.INT32: np.int32,
+}
+
 
 def ignore_tensor(details, ignore_list):
   """Returns boolean that indicates whether to ignore the tensor."""
@@ -50,47 +74,98 @@ def ignore_tensor(details, ignore_list):
   return False
 
 
-def calculate_sparsity(weights):
-  """Returns sparsity of the given weights tensor."""
-  number_of_weights = np.size(weights)
-  number_of_non_zero_weights = np.count_nonzero(weights)
-  sparsity = 1.0 - float(
-      number_of_non_zero_weights
-  ) / number_of_weights if number_of_non_zero_weights != 0 else 1.0
-  return sparsity
-
-
-def run(input_tflite_path, m_by_n_str):
+def _buffer_data(model_buffer, buffer):
+  """Returns the data of a flatbuffer buffer as a view of the model file."""
+  # Buffers of models larger than 2GB are stored after the flatbuffer, at an
+  # offset of the file.
+  if buffer.Offset() > 1:
+    return np.frombuffer(
+        model_buffer, dtype=np.uint8, count=buffer.Size(),
+        offset=buffer.Offset())
+  if buffer.DataIsNone() or not buffer.DataLength():
+    return None
+  return buffer.DataAsNumpy()
+
+
+def iterate_weights(model_buffer):
+  """Yields the details and the data of the constant tensors of a model.
+
+  Args:
+    model_buffer: The TFLite flatbuffer, e.g. a memory-mapped file.
+
+  Yields:
+    A (details, weights) tuple for every constant tensor of a supported type,
+    where details is a dictionary with the "name" and "shape" of the tensor
+    and weights is a read-only NumPy array backed by `model_buffer`.
+  """
+  model = schema_fb.Model.GetRootAsModel(model_buffer, 0)
+  for subgraph_index in range(model.SubgraphsLength()):
+    subgraph = model.Subgraphs(subgraph_index)
+    for tensor_index in range(subgraph.TensorsLength()):
+      tensor = subgraph.Tensors(tensor_index)
+      dtype = _TFLITE_TO_NUMPY_TYPES.get(tensor.Type())
+      # Tensors stored in a sparse format don't hold their dense values.
+      if dtype is None or tensor.Sparsity() is not None:
+        continue
+      data = _buffer_data(model_buffer, model.Buffers(tensor.Buffer()))
+      if data is None:
+        continue
+      shape = tensor.ShapeAsNumpy() if tensor.ShapeLength() else np.array([])
+      details = {
+          "name": tensor.Name().decode("utf-8"),
+          "shape": [int(dim) for dim in shape],
+      }
+      yield details, data.view(dtype).reshape(details["shape"])
+
+
+def check_weights(model_buffer, m_by_n):
+  """Returns the m by n sparsity statistics of the weights of a model."""
+  report = []
+  for details, weights in iterate_weights(model_buffer):
+    # Don't consider layers that can't be pruned.
+    if ignore_tensor(details, IGNORE_LIST) or weights.ndim < 2:
+      continue
+
+    stats = pruning_utils.m_by_n_sparsity_stats(weights, m_by_n, "C_IN")
+    report.append(
+        dict(details, is_pruned_m_by_n=stats["num_violating_blocks"] == 0,
+             **stats))
+  return report
+
+
+def run(input_tflite_path, m_by_n_str, output_json_path=None):
   """Checks type of sparsity for each layer of the model."""
 
   # convert first 2 value string to a tuple of 2 value
   m_by_n = tuple(map(int, m_by_n_str[:2]))
 
-  interpreter = tf.lite.Interpreter(model_path=input_tflite_path)
-  interpreter.allocate_tensors()
-
-  details = interpreter.get_tensor_details()
-  # Don't consider layers that can't be pruned.
-  details = [x for x in details if not ignore_tensor(x, IGNORE_LIST)]
+  with open(input_tflite_path, "rb") as model_file, mmap.mmap(
+      model_file.fileno(), 0, access=mmap.ACCESS_READ) as model_buffer:
+    report = check_weights(model_buffer, m_by_n)
 
-  for detail in details:
-    name = detail["name"]
-    shape = detail["shape"]
-    weights = interpreter.tensor(detail["index"])()
+  for tensor in report:
+    print(f"{tensor['name']}: shape: {tensor['shape']}, "
+          f"sparsity: {tensor['sparsity']}, "
+          f"{m_by_n[0]}_by_{m_by_n[1]} sparsity: {tensor['is_pruned_m_by_n']}.")
 
-    weights_ts = tf.constant(weights)
-    pruned_m_by_n = pruning_utils.is_pruned_m_by_n(weights_ts, m_by_n, "C_IN")
-    sparsity = calculate_sparsity(weights_ts)
+  if output_json_path:
+    with open(output_json_path, "w") as report_file:
+      json.dump({
+          "model": input_tflite_path,
+          "m_by_n": list(m_by_n),
+          "num_violating_tensors": sum(
+              not tensor["is_pruned_m_by_n"] for tensor in report),
+          "tensors": report,
+      }, report_file, indent=2)
 
-    print(f"{name}: shape: {shape}, sparsity: {sparsity}, "
-          f"{m_by_n[0]}_by_{m_by_n[1]} sparsity: {pruned_m_by_n}.")
+  return report
 
 
 def main(argv):
   if len(argv) > 2:
     raise app.UsageError("Too many command-line arguments.")
 
-  run(_FILE_PATH.value, _M_BY_N.value)
+  run(_FILE_PATH.value, _M_BY_N.value, _OUTPUT_JSON.value)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the m by n sparsity check of TFLite models."""
+
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from tensorflow_model_optimization.python.core.keras.compat import keras
+from tensorflow_model_optimization.python.core.sparsity.keras.tools import check_sparsity_m_by_n
+
+
+class CheckSparsityMbyNTest(tf.test.TestCase):
+
+  def _save_tflite_model(self, kernels):
+    model = keras.Sequential([keras.layers.Input(shape=(kernels[0].shape[0],))])
+    for kernel in kernels:
+      model.add(keras.layers.Dense(kernel.shape[1]))
+      model.layers[-1].kernel.assign(kernel)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    tflite_path = os.path.join(self.get_temp_dir(), 'model.tflite')
+    with open(tflite_path, 'wb') as f:
+      f.write(converter.convert())
+    return tflite_path
+
+  def testReportsTensorStats(self):
+    np.random.seed(0)
+    # TFLite stores Dense kernels as [C_OUT, C_IN], the blocks are on C_IN.
+    pruned_kernel = np.random.standard_normal([8, 16]).astype(np.float32)
+    pruned_kernel.reshape([4, 2, 16])[:, 0, :] = 0.0
+    dense_kernel = np.random.standard_normal([16, 4]).astype(np.float32)
+    tflite_path = self._save_tflite_model([pruned_kernel, dense_kernel])
+    json_path = os.path.join(self.get_temp_dir(), 'report.json')
+
+    check_sparsity_m_by_n.run(tflite_path, ['2', '4'], json_path)
+
+    with open(json_path) as f:
+      report = json.load(f)
+    self.assertEqual([2, 4], report['m_by_n'])
+    self.assertEqual(1, report['num_violating_tensors'])
+
+    tensors = sorted(report['tensors'], key=lambda tensor: tensor['shape'])
+    self.assertLen(tensors, 2)
+    dense_stats, pruned_stats = tensors
+    self.assertEqual([4, 16], dense_stats['shape'])
+    self.assertFalse(dense_stats['is_pruned_m_by_n'])
+    self.assertEqual(16, dense_stats['num_blocks'])
+    self.assertEqual([0, 0, 0, 0, 16], dense_stats['non_zeros_histogram'])
+    self.assertEqual(16, dense_stats['num_violating_blocks'])
+
+    self.assertEqual([16, 8], pruned_stats['shape'])
+    self.assertTrue(pruned_stats['is_pruned_m_by_n'])
+    self.assertEqual([0, 0, 32, 0, 0], pruned_stats['non_zeros_histogram'])
+    self.assertAllClose(0.5, pruned_stats['sparsity'])
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -77,8 +77,8 @@ def prune_for_benchmark(keras_model,
   Args:
     keras_model: A `keras.Model` instance.
     target_sparsity: Target sparsity as float, in [0, 1] interval.
-    block_size: The dimensions (height, weight) for the block sparse pattern in
-      rank-2 weight tensors.
+    block_size: The dimensions for the block sparse pattern, applied to the
+      last dimensions of the weight tensors.
 
   Returns:
     A pruned model, modified with pruning wrappers.